@@ -0,0 +1,157 @@
+"""Rolling fleet analytics maintained incrementally on the backend.
+
+Every sample updates a time bucket in O(1); a rolling window is a deque of
+buckets, so old data leaves the window by dropping whole buckets. Summaries
+are computed on request by merging the buckets in the window, which is a
+fixed cost independent of how many samples arrived.
+
+Tracked per robot and fleet-wide:
+- battery drain rate (sum of battery drops per hour; charging is ignored)
+- mean and percentile temperature (fixed-width histogram)
+- utilisation (share of samples taken while "Navigating")
+- goals completed per hour
+"""
+
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+TEMPERATURE_BIN = 0.5
+TEMPERATURE_MIN = -40.0
+TEMPERATURE_MAX = 150.0
+
+
+class _Bucket:
+    __slots__ = ("start", "samples", "navigating", "temp_count", "temp_sum", "temp_hist", "drain", "completed")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.samples = 0
+        self.navigating = 0
+        self.temp_count = 0
+        self.temp_sum = 0.0
+        self.temp_hist: Dict[int, int] = {}
+        self.drain = 0.0
+        self.completed = 0
+
+
+class RollingAggregate:
+    def __init__(self, window: float, bucket_seconds: float):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self._buckets = deque()
+        self.first_seen: Optional[float] = None
+
+    def _bucket(self, now: float) -> _Bucket:
+        if self.first_seen is None:
+            self.first_seen = now
+        start = now - now % self.bucket_seconds
+        if not self._buckets or self._buckets[-1].start < start:
+            self._buckets.append(_Bucket(start))
+            self._evict(now)
+        return self._buckets[-1]
+
+    def _evict(self, now: float):
+        while self._buckets and self._buckets[0].start + self.bucket_seconds <= now - self.window:
+            self._buckets.popleft()
+
+    def add_sample(self, now: float, battery_drop: float, temperature: Optional[float], navigating: bool):
+        bucket = self._bucket(now)
+        bucket.samples += 1
+        if navigating:
+            bucket.navigating += 1
+        if battery_drop > 0:
+            bucket.drain += battery_drop
+        if temperature is not None:
+            bucket.temp_count += 1
+            bucket.temp_sum += temperature
+            clamped = min(max(temperature, TEMPERATURE_MIN), TEMPERATURE_MAX)
+            index = int((clamped - TEMPERATURE_MIN) // TEMPERATURE_BIN)
+            bucket.temp_hist[index] = bucket.temp_hist.get(index, 0) + 1
+
+    def add_completed(self, now: float, count: int = 1):
+        self._bucket(now).completed += count
+
+    def summary(self, now: float, percentiles=(0.5, 0.95)) -> Dict[str, Any]:
+        self._evict(now)
+        samples = navigating = temp_count = completed = 0
+        temp_sum = drain = 0.0
+        hist: Dict[int, int] = {}
+        for bucket in self._buckets:
+            samples += bucket.samples
+            navigating += bucket.navigating
+            temp_count += bucket.temp_count
+            temp_sum += bucket.temp_sum
+            drain += bucket.drain
+            completed += bucket.completed
+            for index, count in bucket.temp_hist.items():
+                hist[index] = hist.get(index, 0) + count
+
+        # Rates are over the time actually observed, up to the full window
+        covered = min(self.window, now - self.first_seen) if self.first_seen is not None else 0.0
+        hours = covered / 3600 if covered > 0 else None
+        temperature = {"mean": round(temp_sum / temp_count, 2) if temp_count else None}
+        if temp_count:
+            ordered = sorted(hist.items())
+            for p in percentiles:
+                target = p * temp_count
+                running = 0
+                for index, count in ordered:
+                    running += count
+                    if running >= target:
+                        temperature[f"p{int(p * 100)}"] = round(TEMPERATURE_MIN + (index + 0.5) * TEMPERATURE_BIN, 2)
+                        break
+        return {
+            "window_seconds": round(covered, 1),
+            "samples": samples,
+            "battery_drain_per_hour": round(drain / hours, 2) if hours else None,
+            "temperature": temperature,
+            "utilisation": round(navigating / samples, 4) if samples else None,
+            "goals_completed": completed,
+            "goals_completed_per_hour": round(completed / hours, 2) if hours else None
+        }
+
+
+class AnalyticsAggregator:
+    def __init__(self, window: float = 3600.0, bucket_seconds: float = 60.0, clock: Callable[[], float] = time.time):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self.fleet = RollingAggregate(window, bucket_seconds)
+        self.robots: Dict[str, RollingAggregate] = {}
+        self._last_battery: Dict[str, float] = {}
+
+    def _robot(self, robot_id: str) -> RollingAggregate:
+        aggregate = self.robots.get(robot_id)
+        if aggregate is None:
+            aggregate = self.robots[robot_id] = RollingAggregate(self.window, self.bucket_seconds)
+        return aggregate
+
+    def record_sample(self, robot_id: str, battery: Optional[float], temperature: Optional[float],
+                      task: Optional[str], now: Optional[float] = None):
+        now = self.clock() if now is None else now
+        drop = 0.0
+        if battery is not None:
+            previous = self._last_battery.get(robot_id)
+            if previous is not None:
+                drop = previous - battery
+            self._last_battery[robot_id] = battery
+        navigating = task == "Navigating"
+        self._robot(robot_id).add_sample(now, drop, temperature, navigating)
+        self.fleet.add_sample(now, drop, temperature, navigating)
+
+    def record_goal_completed(self, robot_id: str, now: Optional[float] = None):
+        now = self.clock() if now is None else now
+        self._robot(robot_id).add_completed(now)
+        self.fleet.add_completed(now)
+
+    def discard(self, robot_id: str):
+        self.robots.pop(robot_id, None)
+        self._last_battery.pop(robot_id, None)
+
+    def summary(self, robot_id: Optional[str] = None) -> Dict[str, Any]:
+        now = self.clock()
+        if robot_id is not None:
+            aggregate = self.robots.get(robot_id)
+            return {robot_id: aggregate.summary(now)} if aggregate else {}
+        return {robot_id: aggregate.summary(now) for robot_id, aggregate in self.robots.items()}
@@ -1,9 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import sqlite3
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
+from collections import OrderedDict
+import base64
+import hashlib
+import hmac
+import json
 import os
+import secrets
+import time
+from config import (
+    SECRET_KEY, ACCESS_TOKEN_EXPIRE_MINUTES, PASSCODE_HASH_ITERATIONS,
+    SESSION_CACHE_TTL, SESSION_CACHE_MAX_ENTRIES
+)
 
 router = APIRouter()
 security = HTTPBasic()
@@ -18,6 +30,8 @@ class LoginResponse(BaseModel):
     user_id: Optional[str] = None
     name: Optional[str] = None
     role: Optional[str] = None
+    token: Optional[str] = None
+    expires_at: Optional[int] = None
 
 # Add UserOut model for GET /users
 class UserOut(BaseModel):
@@ -35,11 +49,151 @@ class UserCreate(BaseModel):
     passcode: str
 
 # Add UserUpdate model for PUT /users/{user_id}
+# An empty or masked passcode keeps the current one
 class UserUpdate(BaseModel):
     name: str
     emp_id: str
     role: str
-    passcode: str
+    passcode: Optional[str] = None
+
+# Passcodes are stored hashed; API responses only ever carry this mask
+PASSCODE_MASK = "****"
+PASSCODE_HASH_PREFIX = "pbkdf2_sha256"
+
+def hash_passcode(passcode: str, iterations: int = PASSCODE_HASH_ITERATIONS) -> str:
+    """Hash a passcode with PBKDF2-SHA256 (CPU bound, call via run_in_threadpool)"""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", passcode.encode(), salt, iterations)
+    return f"{PASSCODE_HASH_PREFIX}${iterations}${salt.hex()}${digest.hex()}"
+
+def verify_passcode(passcode: str, stored: str) -> bool:
+    """Check a passcode against a stored hash, or a legacy plaintext value"""
+    if not stored.startswith(PASSCODE_HASH_PREFIX + "$"):
+        return hmac.compare_digest(passcode.encode(), stored.encode())
+    _, iterations, salt, digest = stored.split("$")
+    candidate = hashlib.pbkdf2_hmac("sha256", passcode.encode(), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(candidate.hex(), digest)
+
+def needs_rehash(stored: str) -> bool:
+    if not stored.startswith(PASSCODE_HASH_PREFIX + "$"):
+        return True
+    return int(stored.split("$")[1]) != PASSCODE_HASH_ITERATIONS
+
+# Session tokens
+#
+# A token is "<payload>.<signature>", both base64url, signed with HMAC-SHA256.
+# Verified sessions are kept in a TTL cache so per-request checks are a dict
+# lookup. Updating or deleting a user bumps that user's generation, which
+# invalidates every token issued before the change.
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(SECRET_KEY.encode(), body.encode(), hashlib.sha256).digest())
+
+class SessionCache:
+    """Verified sessions keyed by token, expiring after a TTL or at token expiry"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_user: Dict[str, set] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        session, expires_at = entry
+        if time.time() >= expires_at:
+            self.discard(token)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return session
+
+    def put(self, token: str, session: Dict[str, Any]):
+        self._entries[token] = (session, min(time.time() + self.ttl, session["exp"]))
+        self._entries.move_to_end(token)
+        self._by_user.setdefault(session["uid"], set()).add(token)
+        while len(self._entries) > self.max_entries:
+            self.discard(next(iter(self._entries)))
+
+    def discard(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry:
+            tokens = self._by_user.get(entry[0]["uid"])
+            if tokens:
+                tokens.discard(token)
+                if not tokens:
+                    del self._by_user[entry[0]["uid"]]
+
+    def invalidate_user(self, user_id: str):
+        for token in self._by_user.pop(user_id, set()):
+            self._entries.pop(token, None)
+
+session_cache = SessionCache(SESSION_CACHE_TTL, SESSION_CACHE_MAX_ENTRIES)
+_user_generations: Dict[str, int] = {}
+_revoked_sessions: Dict[str, int] = {}
+
+def issue_token(user_id: str, name: str, role: str) -> Dict[str, Any]:
+    session = {
+        "sid": secrets.token_hex(8),
+        "uid": user_id,
+        "name": name,
+        "role": role,
+        "gen": _user_generations.get(user_id, 0),
+        "exp": int(time.time()) + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+    body = _b64encode(json.dumps(session, separators=(",", ":")).encode())
+    token = f"{body}.{_sign(body)}"
+    session_cache.put(token, session)
+    return {"token": token, "session": session}
+
+def verify_session(token: str) -> Optional[Dict[str, Any]]:
+    """Return the session for a token, or None if it is invalid, expired or revoked"""
+    session = session_cache.get(token)
+    if session is not None:
+        return session
+    try:
+        body, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(body)):
+            return None
+        session = json.loads(_b64decode(body))
+    except Exception:
+        return None
+    if session["exp"] <= time.time():
+        return None
+    if session["gen"] != _user_generations.get(session["uid"], 0) or session["sid"] in _revoked_sessions:
+        return None
+    session_cache.put(token, session)
+    return session
+
+def invalidate_user_sessions(user_id: str):
+    _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+    session_cache.invalidate_user(user_id)
+
+def get_current_session(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """FastAPI dependency resolving the bearer token to a session"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    session = verify_session(authorization[7:].strip())
+    if session is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    return session
+
+def require_admin(session: Dict[str, Any] = Depends(get_current_session)) -> Dict[str, Any]:
+    """FastAPI dependency allowing only Admin sessions"""
+    if session["role"] != "Admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return session
 
 def get_db():
     """FastAPI dependency to manage database connections with thread safety."""
@@ -61,21 +215,29 @@ async def login(request: LoginRequest, conn: sqlite3.Connection = Depends(get_db
         
         print(f"Login attempt - Employee ID: {emp_id_str}")
         
-        # Check if user exists and passcode matches in users table
+        # Look the user up and check the passcode off the event loop
         cursor.execute(
-            "SELECT id, name, role FROM users WHERE emp_id = ? AND passcode = ?",
-            (emp_id_str, passcode_str)
+            "SELECT id, name, role, passcode FROM users WHERE emp_id = ?",
+            (emp_id_str,)
         )
         result = cursor.fetchone()
         
-        if result:
+        if result and await run_in_threadpool(verify_passcode, passcode_str, str(result[3])):
+            if needs_rehash(str(result[3])):
+                # Upgrade plaintext or outdated hashes now that we know the passcode
+                new_hash = await run_in_threadpool(hash_passcode, passcode_str)
+                cursor.execute("UPDATE users SET passcode = ? WHERE id = ?", (new_hash, result[0]))
+                conn.commit()
             print(f"Login successful for user: {result[1]}")
+            issued = issue_token(str(result[0]), result[1], result[2])
             return LoginResponse(
                 success=True,
                 message="Login successful",
                 user_id=str(result[0]),
                 name=result[1],
-                role=result[2]
+                role=result[2],
+                token=issued["token"],
+                expires_at=issued["session"]["exp"]
             )
         else:
             print(f"Login failed - Invalid credentials for Employee ID: {emp_id_str}")
@@ -93,13 +255,34 @@ async def login(request: LoginRequest, conn: sqlite3.Connection = Depends(get_db
             detail="Internal server error"
         )
 
+@router.get("/session")
+async def get_session(session: Dict[str, Any] = Depends(get_current_session)):
+    """Return the session behind the request's bearer token"""
+    return {
+        "user_id": session["uid"],
+        "name": session["name"],
+        "role": session["role"],
+        "expires_at": session["exp"]
+    }
+
+@router.post("/logout")
+async def logout(authorization: Optional[str] = Header(None), session: Dict[str, Any] = Depends(get_current_session)):
+    _revoked_sessions[session["sid"]] = session["exp"]
+    session_cache.discard(authorization[7:].strip())
+    # Forget revocations once the tokens would have expired anyway
+    now = time.time()
+    for sid, exp in list(_revoked_sessions.items()):
+        if exp <= now:
+            del _revoked_sessions[sid]
+    return {"success": True}
+
 @router.get("/users", response_model=List[UserOut])
 async def get_users(conn: sqlite3.Connection = Depends(get_db)):
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT id, name, emp_id, role, passcode FROM users")
+        cursor.execute("SELECT id, name, emp_id, role FROM users")
         users = [
-            {"id": row[0], "name": row[1], "emp_id": row[2], "role": row[3], "passcode": str(row[4])}
+            {"id": row[0], "name": row[1], "emp_id": row[2], "role": row[3], "passcode": PASSCODE_MASK}
             for row in cursor.fetchall()
         ]
         return users
@@ -112,9 +295,10 @@ async def get_users(conn: sqlite3.Connection = Depends(get_db)):
 async def create_user(user: UserCreate, conn: sqlite3.Connection = Depends(get_db)):
     try:
         cursor = conn.cursor()
+        passcode_hash = await run_in_threadpool(hash_passcode, user.passcode)
         cursor.execute(
             "INSERT INTO users (name, emp_id, role, passcode) VALUES (?, ?, ?, ?)",
-            (user.name, user.emp_id, user.role, user.passcode)
+            (user.name, user.emp_id, user.role, passcode_hash)
         )
         conn.commit()
         user_id = cursor.lastrowid
@@ -123,7 +307,7 @@ async def create_user(user: UserCreate, conn: sqlite3.Connection = Depends(get_d
             "name": user.name,
             "emp_id": user.emp_id,
             "role": user.role,
-            "passcode": user.passcode
+            "passcode": PASSCODE_MASK
         }
     except sqlite3.IntegrityError:
         raise HTTPException(
@@ -138,19 +322,27 @@ async def create_user(user: UserCreate, conn: sqlite3.Connection = Depends(get_d
 async def update_user(user_id: int, user: UserUpdate, conn: sqlite3.Connection = Depends(get_db)):
     try:
         cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET name = ?, emp_id = ?, role = ?, passcode = ? WHERE id = ?",
-            (user.name, user.emp_id, user.role, user.passcode, user_id)
-        )
+        if user.passcode and user.passcode != PASSCODE_MASK:
+            passcode_hash = await run_in_threadpool(hash_passcode, user.passcode)
+            cursor.execute(
+                "UPDATE users SET name = ?, emp_id = ?, role = ?, passcode = ? WHERE id = ?",
+                (user.name, user.emp_id, user.role, passcode_hash, user_id)
+            )
+        else:
+            cursor.execute(
+                "UPDATE users SET name = ?, emp_id = ?, role = ? WHERE id = ?",
+                (user.name, user.emp_id, user.role, user_id)
+            )
         conn.commit()
         if conn.total_changes == 0:
             raise HTTPException(status_code=404, detail=f"User with id {user_id} not found")
+        invalidate_user_sessions(str(user_id))
         return {
             "id": user_id,
             "name": user.name,
             "emp_id": user.emp_id,
             "role": user.role,
-            "passcode": user.passcode
+            "passcode": PASSCODE_MASK
         }
     except sqlite3.IntegrityError:
         raise HTTPException(
@@ -169,6 +361,7 @@ async def delete_user(user_id: int, conn: sqlite3.Connection = Depends(get_db)):
         conn.commit()
         if conn.total_changes == 0:
             raise HTTPException(status_code=404, detail=f"User with id {user_id} not found")
+        invalidate_user_sessions(str(user_id))
         return {"success": True}
     except Exception as e:
         print(f"Database error in delete_user: {e}")
@@ -202,7 +395,7 @@ def init_db():
             # Insert test user if not exists
             cursor.execute(
                 "INSERT INTO users (emp_id, passcode, name, role) VALUES (?, ?, ?, ?)",
-                ('1234', '5678', 'Omprakash', 'Admin')
+                ('1234', hash_passcode('5678'), 'Omprakash', 'Admin')
             )
         
         conn.commit()
@@ -212,6 +405,3 @@ def init_db():
     finally:
         if conn:
             conn.close()
-
-# Initialize database when module is imported
-init_db()
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""Per-robot change versions for conditional and long-poll reads.
+
+``robot_state["version"]`` counts state changes; this module remembers the
+version at which each robot last changed (or was removed), so a client that
+saw version N can be sent just the robots that changed since. Versions
+restart at zero with the process, so they are qualified by a random
+``boot_id`` that clients echo back: a version from another boot means the
+client needs the full state.
+
+``_versions`` is kept in change order (a robot is re-inserted each time it
+changes), so collecting the changes since N walks only those changes, not
+the whole fleet. Removals are kept in the same order but only the last
+``max_removed`` of them; ``floor`` is the newest version whose removal was
+dropped, and a client holding a version below it needs the full state.
+"""
+
+import asyncio
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class ChangeFeed:
+    def __init__(self, max_removed: int = 10000):
+        self.boot_id = uuid.uuid4().hex[:12]
+        self.max_removed = max_removed
+        self.floor = 0
+        self._versions: Dict[str, int] = {}
+        self._removed: Dict[str, int] = {}
+        self._changed = asyncio.Event()
+
+    def etag(self, version: int) -> str:
+        return f'"{self.boot_id}-{version}"'
+
+    def matches(self, if_none_match: Optional[str], version: int) -> bool:
+        """True if an If-None-Match header names the current version"""
+        if not if_none_match:
+            return False
+        etag = self.etag(version)
+        return any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(","))
+
+    def record(self, version: int, changed: Iterable[str] = (), removed: Iterable[str] = ()):
+        """Note the robots changed or removed by ``version`` and wake any waiters"""
+        versions = self._versions
+        for robot_id in changed:
+            versions.pop(robot_id, None)
+            versions[robot_id] = version
+            self._removed.pop(robot_id, None)
+        for robot_id in removed:
+            versions.pop(robot_id, None)
+            self._removed.pop(robot_id, None)
+            self._removed[robot_id] = version
+        while len(self._removed) > self.max_removed:
+            oldest = next(iter(self._removed))
+            self.floor = self._removed.pop(oldest)
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def covers(self, since: int) -> bool:
+        """Whether every removal after version ``since`` is still known"""
+        return since >= self.floor
+
+    def changes_since(self, since: int) -> Tuple[List[str], List[str]]:
+        """Robot ids changed and removed after version ``since``"""
+        changed = []
+        for robot_id in reversed(self._versions):
+            if self._versions[robot_id] <= since:
+                break
+            changed.append(robot_id)
+        removed = [robot_id for robot_id, version in self._removed.items() if version > since]
+        return changed, removed
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for the next change; False on timeout"""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
@@ -0,0 +1,231 @@
+"""Response and WebSocket compression with CPU and ratio accounting.
+
+``CompressionMiddleware`` gzip- or brotli-encodes HTTP responses at or above
+``minimum_size`` bytes when the client accepts it (brotli when the optional
+``brotli`` package is installed and offered). Streaming responses such as
+the NDJSON export are compressed chunk by chunk with a sync flush, so
+clients still receive rows as they are produced.
+
+``install_ws_deflate`` makes uvicorn's websockets protocol negotiate
+permessage-deflate with the WS_DEFLATE_* settings (level, window bits,
+context takeover) instead of its fixed defaults. It rebinds the factory
+uvicorn builds per connection, so it applies under ``uvicorn main:app`` as
+well as ``python main.py``; whether deflate is offered at all is still
+uvicorn's ``--ws-per-message-deflate`` flag.
+
+Every compression call is timed with the thread's CPU clock and counted in
+``compression_stats``, so bandwidth saved can be weighed against CPU spent.
+"""
+
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import (
+    WS_DEFLATE_LEVEL, WS_DEFLATE_MEM_LEVEL, WS_DEFLATE_WINDOW_BITS,
+    WS_DEFLATE_SERVER_NO_CONTEXT_TAKEOVER, WS_DEFLATE_CLIENT_NO_CONTEXT_TAKEOVER
+)
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    print("Warning: brotli not installed. HTTP responses will be gzip-compressed only.")
+    BROTLI_AVAILABLE = False
+
+try:
+    from uvicorn.protocols.websockets import websockets_impl
+    from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+    from websockets.frames import CTRL_OPCODES
+    WS_DEFLATE_AVAILABLE = True
+except ImportError:
+    print("Warning: websockets not installed. WebSocket compression is unavailable.")
+    WS_DEFLATE_AVAILABLE = False
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "image/svg+xml")
+
+
+class CompressionStats:
+    def __init__(self):
+        self._codecs: Dict[str, Dict[str, float]] = {}
+
+    def record(self, codec: str, raw: int, compressed: int, cpu_seconds: float):
+        entry = self._codecs.get(codec)
+        if entry is None:
+            entry = self._codecs[codec] = {"messages": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0}
+        entry["messages"] += 1
+        entry["bytes_in"] += raw
+        entry["bytes_out"] += compressed
+        entry["cpu_seconds"] += cpu_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        report = {}
+        for codec, entry in self._codecs.items():
+            bytes_in, bytes_out, cpu = entry["bytes_in"], entry["bytes_out"], entry["cpu_seconds"]
+            report[codec] = {
+                "messages": entry["messages"],
+                "bytes_in": bytes_in,
+                "bytes_out": bytes_out,
+                "ratio": round(bytes_out / bytes_in, 4) if bytes_in else None,
+                "bytes_saved": bytes_in - bytes_out,
+                "cpu_ms": round(cpu * 1000, 2),
+                # CPU cost per MB of input, the number to trade against bandwidth
+                "cpu_ms_per_mb": round(cpu * 1000 / (bytes_in / 1_000_000), 2) if bytes_in else None
+            }
+        return report
+
+
+compression_stats = CompressionStats()
+
+
+def _accepted(accept_encoding: str) -> set:
+    codings = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        codings.add(name.strip().lower())
+    return codings
+
+
+class _Encoder:
+    """Incremental gzip or brotli encoder that accounts its CPU time"""
+
+    def __init__(self, codec: str, gzip_level: int, brotli_quality: int):
+        self.codec = codec
+        if codec == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+        self.raw = 0
+        self.compressed = 0
+        self.cpu = 0.0
+
+    def encode(self, data: bytes, finish: bool) -> bytes:
+        started = time.thread_time()
+        if self.codec == "br":
+            out = self._compressor.process(data) + (self._compressor.finish() if finish else self._compressor.flush())
+        else:
+            out = self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+        self.cpu += time.thread_time() - started
+        self.raw += len(data)
+        self.compressed += len(out)
+        return out
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 stats: Optional[CompressionStats] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.stats = stats or compression_stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = _accepted(Headers(scope=scope).get("accept-encoding", ""))
+        if BROTLI_AVAILABLE and "br" in accepted:
+            codec = "br"
+        elif "gzip" in accepted:
+            codec = "gzip"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                # First body message decides whether this response is compressed
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or start_message["status"] < 200 or start_message["status"] in (204, 304)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                )
+                if not passthrough:
+                    encoder = _Encoder(codec, self.gzip_level, self.brotli_quality)
+                    headers["Content-Encoding"] = codec
+                    headers.add_vary_header("Accept-Encoding")
+                    if more_body:
+                        del headers["Content-Length"]
+                    else:
+                        body = encoder.encode(body, finish=True)
+                        headers["Content-Length"] = str(len(body))
+                        message = {**message, "body": body}
+                        self.stats.record(codec, encoder.raw, encoder.compressed, encoder.cpu)
+                        encoder = None
+                await send(start_message)
+                start_message = None
+                if passthrough or encoder is None:
+                    await send(message)
+                    return
+
+            if passthrough:
+                await send(message)
+                return
+            await send({**message, "body": encoder.encode(body, finish=not more_body)})
+            if not more_body:
+                self.stats.record(codec, encoder.raw, encoder.compressed, encoder.cpu)
+
+        await self.app(scope, receive, send_compressed)
+
+
+if WS_DEFLATE_AVAILABLE:
+    class MeasuredPerMessageDeflate(PerMessageDeflate):
+        def encode(self, frame):
+            if frame.opcode in CTRL_OPCODES:
+                return frame
+            started = time.thread_time()
+            encoded = super().encode(frame)
+            compression_stats.record("permessage-deflate", len(frame.data), len(encoded.data),
+                                     time.thread_time() - started)
+            return encoded
+
+    class MeasuredDeflateFactory(ServerPerMessageDeflateFactory):
+        def process_request_params(self, params, accepted_extensions):
+            response_params, extension = super().process_request_params(params, accepted_extensions)
+            # Same negotiated settings, with encode() accounted in compression_stats
+            extension.__class__ = MeasuredPerMessageDeflate
+            return response_params, extension
+
+    def configured_deflate_factory() -> MeasuredDeflateFactory:
+        """permessage-deflate factory with the WS_DEFLATE_* settings from config"""
+        return MeasuredDeflateFactory(
+            server_no_context_takeover=WS_DEFLATE_SERVER_NO_CONTEXT_TAKEOVER,
+            client_no_context_takeover=WS_DEFLATE_CLIENT_NO_CONTEXT_TAKEOVER,
+            server_max_window_bits=WS_DEFLATE_WINDOW_BITS,
+            compress_settings={"level": WS_DEFLATE_LEVEL, "memLevel": WS_DEFLATE_MEM_LEVEL}
+        )
+
+
+def install_ws_deflate() -> bool:
+    """Use the tuned deflate factory in uvicorn's websockets protocol; False if unavailable.
+
+    The protocol class is resolved by uvicorn before the app is imported, and its
+    CLI only accepts protocol names, so the factory it instantiates is swapped instead.
+    """
+    if not WS_DEFLATE_AVAILABLE:
+        return False
+    websockets_impl.ServerPerMessageDeflateFactory = configured_deflate_factory
+    return True
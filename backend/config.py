@@ -1,7 +1,9 @@
 # Backend Configuration Settings
 # File: backend/config.py
 
+import json
 import os
+import secrets
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -11,21 +13,25 @@ load_dotenv()
 MQTT_BROKER_HOST = os.getenv('MQTT_BROKER_HOST', 'localhost')
 MQTT_BROKER_PORT = int(os.getenv('MQTT_BROKER_PORT', 1883))
 MQTT_KEEPALIVE = int(os.getenv('MQTT_KEEPALIVE', 60))
+# Start a local Mosquitto broker in the background when none is reachable
+MQTT_AUTOSTART_BROKER = os.getenv('MQTT_AUTOSTART_BROKER', 'True').lower() == 'true'
+MOSQUITTO_CONFIG = os.getenv('MOSQUITTO_CONFIG', '/etc/mosquitto/mosquitto.conf')
 
 # Robot Settings
 ROBOT_ID = os.getenv('ROBOT_ID', 'robot_001')
 PUBLISH_INTERVAL = float(os.getenv('PUBLISH_INTERVAL', 2.0))
 
-# Topic Structure
-TOPICS = {
-    'temperature': f'{ROBOT_ID}/sensors/temperature',
-    'battery': f'{ROBOT_ID}/sensors/battery',
-    'humidity': f'{ROBOT_ID}/sensors/humidity',
-    'location': f'{ROBOT_ID}/location',
-    'status': f'{ROBOT_ID}/status',
-    'motor_speed': f'{ROBOT_ID}/motor/speed',
-    'commands': f'{ROBOT_ID}/commands'
+# Topic Structure (per robot; the backend subscribes to these for every robot id)
+TOPIC_TEMPLATES = {
+    'temperature': '{robot_id}/sensors/temperature',
+    'battery': '{robot_id}/sensors/battery',
+    'humidity': '{robot_id}/sensors/humidity',
+    'location': '{robot_id}/location',
+    'status': '{robot_id}/status',
+    'motor_speed': '{robot_id}/motor/speed',
+    'commands': '{robot_id}/commands'
 }
+TOPICS = {name: template.format(robot_id=ROBOT_ID) for name, template in TOPIC_TEMPLATES.items()}
 
 # Sensor Simulation Ranges
 SENSOR_RANGES = {
@@ -42,4 +48,160 @@ ROBOT_STATUSES = ['idle', 'moving', 'charging', 'error', 'maintenance']
 
 # Debug Settings
 DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
-LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
\ No newline at end of file
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+# Simulation Settings
+SIM_TICK_INTERVAL = float(os.getenv('SIM_TICK_INTERVAL', 0.1))
+# What to do after missed ticks: 'catch_up' (several fixed steps) or 'skip' (one longer step)
+SIM_TICK_POLICY = os.getenv('SIM_TICK_POLICY', 'catch_up')
+# Most intervals of simulated time produced by one late tick; the rest is dropped
+SIM_MAX_CATCH_UP = int(os.getenv('SIM_MAX_CATCH_UP', 5))
+# Map pixels per second travelled by a robot at speed 1.0
+ROBOT_SPEED_SCALE = float(os.getenv('ROBOT_SPEED_SCALE', 100.0))
+# Number of worker processes running the movement loop (0 = run it in the API process)
+SIM_SHARDS = int(os.getenv('SIM_SHARDS', 0))
+# How robots are partitioned across shards: 'map', 'zone' or 'robot'
+SIM_SHARD_PARTITION = os.getenv('SIM_SHARD_PARTITION', 'robot')
+# Zones used by the 'zone' partition, as JSON: {"north": [x0, y0, x1, y1], ...}
+SIM_SHARD_ZONES = json.loads(os.getenv('SIM_SHARD_ZONES', '{}'))
+SIM_SHARD_START_METHOD = os.getenv('SIM_SHARD_START_METHOD') or None
+# Extra in-memory robots (sim_00000, ...) created at startup for capacity planning
+SIM_SYNTHETIC_ROBOTS = int(os.getenv('SIM_SYNTHETIC_ROBOTS', 0))
+# Simulation clock: 'real' (wall time), 'scaled' (SIM_CLOCK_SPEED x real time) or 'stepped'
+# (as fast as the CPU allows; runs in-process); SIM_CLOCK_UNTIL stops simulated time after that many seconds
+SIM_CLOCK = os.getenv('SIM_CLOCK', 'real')
+SIM_CLOCK_SPEED = float(os.getenv('SIM_CLOCK_SPEED', 1.0))
+SIM_CLOCK_UNTIL = float(os.getenv('SIM_CLOCK_UNTIL', 0))
+
+# State Log Settings (goal/command log with snapshot recovery)
+STATE_LOG_ENABLED = os.getenv('STATE_LOG_ENABLED', 'True').lower() == 'true'
+STATE_DIR = os.getenv('STATE_DIR', 'state')
+STATE_LOG_COMMIT_INTERVAL = float(os.getenv('STATE_LOG_COMMIT_INTERVAL', 0.05))
+STATE_SNAPSHOT_INTERVAL = float(os.getenv('STATE_SNAPSHOT_INTERVAL', 30.0))
+STATE_LOG_FSYNC = os.getenv('STATE_LOG_FSYNC', 'True').lower() == 'true'
+
+# Authentication Settings
+# Signs session tokens. A missing, placeholder or short key is replaced by a random one
+# (sessions then end on restart): a known key would let anyone forge an Admin token
+MIN_SECRET_KEY_LENGTH = 32
+SECRET_KEY_PLACEHOLDERS = {'your-secret-key-here', 'changeme', 'change-me', 'secret', 'secret-key'}
+SECRET_KEY = os.getenv('SECRET_KEY', '').strip()
+if not SECRET_KEY:
+    print("Warning: SECRET_KEY not set. Signing sessions with a random key; they end on restart.")
+    SECRET_KEY = secrets.token_hex(32)
+elif SECRET_KEY.lower() in SECRET_KEY_PLACEHOLDERS or len(SECRET_KEY) < MIN_SECRET_KEY_LENGTH:
+    print(f"WARNING: SECRET_KEY is a placeholder or shorter than {MIN_SECRET_KEY_LENGTH} characters and is IGNORED. "
+          "Signing sessions with a random key instead; set SECRET_KEY to a long random value "
+          "(python -c \"import secrets; print(secrets.token_hex(32))\").")
+    SECRET_KEY = secrets.token_hex(32)
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES', 1440))
+# PBKDF2-SHA256 iterations for stored passcodes (raise as hardware allows)
+PASSCODE_HASH_ITERATIONS = int(os.getenv('PASSCODE_HASH_ITERATIONS', 200000))
+# How long a verified token stays in the in-memory session cache (seconds)
+SESSION_CACHE_TTL = float(os.getenv('SESSION_CACHE_TTL', 300))
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv('SESSION_CACHE_MAX_ENTRIES', 10000))
+
+# Diagnostics Settings
+LOOP_WATCHDOG_INTERVAL = float(os.getenv('LOOP_WATCHDOG_INTERVAL', 0.1))
+# Log the loop thread's stack when the event loop is blocked longer than this (seconds)
+LOOP_STALL_THRESHOLD = float(os.getenv('LOOP_STALL_THRESHOLD', 0.25))
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', 30))
+PROCESS_STATS_INTERVAL = float(os.getenv('PROCESS_STATS_INTERVAL', 5.0))
+PROCESS_STATS_HISTORY = int(os.getenv('PROCESS_STATS_HISTORY', 120))
+
+# Trajectory Trail Settings
+# Samples kept per robot, and the minimum spacing between samples while moving (seconds)
+TRAIL_CAPACITY = int(os.getenv('TRAIL_CAPACITY', 3600))
+TRAIL_SAMPLE_INTERVAL = float(os.getenv('TRAIL_SAMPLE_INTERVAL', 1.0))
+
+# Analytics Aggregate Settings
+# Rolling window length and bucket width (seconds); old data leaves the window a bucket at a time
+ANALYTICS_WINDOW = float(os.getenv('ANALYTICS_WINDOW', 3600))
+ANALYTICS_BUCKET_SECONDS = float(os.getenv('ANALYTICS_BUCKET_SECONDS', 60))
+
+# Event Store Settings
+# Goal, command, enable/disable and anomaly events, written in batches of up to EVENT_BATCH_SIZE rows
+EVENT_STORE_ENABLED = os.getenv('EVENT_STORE_ENABLED', 'True').lower() == 'true'
+EVENT_DB_PATH = os.getenv('EVENT_DB_PATH', os.path.join(STATE_DIR, 'events.db'))
+EVENT_COMMIT_INTERVAL = float(os.getenv('EVENT_COMMIT_INTERVAL', 0.5))
+EVENT_BATCH_SIZE = int(os.getenv('EVENT_BATCH_SIZE', 5000))
+# Telemetry thresholds that log an anomaly when a robot crosses them for ANOMALY_MIN_SAMPLES
+# consecutive samples; it clears once the reading is back past the *_CLEAR threshold.
+# Defaults sit outside the simulated publisher's ranges (battery 20-100, temperature 25-30)
+ANOMALY_BATTERY_LOW = float(os.getenv('ANOMALY_BATTERY_LOW', 15))
+ANOMALY_BATTERY_CLEAR = float(os.getenv('ANOMALY_BATTERY_CLEAR', 20))
+ANOMALY_TEMPERATURE_HIGH = float(os.getenv('ANOMALY_TEMPERATURE_HIGH', 32))
+ANOMALY_TEMPERATURE_CLEAR = float(os.getenv('ANOMALY_TEMPERATURE_CLEAR', 30))
+ANOMALY_MIN_SAMPLES = int(os.getenv('ANOMALY_MIN_SAMPLES', 3))
+
+# Long-poll Settings
+# Upper bound on ?wait= for GET /status and GET /goals (seconds)
+LONG_POLL_MAX_WAIT = float(os.getenv('LONG_POLL_MAX_WAIT', 30))
+# Goal transitions kept for WebSocket clients resuming with ?mode=delta&boot_id=&since=;
+# a client whose gap reaches past the oldest kept transition gets a full snapshot
+REPLAY_BUFFER_SIZE = int(os.getenv('REPLAY_BUFFER_SIZE', 20000))
+# Robot removals remembered for ?since= reads and delta frames; a client whose version
+# is older than the oldest kept removal gets the full state
+CHANGE_FEED_MAX_REMOVED = int(os.getenv('CHANGE_FEED_MAX_REMOVED', 10000))
+
+# Compression Settings
+# permessage-deflate on /ws: zlib level (1-9), memLevel (1-9), server window bits (8-15), context takeover
+WS_PER_MESSAGE_DEFLATE = os.getenv('WS_PER_MESSAGE_DEFLATE', 'True').lower() == 'true'
+WS_DEFLATE_LEVEL = int(os.getenv('WS_DEFLATE_LEVEL', 3))
+WS_DEFLATE_MEM_LEVEL = int(os.getenv('WS_DEFLATE_MEM_LEVEL', 8))
+WS_DEFLATE_WINDOW_BITS = int(os.getenv('WS_DEFLATE_WINDOW_BITS', 15))
+WS_DEFLATE_SERVER_NO_CONTEXT_TAKEOVER = os.getenv('WS_DEFLATE_SERVER_NO_CONTEXT_TAKEOVER', 'False').lower() == 'true'
+WS_DEFLATE_CLIENT_NO_CONTEXT_TAKEOVER = os.getenv('WS_DEFLATE_CLIENT_NO_CONTEXT_TAKEOVER', 'False').lower() == 'true'
+# gzip/brotli for HTTP responses of at least HTTP_COMPRESSION_MIN_SIZE bytes
+HTTP_COMPRESSION_ENABLED = os.getenv('HTTP_COMPRESSION_ENABLED', 'True').lower() == 'true'
+HTTP_COMPRESSION_MIN_SIZE = int(os.getenv('HTTP_COMPRESSION_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))
+
+# Goal Dispatch Settings
+# Cost added per goal already queued on a robot (same units as distance), and the solver:
+# auto (optimal with scipy, otherwise greedy), optimal, or greedy
+DISPATCH_QUEUE_WEIGHT = float(os.getenv('DISPATCH_QUEUE_WEIGHT', 200.0))
+DISPATCH_SOLVER = os.getenv('DISPATCH_SOLVER', 'auto')
+DISPATCH_MAX_GOALS = int(os.getenv('DISPATCH_MAX_GOALS', 10000))
+
+# Emergency Stop Settings
+# Retained MQTT topic carrying the stop state, and how long a priority frame may take per client (seconds)
+ESTOP_MQTT_TOPIC = os.getenv('ESTOP_MQTT_TOPIC', 'robot/estop')
+ESTOP_SEND_TIMEOUT = float(os.getenv('ESTOP_SEND_TIMEOUT', 0.5))
+
+# Rate Limiting Settings
+# Token buckets per client (a known X-API-Key, the user of a valid bearer token, else the address):
+# requests per second and burst size.
+# Reads are GET/HEAD requests and WebSocket messages, mutations every other method; a rate of 0 disables a budget
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+RATE_LIMIT_READ_RATE = float(os.getenv('RATE_LIMIT_READ_RATE', 50))
+RATE_LIMIT_READ_BURST = float(os.getenv('RATE_LIMIT_READ_BURST', 100))
+RATE_LIMIT_MUTATION_RATE = float(os.getenv('RATE_LIMIT_MUTATION_RATE', 10))
+RATE_LIMIT_MUTATION_BURST = float(os.getenv('RATE_LIMIT_MUTATION_BURST', 20))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv('RATE_LIMIT_MAX_CLIENTS', 10000))
+# Comma-separated X-API-Key values that get a bucket of their own; any other key is charged to the address
+RATE_LIMIT_API_KEYS = {k.strip() for k in os.getenv('RATE_LIMIT_API_KEYS', '').split(',') if k.strip()}
+# Comma-separated path prefixes that are never limited (the E-stop must always get through;
+# robot telemetry is machine traffic and is coalesced before it touches robot_state)
+RATE_LIMIT_EXEMPT_PATHS = [p.strip() for p in os.getenv('RATE_LIMIT_EXEMPT_PATHS', '/health,/ready,/estop,/telemetry').split(',') if p.strip()]
+
+# Robot Status Persistence Settings
+# Live battery/status/last_updated written back to robot_setup every flush interval (seconds),
+# at most ROBOT_STATUS_BATCH_SIZE robots per flush, each robot once however often it changed
+ROBOT_STATUS_PERSIST = os.getenv('ROBOT_STATUS_PERSIST', 'True').lower() == 'true'
+ROBOT_STATUS_FLUSH_INTERVAL = float(os.getenv('ROBOT_STATUS_FLUSH_INTERVAL', 5.0))
+ROBOT_STATUS_BATCH_SIZE = int(os.getenv('ROBOT_STATUS_BATCH_SIZE', 1000))
+
+# Telemetry Ingest Settings
+# Subscribe to every robot's TOPIC_TEMPLATES topics; queued samples are applied every interval (seconds).
+# Robots that reported within TELEMETRY_FRESH_FOR seconds get no simulated sensor values
+TELEMETRY_MQTT_SUBSCRIBE = os.getenv('TELEMETRY_MQTT_SUBSCRIBE', 'True').lower() == 'true'
+TELEMETRY_APPLY_INTERVAL = float(os.getenv('TELEMETRY_APPLY_INTERVAL', 0.5))
+TELEMETRY_FRESH_FOR = float(os.getenv('TELEMETRY_FRESH_FOR', 10.0))
+TELEMETRY_MAX_BATCH = int(os.getenv('TELEMETRY_MAX_BATCH', 10000))
+
+# Geofence Zone Settings
+# Zones (per-map polygons in the zones table) are indexed on a grid of ZONE_CELL_SIZE map pixels;
+# smaller cells mean fewer point-in-polygon tests per check but a larger index
+ZONE_CELL_SIZE = float(os.getenv('ZONE_CELL_SIZE', 50.0))
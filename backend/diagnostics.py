@@ -0,0 +1,112 @@
+"""Event-loop lag watchdog and sampling profiler for the running server.
+
+``LoopWatchdog`` measures how late the event loop wakes a sleeping coroutine
+(scheduling lag). A helper thread notices when the loop stops beating
+altogether and captures the stack the loop thread is stuck in, which names
+the callback or coroutine hogging the loop.
+
+``sample_stacks`` samples every thread's stack at a fixed interval and
+returns counts in collapsed-stack format (``frame;frame;frame count``) that
+flamegraph.pl, speedscope or inferno can render directly.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, Optional
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LoopWatchdog:
+    def __init__(self, interval: float = 0.1, stall_threshold: float = 0.25, history: int = 600):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.lags = deque(maxlen=history)
+        self.stalls = deque(maxlen=20)
+        self.max_lag = 0.0
+        self.loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._reported_beat = None
+
+    async def run(self):
+        """Heartbeat coroutine; also starts the stall-detector thread"""
+        print("Loop watchdog started.")
+        self.loop_thread_id = threading.get_ident()
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - self._last_beat - self.interval
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval / 2)
+            beat = self._last_beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.stall_threshold or beat == self._reported_beat:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            self._reported_beat = beat
+            stack = "".join(traceback.format_stack(frame))
+            self.stalls.append({
+                "time": time.strftime("%H:%M:%S"),
+                "blocked_ms": round(blocked * 1000, 1),
+                "stack": stack
+            })
+            print(f"Event loop blocked for {blocked * 1000:.0f} ms, loop thread is at:\n{stack}")
+
+    def stats(self) -> Dict[str, Any]:
+        lags = list(self.lags)
+        return {
+            "interval_ms": round(self.interval * 1000, 1),
+            "stall_threshold_ms": round(self.stall_threshold * 1000, 1),
+            "last_lag_ms": round(lags[-1] * 1000, 2) if lags else 0.0,
+            "p50_lag_ms": round(_percentile(lags, 0.5) * 1000, 2),
+            "p99_lag_ms": round(_percentile(lags, 0.99) * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "stalls": list(self.stalls)
+        }
+
+
+def _frame_label(frame) -> str:
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+
+
+def sample_stacks(duration: float, interval: float = 0.005,
+                  thread_ids: Optional[Iterable[int]] = None) -> Counter:
+    """Sample thread stacks for ``duration`` seconds (blocking; run it in a worker thread)"""
+    counts: Counter = Counter()
+    me = threading.get_ident()
+    wanted = set(thread_ids) if thread_ids else None
+    names = {t.ident: t.name for t in threading.enumerate()}
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me or (wanted is not None and thread_id not in wanted):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}").replace(" ", "_"))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+
+def collapse(counts: Counter) -> str:
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
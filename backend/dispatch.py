@@ -0,0 +1,132 @@
+"""Fleet-level goal dispatch: assign unassigned goals to robots.
+
+The cost of giving a goal to a robot is the distance from where that robot
+will be when it finishes its current queue (its last pending goal, or its
+position when idle) plus ``queue_weight`` per goal already queued on it, so
+short trips lose out to idle robots that are a little further away.
+
+Solvers, best available first:
+- ``optimal``: with scipy, goals are assigned in rounds of at most one goal
+  per robot, each round an optimal assignment (``linear_sum_assignment``)
+  over a vectorised robots x goals cost matrix; robot tails and queue
+  lengths are updated between rounds.
+- ``greedy``: goals in request order each go to the cheapest robot at that
+  moment, vectorised over robots with numpy, or a plain Python loop.
+"""
+
+import math
+import time
+from typing import Any, Dict, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    print("Warning: numpy not installed. Goal dispatch will use the pure-Python greedy solver.")
+    NUMPY_AVAILABLE = False
+
+try:
+    from scipy.optimize import linear_sum_assignment
+    SCIPY_AVAILABLE = True
+except ImportError:
+    print("Warning: scipy not installed. Goal dispatch falls back to the greedy solver "
+          "(solver 'optimal' is refused); install requirements.txt for optimal assignment.")
+    SCIPY_AVAILABLE = False
+
+SOLVERS = ("auto", "optimal", "greedy")
+
+# (robot_id, tail_x, tail_y, queue_length)
+Candidate = Tuple[str, float, float, int]
+
+
+def robot_tail(robot: Dict[str, Any]) -> Tuple[float, float, int]:
+    """Where a robot will be once its pending goals are done, and how many are pending"""
+    pending = [g for g in robot["goals"] if g["status"] in ("current", "queued")]
+    if pending:
+        last = pending[-1]
+        return float(last["x"]), float(last["y"]), len(pending)
+    x, y = robot["position"]
+    return float(x), float(y), 0
+
+
+def _optimal(candidates, goals, queue_weight):
+    tails = np.array([(c[1], c[2]) for c in candidates], dtype=float)
+    queue = np.array([c[3] for c in candidates], dtype=float)
+    points = np.array(goals, dtype=float)
+    assigned = np.full(len(goals), -1)
+    costs = np.zeros(len(goals))
+    remaining = np.arange(len(goals))
+    while remaining.size:
+        cost = np.hypot(tails[:, 0:1] - points[remaining, 0], tails[:, 1:2] - points[remaining, 1])
+        cost += queue_weight * queue[:, None]
+        rows, cols = linear_sum_assignment(cost)
+        picked = remaining[cols]
+        assigned[picked] = rows
+        costs[picked] = cost[rows, cols]
+        tails[rows] = points[picked]
+        queue[rows] += 1
+        remaining = np.delete(remaining, cols)
+    return assigned.tolist(), costs.tolist()
+
+
+def _greedy_numpy(candidates, goals, queue_weight):
+    tails = np.array([(c[1], c[2]) for c in candidates], dtype=float)
+    penalty = queue_weight * np.array([c[3] for c in candidates], dtype=float)
+    assigned, costs = [], []
+    for x, y in goals:
+        cost = np.hypot(tails[:, 0] - x, tails[:, 1] - y) + penalty
+        best = int(cost.argmin())
+        assigned.append(best)
+        costs.append(float(cost[best]))
+        tails[best] = (x, y)
+        penalty[best] += queue_weight
+    return assigned, costs
+
+
+def _greedy_python(candidates, goals, queue_weight):
+    xs = [c[1] for c in candidates]
+    ys = [c[2] for c in candidates]
+    penalty = [queue_weight * c[3] for c in candidates]
+    hypot = math.hypot
+    indices = range(len(candidates))
+    assigned, costs = [], []
+    for x, y in goals:
+        best, best_cost = 0, math.inf
+        for i in indices:
+            # The queue penalty alone is a lower bound on the cost
+            if penalty[i] >= best_cost:
+                continue
+            cost = hypot(xs[i] - x, ys[i] - y) + penalty[i]
+            if cost < best_cost:
+                best, best_cost = i, cost
+        assigned.append(best)
+        costs.append(best_cost)
+        xs[best], ys[best] = x, y
+        penalty[best] += queue_weight
+    return assigned, costs
+
+
+def assign_goals(candidates: Sequence[Candidate], goals: Sequence[Tuple[float, float]],
+                 queue_weight: float, solver: str = "auto") -> Dict[str, Any]:
+    """Pick a robot for every goal; returns robot ids and costs in goal order"""
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}', expected one of {SOLVERS}")
+    if solver == "optimal" and not SCIPY_AVAILABLE:
+        raise ValueError("The optimal solver needs scipy")
+    started = time.perf_counter()
+    if solver != "greedy" and SCIPY_AVAILABLE:
+        used = "optimal"
+        assigned, costs = _optimal(candidates, goals, queue_weight)
+    elif NUMPY_AVAILABLE:
+        used = "greedy-numpy"
+        assigned, costs = _greedy_numpy(candidates, goals, queue_weight)
+    else:
+        used = "greedy"
+        assigned, costs = _greedy_python(candidates, goals, queue_weight)
+    return {
+        "robot_ids": [candidates[i][0] for i in assigned],
+        "costs": costs,
+        "total_cost": round(sum(costs), 2),
+        "solver": used,
+        "solve_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
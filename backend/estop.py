@@ -0,0 +1,92 @@
+"""System-wide emergency stop state and latency accounting.
+
+``main.engage_estop`` does the fan-out in priority order: the MQTT stop
+first, then halting the simulation, then a tiny ``{"type": "estop"}`` frame
+sent to every WebSocket client concurrently, and only then the ordinary
+state broadcast and logging. This module keeps the state and the timings.
+
+Latency is measured in two places: server-side (request received to MQTT
+publish queued and to all priority frames written), and delivery, when a
+client acknowledges a frame with ``{"type": "estop_ack", "seq": n}``.
+"""
+
+import json
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+
+
+class EmergencyStop:
+    def __init__(self, history: int = 500):
+        self.active = False
+        self.seq = 0
+        self.since: Optional[float] = None
+        self.reason: Optional[str] = None
+        self.source: Optional[str] = None
+        self._engaged_at = 0.0
+        self._acked = set()
+        self.engage_ms = deque(maxlen=history)
+        self.mqtt_ms = deque(maxlen=history)
+        self.delivery_ms = deque(maxlen=history)
+        self.last: Dict[str, Any] = {}
+
+    def engage(self, reason: Optional[str], source: str, started: float) -> bool:
+        """Mark the stop active; False if it already was"""
+        if self.active:
+            return False
+        self.active = True
+        self.seq += 1
+        self.since = time.time()
+        self.reason = reason
+        self.source = source
+        self._engaged_at = started
+        self._acked = set()
+        return True
+
+    def release(self):
+        self.active = False
+        self.seq += 1
+        self.since = time.time()
+        self.reason = None
+        self.source = None
+
+    def frame(self) -> str:
+        """The priority WebSocket frame, kept small so it is never queued behind much"""
+        return json.dumps({"type": "estop", "active": self.active, "seq": self.seq, "t": round(time.time(), 3)},
+                          separators=(",", ":"))
+
+    def record_fanout(self, mqtt_done: float, frames_done: float, clients: int):
+        mqtt = (mqtt_done - self._engaged_at) * 1000
+        engage = (frames_done - self._engaged_at) * 1000
+        self.mqtt_ms.append(mqtt)
+        self.engage_ms.append(engage)
+        self.last = {"seq": self.seq, "mqtt_ms": round(mqtt, 2), "frames_ms": round(engage, 2), "clients": clients}
+
+    def record_ack(self, client_id: int, seq: Any):
+        """Delivery latency of the current stop to one client (counted once per client)"""
+        if not self.active or seq != self.seq or client_id in self._acked:
+            return
+        self._acked.add(client_id)
+        self.delivery_ms.append((time.perf_counter() - self._engaged_at) * 1000)
+
+    def state(self) -> Dict[str, Any]:
+        return {"active": self.active, "seq": self.seq, "since": self.since, "reason": self.reason, "source": self.source}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "last": self.last,
+            "acks_for_current": len(self._acked) if self.active else 0,
+            "mqtt_ms": {"p50": _percentile(self.mqtt_ms, 0.5), "p99": _percentile(self.mqtt_ms, 0.99)},
+            "frames_ms": {"p50": _percentile(self.engage_ms, 0.5), "p99": _percentile(self.engage_ms, 0.99),
+                          "max": round(max(self.engage_ms), 2) if self.engage_ms else None},
+            "delivery_ms": {"count": len(self.delivery_ms), "p50": _percentile(self.delivery_ms, 0.5),
+                            "p99": _percentile(self.delivery_ms, 0.99),
+                            "max": round(max(self.delivery_ms), 2) if self.delivery_ms else None}
+        }
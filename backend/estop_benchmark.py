@@ -0,0 +1,117 @@
+"""Measure E-stop latency against a running server under load.
+
+Opens ``--clients`` WebSocket connections that keep consuming full-state
+broadcasts, keeps the fleet moving with dispatched goals, then engages and
+releases the E-stop ``--rounds`` times. For every round it reports how long
+the POST took and how long until each client received the priority frame,
+plus the server's own fan-out and acknowledged-delivery stats.
+
+Start the server with a large fleet for a full-load run, e.g.
+    SIM_SYNTHETIC_ROBOTS=2000 python main.py
+    python estop_benchmark.py --clients 50 --emp-id <admin id> --passcode <passcode>
+Releasing needs an admin session when auth is enabled.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import urllib.request
+
+import websockets
+
+
+def http(method, url, body=None, token=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method)
+    request.add_header("Content-Type", "application/json")
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read() or b"null")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Client:
+    def __init__(self, url):
+        self.url = url
+        self.frames = 0
+        self.received = {}
+
+    async def run(self, ready):
+        async with websockets.connect(self.url, max_size=None) as ws:
+            ready.release()
+            async for message in ws:
+                self.frames += 1
+                if message.startswith('{"type":"estop"'):
+                    frame = json.loads(message)
+                    self.received[(frame["seq"], frame["active"])] = time.perf_counter()
+                    if frame["active"]:
+                        await ws.send(json.dumps({"type": "estop_ack", "seq": frame["seq"]}))
+
+
+async def main(args):
+    base = args.url.rstrip("/")
+    ws_url = base.replace("http", "ws", 1) + "/ws"
+    token = args.token
+    if not token and args.emp_id:
+        token = http("POST", f"{base}/auth/login", {"employee_id": args.emp_id, "passcode": args.passcode})["token"]
+
+    loop = asyncio.get_running_loop()
+    status = await loop.run_in_executor(None, http, "GET", f"{base}/status")
+    print(f"Fleet: {len(status['robots'])} robots; connecting {args.clients} WebSocket clients")
+
+    ready = asyncio.Semaphore(0)
+    clients = [Client(ws_url) for _ in range(args.clients)]
+    tasks = [asyncio.create_task(client.run(ready)) for client in clients]
+    for _ in clients:
+        await ready.acquire()
+
+    post_ms, frame_ms = [], []
+    for round_index in range(args.rounds):
+        # Keep robots moving so the movement loop and broadcasts are busy
+        goals = [{"x": random.uniform(0, args.area), "y": random.uniform(0, args.area)} for _ in range(args.goals)]
+        await loop.run_in_executor(None, http, "POST", f"{base}/goal/dispatch", {"goals": goals})
+        await asyncio.sleep(args.settle)
+
+        started = time.perf_counter()
+        result = await loop.run_in_executor(None, http, "POST", f"{base}/estop", {"reason": "benchmark"})
+        post_ms.append((time.perf_counter() - started) * 1000)
+        seq = result["estop"]["seq"]
+        await asyncio.sleep(args.settle)
+        latencies = [(c.received[(seq, True)] - started) * 1000 for c in clients if (seq, True) in c.received]
+        frame_ms.extend(latencies)
+        print(f"round {round_index + 1}: POST {post_ms[-1]:.1f} ms, frame delivered to {len(latencies)}/{len(clients)} "
+              f"clients, max {max(latencies, default=float('nan')):.1f} ms, server fan-out {result['latency']}")
+
+        await loop.run_in_executor(None, http, "POST", f"{base}/estop/release", None, token)
+
+    if frame_ms:
+        print(f"\nPOST /estop       p50 {statistics.median(post_ms):.1f} ms  max {max(post_ms):.1f} ms")
+        print(f"Frame at client   p50 {percentile(frame_ms, 0.5):.1f} ms  p99 {percentile(frame_ms, 0.99):.1f} ms  "
+              f"max {max(frame_ms):.1f} ms  ({len(frame_ms)} deliveries)")
+    print(f"State frames consumed: {sum(c.frames for c in clients)}")
+    server = await loop.run_in_executor(None, http, "GET", f"{base}/estop")
+    print("Server stats:", json.dumps(server["latency"], indent=2))
+    for task in tasks:
+        task.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--goals", type=int, default=500, help="goals dispatched before each round")
+    parser.add_argument("--area", type=float, default=1000.0, help="goals are spread over area x area")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds to wait around each stop")
+    parser.add_argument("--token", help="admin session token for releasing the stop")
+    parser.add_argument("--emp-id", help="admin employee id to log in with")
+    parser.add_argument("--passcode", help="admin passcode")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,219 @@
+"""Append-only, searchable event log kept in SQLite.
+
+Goal transitions, commands, robot enable/disable, telemetry anomalies,
+emergency stops and zone entries/exits are queued in memory by ``record`` and written by one
+background task in batched transactions, so recording an event never touches
+the disk on the event loop. Rows are indexed by ``(robot_id, ts)`` and
+``ts``, and their message text is mirrored into an FTS5 table for full-text
+search.
+
+Search pages with a keyset cursor (``before`` = the smallest id of the
+previous page) instead of OFFSET, so deep pages cost the same as the first.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+EVENT_KINDS = ("goal", "command", "robot", "anomaly", "estop", "zone")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    robot_id TEXT,
+    kind TEXT NOT NULL,
+    level TEXT NOT NULL,
+    message TEXT NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_robot_ts ON events (robot_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+    message, robot_id, kind, content='events', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+    INSERT INTO events_fts (rowid, message, robot_id, kind) VALUES (new.id, new.message, new.robot_id, new.kind);
+END;
+"""
+
+COLUMNS = ("id", "ts", "robot_id", "kind", "level", "message", "data")
+
+
+class SearchError(ValueError):
+    """Raised for a full-text query SQLite cannot parse"""
+
+
+def describe_op(op: Dict[str, Any]) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """Map a robot_state mutation op to (kind, message, data), or None if it is not an event"""
+    kind = op["op"]
+    robot_id = op["robot_id"]
+    if kind == "goal_add":
+        goal = op["goal"]
+        return "goal", f"Goal {goal['id']} queued for {robot_id} at ({goal['x']}, {goal['y']})", {"goal_id": goal["id"]}
+    if kind == "goal_update":
+        return "goal", f"Goal {op['goal_id']} of {robot_id} set to {op['status']}", {"goal_id": op["goal_id"], "status": op["status"]}
+    if kind == "cancel":
+        return "goal", f"Goals of {robot_id} cancelled", {}
+    if kind == "command":
+        return "command", f"Command {op['type']} sent to {robot_id}", {"type": op["type"], "parameters": op.get("parameters", {})}
+    if kind == "remove":
+        return "robot", f"Robot {robot_id} removed from the simulation", {}
+    return None
+
+
+class EventStore:
+    def __init__(self, path: str, commit_interval: float = 0.5, batch_size: int = 5000):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.batch_size = batch_size
+        self.fts_available = False
+        self._pending: List[tuple] = []
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {"commits": 0, "events": 0, "last_commit_ms": 0.0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def open(self):
+        """Create the schema and the writer connection (blocking; run it in a worker thread)"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            self.fts_available = True
+        except sqlite3.OperationalError as e:
+            print(f"Warning: SQLite FTS5 unavailable ({e}). Event search falls back to LIKE.")
+        self._conn.commit()
+
+    @property
+    def is_open(self) -> bool:
+        return self._conn is not None
+
+    def record(self, kind: str, message: str, robot_id: Optional[str] = None,
+               data: Optional[Dict[str, Any]] = None, level: str = "info", ts: Optional[float] = None):
+        """Queue an event for the next batch"""
+        ts = time.time() if ts is None else ts
+        self._pending.append((ts, robot_id, kind, level, message, json.dumps(data) if data else None))
+
+    def record_op(self, op: Dict[str, Any]):
+        described = describe_op(op)
+        if described:
+            kind, message, data = described
+            self.record(kind, message, op["robot_id"], data)
+
+    def _write(self, rows: List[tuple]):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO events (ts, robot_id, kind, level, message, data) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    async def commit(self):
+        """Write queued events, batch_size rows per transaction"""
+        if not self._pending or self._conn is None:
+            return
+        started = time.perf_counter()
+        rows, self._pending = self._pending, []
+        for i in range(0, len(rows), self.batch_size):
+            await asyncio.to_thread(self._write, rows[i:i + self.batch_size])
+            self.stats["commits"] += 1
+        self.stats["events"] += len(rows)
+        self.stats["last_commit_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def run(self):
+        """Background task: write queued events every commit_interval"""
+        print("Event store task started.")
+        while True:
+            try:
+                await asyncio.sleep(self.commit_interval)
+                await self.commit()
+            except asyncio.CancelledError:
+                await self.commit()
+                raise
+            except Exception as e:
+                print(f"Error in event store task: {e}")
+                await asyncio.sleep(1)
+
+    async def close(self):
+        await self.commit()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _query(self, q: Optional[str], robot_id: Optional[str], kind: Optional[str],
+               since: Optional[float], until: Optional[float], before: Optional[int]) -> Tuple[str, list]:
+        select = "SELECT e.id, e.ts, e.robot_id, e.kind, e.level, e.message, e.data FROM events e"
+        where, params = [], []
+        if q:
+            if self.fts_available:
+                select += " JOIN events_fts f ON f.rowid = e.id"
+                where.append("events_fts MATCH ?")
+                params.append(q)
+            else:
+                where.append("e.message LIKE ?")
+                params.append(f"%{q}%")
+        if robot_id is not None:
+            where.append("e.robot_id = ?")
+            params.append(robot_id)
+        if kind is not None:
+            where.append("e.kind = ?")
+            params.append(kind)
+        if since is not None:
+            where.append("e.ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("e.ts <= ?")
+            params.append(until)
+        if before is not None:
+            where.append("e.id < ?")
+            params.append(before)
+        sql = select + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY e.id DESC"
+        return sql, params
+
+    @staticmethod
+    def _row(row) -> Dict[str, Any]:
+        event = dict(zip(COLUMNS, row))
+        event["data"] = json.loads(event["data"]) if event["data"] else None
+        return event
+
+    def search(self, q: Optional[str] = None, robot_id: Optional[str] = None, kind: Optional[str] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               before: Optional[int] = None, limit: int = 100) -> Dict[str, Any]:
+        """One page of events, newest first; pass next_before back as before for the next page"""
+        sql, params = self._query(q, robot_id, kind, since, until, before)
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql + " LIMIT ?", params + [limit]).fetchall()
+        except sqlite3.OperationalError as e:
+            raise SearchError(str(e))
+        finally:
+            conn.close()
+        events = [self._row(row) for row in rows]
+        return {"events": events, "next_before": events[-1]["id"] if len(events) == limit else None}
+
+    def export(self, q: Optional[str] = None, robot_id: Optional[str] = None, kind: Optional[str] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               chunk_size: int = 1000) -> Iterator[str]:
+        """Yield matching events as NDJSON, chunk_size lines at a time"""
+        sql, params = self._query(q, robot_id, kind, since, until, None)
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield "".join(json.dumps(self._row(row)) + "\n" for row in rows)
+        finally:
+            conn.close()
@@ -0,0 +1,327 @@
+"""Fleet simulator: telemetry from thousands of robots for load testing.
+
+Spawns ``--workers`` processes, each simulating its slice of ``--robots``
+robots with drifting state: battery drains faster the harder the motors
+work and recharges when low, temperature follows motor load with some lag,
+robots wander inside the ``SENSOR_RANGES`` area and move between the
+``ROBOT_STATUSES``. Readings are sent at ``--rate`` robot readings per
+second across all workers, oldest-updated robot first, either
+
+- ``--transport mqtt``: one message per field on the robot's
+  ``TOPIC_TEMPLATES`` topics (so one reading is six MQTT messages), or
+- ``--transport http``: batches of ``--batch`` readings to
+  ``POST /telemetry/batch``.
+
+The achieved rate is reported every ``--report-every`` seconds and at the end,
+with the backend's own ingest rate from ``/telemetry/stats`` when ``--url`` is
+set. Robot ids default to ``sim_00000`` and up, the ids the backend gives
+``SIM_SYNTHETIC_ROBOTS``, so the samples land on live robots:
+
+    SIM_SYNTHETIC_ROBOTS=20000 python main.py
+    python fleet_simulator.py --robots 20000 --workers 4 --rate 10000 --url http://127.0.0.1:8000
+    python fleet_simulator.py --robots 20000 --rate 10000 --transport http --url http://127.0.0.1:8000
+"""
+
+import argparse
+import http.client
+import json
+import math
+import multiprocessing
+import queue
+import random
+import time
+import urllib.parse
+import urllib.request
+
+from config import MQTT_BROKER_HOST, MQTT_BROKER_PORT, MQTT_KEEPALIVE, TOPIC_TEMPLATES, SENSOR_RANGES, ROBOT_STATUSES
+
+try:
+    import paho.mqtt.client as mqtt
+    MQTT_AVAILABLE = True
+except ImportError:
+    print("Warning: paho-mqtt not installed. Only --transport http is available.")
+    MQTT_AVAILABLE = False
+
+TELEMETRY_FIELDS = ("battery", "temperature", "humidity", "location", "status", "motor_speed")
+AMBIENT_TEMPERATURE = 22.0
+
+
+def clamp(value, name):
+    bounds = SENSOR_RANGES[name]
+    return min(bounds["max"], max(bounds["min"], value))
+
+
+class RobotSlice:
+    """State of one worker's robots, kept in parallel lists"""
+
+    def __init__(self, robot_ids, seed):
+        self.rng = random.Random(seed)
+        rng = self.rng
+        n = len(robot_ids)
+        self.ids = robot_ids
+        battery = SENSOR_RANGES["battery"]
+        self.battery = [rng.uniform(battery["min"] + 30, battery["max"]) for _ in range(n)]
+        self.temperature = [AMBIENT_TEMPERATURE + rng.uniform(0, 3) for _ in range(n)]
+        self.humidity = [rng.uniform(SENSOR_RANGES["humidity"]["min"], SENSOR_RANGES["humidity"]["max"]) for _ in range(n)]
+        self.x = [rng.uniform(SENSOR_RANGES["location_x"]["min"], SENSOR_RANGES["location_x"]["max"]) for _ in range(n)]
+        self.y = [rng.uniform(SENSOR_RANGES["location_y"]["min"], SENSOR_RANGES["location_y"]["max"]) for _ in range(n)]
+        self.heading = [rng.uniform(0, 2 * math.pi) for _ in range(n)]
+        self.speed = [0.0] * n
+        self.status = [rng.choice(("idle", "moving")) for _ in range(n)]
+        self.updated = [time.monotonic()] * n
+        self.cursor = 0
+
+    def _advance(self, i, now):
+        rng = self.rng
+        dt = min(now - self.updated[i], 60.0)
+        self.updated[i] = now
+        status = self.status[i]
+
+        # Status changes, each a Poisson process over the elapsed time
+        if status == "idle" and rng.random() < dt / 30:
+            status = "moving"
+        elif status == "moving" and rng.random() < dt / 90:
+            status = "idle"
+        elif status in ("error", "maintenance") and rng.random() < dt / 45:
+            status = "idle"
+        if status != "charging" and self.battery[i] < 20:
+            status = "charging"
+        elif status == "charging" and self.battery[i] >= SENSOR_RANGES["battery"]["max"] - 1:
+            status = "idle"
+        elif status in ("idle", "moving") and rng.random() < dt / 7200:
+            status = rng.choice([s for s in ROBOT_STATUSES if s in ("error", "maintenance")] or ["error"])
+        self.status[i] = status
+
+        # Motors: wandering speed while moving, stopped otherwise
+        if status == "moving":
+            self.speed[i] = clamp(self.speed[i] + rng.gauss(0, 8) * math.sqrt(dt) + (60 - self.speed[i]) * 0.1, "motor_speed")
+        else:
+            self.speed[i] = 0.0
+        load = self.speed[i] / 100
+
+        # Battery: idle draw plus motor draw (% per minute), or charging
+        if status == "charging":
+            self.battery[i] = clamp(self.battery[i] + 5.0 * dt / 60, "battery")
+        else:
+            self.battery[i] = clamp(self.battery[i] - (0.05 + 0.6 * load) * dt / 60, "battery")
+
+        # Temperature relaxes towards ambient plus motor and charging heat
+        target = AMBIENT_TEMPERATURE + 8 * load + (2 if status == "charging" else 0)
+        self.temperature[i] = clamp(self.temperature[i] + (target - self.temperature[i]) * min(1.0, dt / 60)
+                                    + rng.gauss(0, 0.05), "temperature")
+        self.humidity[i] = clamp(self.humidity[i] + rng.gauss(0, 0.2) * math.sqrt(dt), "humidity")
+
+        # Motion: heading drifts, robots bounce off the area edges
+        if load:
+            self.heading[i] += rng.gauss(0, 0.3) * math.sqrt(dt)
+            distance = load * 1.5 * dt
+            x = self.x[i] + math.cos(self.heading[i]) * distance
+            y = self.y[i] + math.sin(self.heading[i]) * distance
+            if x != clamp(x, "location_x") or y != clamp(y, "location_y"):
+                self.heading[i] += math.pi
+            self.x[i], self.y[i] = clamp(x, "location_x"), clamp(y, "location_y")
+
+    def readings(self, count, now):
+        """Advance and read the next ``count`` robots, round robin"""
+        n = len(self.ids)
+        out = []
+        for _ in range(count):
+            i = self.cursor
+            self.cursor = (i + 1) % n
+            self._advance(i, now)
+            out.append({
+                "robot_id": self.ids[i],
+                "battery": round(self.battery[i], 1),
+                "temperature": round(self.temperature[i], 2),
+                "humidity": round(self.humidity[i], 1),
+                "location": [round(self.x[i], 2), round(self.y[i], 2)],
+                "status": self.status[i],
+                "motor_speed": round(self.speed[i], 1)
+            })
+        return out
+
+
+class MqttSender:
+    def __init__(self, host, port):
+        self.client = mqtt.Client()
+        self.client.connect(host, port, MQTT_KEEPALIVE)
+        self.client.loop_start()
+        self.topics = {field: TOPIC_TEMPLATES[field] for field in TELEMETRY_FIELDS}
+        self.messages = 0
+        self.errors = 0
+
+    def send(self, readings):
+        publish = self.client.publish
+        for reading in readings:
+            robot_id = reading["robot_id"]
+            for field, template in self.topics.items():
+                value = reading[field]
+                payload = json.dumps(value) if field == "location" else str(value)
+                if publish(template.format(robot_id=robot_id), payload).rc != mqtt.MQTT_ERR_SUCCESS:
+                    self.errors += 1
+                self.messages += 1
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+class HttpSender:
+    def __init__(self, url, batch):
+        parsed = urllib.parse.urlsplit(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.path = parsed.path.rstrip("/") + "/telemetry/batch"
+        self.batch = batch
+        self.connection = None
+        self.buffer = []
+        self.buffered_at = 0.0
+        self.messages = 0
+        self.errors = 0
+
+    def _post(self, body):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            self.connection.request("POST", self.path, body, {"Content-Type": "application/json"})
+            response = self.connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                self.errors += 1
+        except (OSError, http.client.HTTPException):
+            self.errors += 1
+            self.connection.close()
+            self.connection = None
+
+    def send(self, readings, flush=False):
+        """Buffer readings; post once a batch is full or the oldest has waited 0.2 s"""
+        if not self.buffer:
+            self.buffered_at = time.monotonic()
+        self.buffer.extend(readings)
+        if not flush and len(self.buffer) < self.batch and time.monotonic() - self.buffered_at < 0.2:
+            return
+        buffer, self.buffer = self.buffer, []
+        for i in range(0, len(buffer), self.batch):
+            self._post(json.dumps({"samples": buffer[i:i + self.batch]}, separators=(",", ":")))
+            self.messages += 1
+
+    def close(self):
+        if self.buffer:
+            self.send([], flush=True)
+        if self.connection is not None:
+            self.connection.close()
+
+
+def worker(index, robot_ids, args, results, stop):
+    """Send this worker's share of the rate; report cumulative counts about once a second"""
+    robots = RobotSlice(robot_ids, seed=args.seed + index)
+    if args.transport == "mqtt":
+        sender = MqttSender(args.mqtt_host, args.mqtt_port)
+    else:
+        sender = HttpSender(args.url, args.batch)
+    rate = args.rate / args.workers
+    # Never send more than a fifth of a second's readings at once, so pacing stays smooth
+    chunk = max(1, int(rate / 5))
+    started = time.perf_counter()
+    sent = 0
+    reported = started
+    try:
+        while not stop.is_set():
+            now = time.perf_counter()
+            if args.duration and now - started >= args.duration:
+                break
+            due = int(rate * (now - started)) - sent
+            if due <= 0:
+                time.sleep(min(0.01, (sent + 1 - rate * (now - started)) / rate))
+                continue
+            due = min(due, chunk)
+            sender.send(robots.readings(due, time.monotonic()))
+            sent += due
+            if now - reported >= 1.0:
+                results.put((index, sent, sender.messages, sender.errors))
+                reported = now
+    finally:
+        results.put((index, sent, sender.messages, sender.errors))
+        sender.close()
+
+
+def backend_rate(url):
+    try:
+        with urllib.request.urlopen(url.rstrip("/") + "/telemetry/stats", timeout=2) as response:
+            return json.loads(response.read()).get("samples_per_second")
+    except Exception:
+        return None
+
+
+def main(args):
+    if args.transport == "mqtt" and not MQTT_AVAILABLE:
+        raise SystemExit("--transport mqtt needs paho-mqtt")
+    if args.transport == "http" and not args.url:
+        raise SystemExit("--transport http needs --url")
+    args.workers = max(1, min(args.workers, args.robots))
+    ids = [f"{args.prefix}{i:05d}" for i in range(args.robots)]
+    ctx = multiprocessing.get_context()
+    results = ctx.Queue()
+    stop = ctx.Event()
+    processes = [
+        ctx.Process(target=worker, args=(w, ids[w::args.workers], args, results, stop), name=f"fleet-sim-{w}", daemon=True)
+        for w in range(args.workers)
+    ]
+    unit = "MQTT messages" if args.transport == "mqtt" else "HTTP batches"
+    print(f"Simulating {args.robots} robots in {args.workers} workers at {args.rate:.0f} readings/s over {args.transport}")
+    for process in processes:
+        process.start()
+
+    counts = {}
+    started = time.perf_counter()
+    last_time, last_sent = started, 0
+    next_report = started + args.report_every
+    try:
+        while any(p.is_alive() for p in processes) or not results.empty():
+            try:
+                index, sent, messages, errors = results.get(timeout=0.2)
+                counts[index] = (sent, messages, errors)
+            except queue.Empty:
+                pass
+            now = time.perf_counter()
+            if now >= next_report:
+                total = sum(c[0] for c in counts.values())
+                line = (f"[{now - started:6.1f}s] {(total - last_sent) / (now - last_time):9.0f} readings/s "
+                        f"(target {args.rate:.0f}), {sum(c[1] for c in counts.values())} {unit}, "
+                        f"{sum(c[2] for c in counts.values())} errors")
+                if args.url:
+                    line += f", backend ingest {backend_rate(args.url)} samples/s"
+                print(line)
+                last_time, last_sent = now, total
+                next_report = now + args.report_every
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for process in processes:
+            process.join(timeout=5)
+
+    elapsed = time.perf_counter() - started
+    total = sum(c[0] for c in counts.values())
+    achieved = total / elapsed if elapsed else 0.0
+    print(f"\nSent {total} readings in {elapsed:.1f}s: {achieved:.0f} readings/s, "
+          f"{100 * achieved / args.rate:.1f}% of the {args.rate:.0f}/s target")
+    print(f"{sum(c[1] for c in counts.values())} {unit}, {sum(c[2] for c in counts.values())} errors")
+    for index in sorted(counts):
+        print(f"  worker {index}: {counts[index][0] / elapsed:.0f} readings/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--robots", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--rate", type=float, default=5000.0, help="robot readings per second, all workers together")
+    parser.add_argument("--duration", type=float, default=0.0, help="seconds to run (0 = until interrupted)")
+    parser.add_argument("--transport", choices=("mqtt", "http"), default="mqtt")
+    parser.add_argument("--url", help="backend base URL, for --transport http and backend ingest stats")
+    parser.add_argument("--batch", type=int, default=500, help="readings per HTTP request")
+    parser.add_argument("--mqtt-host", default=MQTT_BROKER_HOST)
+    parser.add_argument("--mqtt-port", type=int, default=MQTT_BROKER_PORT)
+    parser.add_argument("--prefix", default="sim_", help="robot ids are <prefix>00000, <prefix>00001, ...")
+    parser.add_argument("--report-every", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
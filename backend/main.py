@@ -1,6 +1,11 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Path, UploadFile, File, Form
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Path, UploadFile, File, Form, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
@@ -14,15 +19,52 @@ import shutil
 from pydantic import ValidationError
 import sqlite3
 import contextlib
-import subprocess
-import time
+import threading
+from config import (
+    MQTT_BROKER_HOST, MQTT_BROKER_PORT, MQTT_KEEPALIVE, MQTT_AUTOSTART_BROKER, MOSQUITTO_CONFIG,
+    SIM_TICK_INTERVAL, SIM_TICK_POLICY, SIM_MAX_CATCH_UP, ROBOT_SPEED_SCALE, SIM_SHARDS, SIM_SHARD_PARTITION, SIM_SHARD_ZONES,
+    SIM_SHARD_START_METHOD, SIM_SYNTHETIC_ROBOTS, STATE_LOG_ENABLED, STATE_DIR,
+    STATE_LOG_COMMIT_INTERVAL, STATE_SNAPSHOT_INTERVAL, STATE_LOG_FSYNC,
+    LOOP_WATCHDOG_INTERVAL, LOOP_STALL_THRESHOLD, PROFILE_MAX_SECONDS,
+    PROCESS_STATS_INTERVAL, PROCESS_STATS_HISTORY, TRAIL_CAPACITY, TRAIL_SAMPLE_INTERVAL,
+    ANALYTICS_WINDOW, ANALYTICS_BUCKET_SECONDS, EVENT_STORE_ENABLED, EVENT_DB_PATH,
+    EVENT_COMMIT_INTERVAL, EVENT_BATCH_SIZE, ANOMALY_BATTERY_LOW, ANOMALY_TEMPERATURE_HIGH,
+    ANOMALY_BATTERY_CLEAR, ANOMALY_TEMPERATURE_CLEAR, ANOMALY_MIN_SAMPLES,
+    LONG_POLL_MAX_WAIT, WS_PER_MESSAGE_DEFLATE, HTTP_COMPRESSION_ENABLED, HTTP_COMPRESSION_MIN_SIZE,
+    GZIP_LEVEL, BROTLI_QUALITY, DISPATCH_QUEUE_WEIGHT, DISPATCH_SOLVER, DISPATCH_MAX_GOALS,
+    ESTOP_MQTT_TOPIC, ESTOP_SEND_TIMEOUT, RATE_LIMIT_ENABLED, RATE_LIMIT_READ_RATE, RATE_LIMIT_READ_BURST,
+    RATE_LIMIT_MUTATION_RATE, RATE_LIMIT_MUTATION_BURST, RATE_LIMIT_MAX_CLIENTS, RATE_LIMIT_EXEMPT_PATHS, RATE_LIMIT_API_KEYS,
+    ROBOT_STATUS_PERSIST, ROBOT_STATUS_FLUSH_INTERVAL, ROBOT_STATUS_BATCH_SIZE,
+    SIM_CLOCK, SIM_CLOCK_SPEED, SIM_CLOCK_UNTIL, TOPIC_TEMPLATES, TELEMETRY_MQTT_SUBSCRIBE,
+    TELEMETRY_APPLY_INTERVAL, TELEMETRY_FRESH_FOR, TELEMETRY_MAX_BATCH, REPLAY_BUFFER_SIZE, ZONE_CELL_SIZE,
+    CHANGE_FEED_MAX_REMOVED
+)
+from simulation import new_robot, advance_robot, make_pose, apply_pose, apply_op
+from scheduler import FixedTimestepScheduler
+from sim_clock import SimClock
+from sharding import ShardPool
+from state_log import StateLog
+from diagnostics import LoopWatchdog, sample_stacks, collapse
+from process_stats import ProcessStatsCollector
+from trails import TrailStore
+from analytics import AnalyticsAggregator
+from event_store import EventStore, EVENT_KINDS, SearchError
+from change_feed import ChangeFeed
+from replay import ReplayBuffer
+from compression import CompressionMiddleware, compression_stats, install_ws_deflate
+from dispatch import assign_goals, robot_tail, SOLVERS
+from estop import EmergencyStop
+from rate_limit import RateLimiter, RateLimitMiddleware, client_key
+from status_writer import StatusWriter
+from telemetry import TelemetryIngest, topic_filters, parse_location
+from zones import ZoneTracker, validate_polygon
 
 UPLOAD_DIR = "uploads/maps"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # Import auth router (make sure this file exists)
 try:
-    from auth import router as auth_router
+    from auth import router as auth_router, init_db as init_auth_db, require_admin, verify_session
     AUTH_AVAILABLE = True
 except ImportError:
     print("Warning: auth.py not found. Authentication routes will be disabled.")
@@ -44,6 +86,19 @@ except ImportError:
 
 app = FastAPI(title="Robot Dashboard")
 
+# Per-client request budgets; added before CORS so 429 responses still carry CORS headers
+rate_limiter = RateLimiter({
+    "read": (RATE_LIMIT_READ_RATE, RATE_LIMIT_READ_BURST),
+    "mutation": (RATE_LIMIT_MUTATION_RATE, RATE_LIMIT_MUTATION_BURST)
+}, RATE_LIMIT_MAX_CLIENTS)
+
+def rate_limit_key(scope):
+    """Bucket for a request: configured API keys and verified sessions only, else the client address"""
+    return client_key(scope, verify_session if AUTH_AVAILABLE else None, RATE_LIMIT_API_KEYS)
+
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, exempt_paths=RATE_LIMIT_EXEMPT_PATHS, key=rate_limit_key)
+
 # Configure CORS with specific origins
 origins = [
     "http://localhost:5173",  # Vite dev server
@@ -60,6 +115,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tuned permessage-deflate for WebSockets, however uvicorn was started
+install_ws_deflate()
+
+if HTTP_COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=HTTP_COMPRESSION_MIN_SIZE,
+        gzip_level=GZIP_LEVEL,
+        brotli_quality=BROTLI_QUALITY
+    )
+
 # Serve uploaded files statically
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -67,27 +133,33 @@ app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 if AUTH_AVAILABLE:
     app.include_router(auth_router, prefix="/auth", tags=["authentication"])
 
-# MQTT client setup (only if available)
+# Admin-only endpoints require an Admin session when auth is available
+admin_dependencies = [Depends(require_admin)] if AUTH_AVAILABLE else []
+
+# MQTT client, created by mqtt_connect_task once the server has started
 mqtt_client = None
-if MQTT_AVAILABLE:
-    try:
-        mqtt_client = mqtt.Client()
-        mqtt_client.connect("localhost", 1883, 60)
-        mqtt_client.loop_start()
-        print("MQTT client connected successfully")
-    except Exception as e:
-        print(f"MQTT connection error (will continue without MQTT): {e}")
-        mqtt_client = None
+# Mosquitto process, if this server had to start the broker itself
+mosquitto_process = None
 
-# Start Mosquitto broker if not already running
-try:
-    subprocess.Popen(['mosquitto', '-c', '/etc/mosquitto/mosquitto.conf'])
-    print("Mosquitto broker started (if not already running).")
-    time.sleep(1)  # Give Mosquitto a second to start
-except Exception as e:
-    print(f"Could not start Mosquitto automatically: {e}")
+# Startup progress reported by /ready
+startup_state = {
+    "database": False,
+    "robots": False,
+    "background_tasks": False,
+    "mqtt": False,
+    "import_ms": None,
+    "startup_ms": None
+}
+
+# Columns added to robot_setup after its first release, created on older databases
+ROBOT_SETUP_COLUMNS = {
+    "enabled": "INTEGER DEFAULT 1",
+    "icon": "TEXT",
+    "map_id": "INTEGER"
+}
 
 def initialize_robot_setup_db(db_path='robot_setup.db'):
+    """Create or migrate the robot_setup database in a single connection"""
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     cursor.execute('''
@@ -99,7 +171,8 @@ def initialize_robot_setup_db(db_path='robot_setup.db'):
         battery INTEGER NOT NULL,
         last_updated TEXT NOT NULL,
         enabled INTEGER DEFAULT 1,
-        icon TEXT
+        icon TEXT,
+        map_id INTEGER
     )
     ''')
     cursor.execute('''
@@ -110,10 +183,76 @@ def initialize_robot_setup_db(db_path='robot_setup.db'):
         map_image TEXT NOT NULL
     )
     ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS zones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        map_id INTEGER NOT NULL,
+        zone_name TEXT NOT NULL,
+        zone_type TEXT NOT NULL,
+        polygon TEXT NOT NULL,
+        speed_limit REAL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_zones_map ON zones (map_id)')
+    cursor.execute("PRAGMA table_info(robot_setup)")
+    columns = {col[1] for col in cursor.fetchall()}
+    for column, definition in ROBOT_SETUP_COLUMNS.items():
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE robot_setup ADD COLUMN {column} {definition}")
+            print(f"{column} column added to robot_setup table")
     conn.commit()
     conn.close()
     print(f"{db_path} created and tables initialized.")
 
+async def broker_reachable(timeout=0.5):
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(MQTT_BROKER_HOST, MQTT_BROKER_PORT), timeout)
+        writer.close()
+        return True
+    except Exception:
+        return False
+
+def on_mqtt_connect(client, userdata, flags, rc):
+    startup_state["mqtt"] = rc == 0
+    if rc == 0:
+        print("MQTT client connected successfully")
+        if TELEMETRY_MQTT_SUBSCRIBE:
+            # Subscribed on every (re)connect, since a clean session drops subscriptions
+            client.subscribe([(topic, 0) for topic in topic_filters(TOPIC_TEMPLATES)])
+    else:
+        print(f"MQTT connection refused (rc={rc}), retrying")
+
+def on_mqtt_disconnect(client, userdata, rc):
+    startup_state["mqtt"] = False
+
+def on_mqtt_message(client, userdata, message):
+    # Runs on the paho network thread; the sample is only queued here
+    telemetry.on_mqtt_message(message.topic, message.payload)
+
+async def mqtt_connect_task():
+    """Start Mosquitto if needed and connect the MQTT client without blocking startup"""
+    global mqtt_client, mosquitto_process
+    if not MQTT_AVAILABLE:
+        return
+    if MQTT_AUTOSTART_BROKER and not await broker_reachable():
+        try:
+            mosquitto_process = await asyncio.create_subprocess_exec('mosquitto', '-c', MOSQUITTO_CONFIG)
+            print("Mosquitto broker started.")
+        except Exception as e:
+            print(f"Could not start Mosquitto automatically: {e}")
+    try:
+        client = mqtt.Client()
+        client.on_connect = on_mqtt_connect
+        client.on_disconnect = on_mqtt_disconnect
+        client.on_message = on_mqtt_message
+        # The network thread keeps retrying with backoff until the broker is up
+        client.reconnect_delay_set(min_delay=1, max_delay=30)
+        client.connect_async(MQTT_BROKER_HOST, MQTT_BROKER_PORT, MQTT_KEEPALIVE)
+        client.loop_start()
+        mqtt_client = client
+    except Exception as e:
+        print(f"MQTT connection error (will continue without MQTT): {e}")
+
 class Command(BaseModel):
     type: str
     parameters: Dict[str, Any]
@@ -131,6 +270,42 @@ class CreateGoal(BaseModel):
     y: float
     robot_id: str
 
+class GoalBatch(BaseModel):
+    goals: List[CreateGoal]
+
+class EStopRequest(BaseModel):
+    reason: Optional[str] = None
+
+class DispatchGoal(BaseModel):
+    x: float
+    y: float
+
+class DispatchRequest(BaseModel):
+    goals: List[DispatchGoal]
+    map_id: Optional[int] = None
+    queue_weight: Optional[float] = None
+    solver: Optional[str] = None
+
+class BatchCommand(BaseModel):
+    robot_id: str
+    type: str
+    parameters: Dict[str, Any] = {}
+
+class CommandBatch(BaseModel):
+    commands: List[BatchCommand]
+
+class TelemetrySample(BaseModel):
+    robot_id: str
+    battery: Optional[float] = None
+    temperature: Optional[float] = None
+    humidity: Optional[float] = None
+    motor_speed: Optional[float] = None
+    status: Optional[str] = None
+    location: Optional[List[float]] = None
+
+class TelemetryBatch(BaseModel):
+    samples: List[TelemetrySample]
+
 class RobotSetupModel(BaseModel):
     robot_id: str
     robot_name: str
@@ -140,6 +315,7 @@ class RobotSetupModel(BaseModel):
     last_updated: str
     enabled: bool = True
     icon: Optional[str] = None
+    map_id: Optional[int] = None
 
 class MapModel(BaseModel):
     map_name: str
@@ -152,25 +328,260 @@ class MapUpdateModel(BaseModel):
     map_type: Optional[str] = None
     map_image: Optional[str] = None
 
+class ZoneModel(BaseModel):
+    zone_name: str
+    zone_type: str = "generic"
+    polygon: List[List[float]]
+    speed_limit: Optional[float] = None
+
+class ZoneUpdateModel(BaseModel):
+    zone_name: Optional[str] = None
+    zone_type: Optional[str] = None
+    polygon: Optional[List[List[float]]] = None
+    speed_limit: Optional[float] = None
+
 # Robot state management
 robot_state = {
-    "robots": {}
+    "robots": {},
+    # Bumped once per applied mutation batch and per movement tick that changed a robot
+    "version": 0,
+    "estop": {"active": False, "seq": 0, "since": None, "reason": None, "source": None}
 }
 
 connected_clients: List[WebSocket] = []
 
-def get_or_create_robot(robot_id):
+# Worker processes running the movement loop (None = simulate in this process)
+shard_pool: Optional[ShardPool] = None
+
+# Per-robot change versions behind the conditional and long-poll reads
+change_feed = ChangeFeed(CHANGE_FEED_MAX_REMOVED)
+
+# Recent goal transitions replayed to WebSocket clients that resume after a disconnect
+replay = ReplayBuffer(REPLAY_BUFFER_SIZE)
+
+# Live battery/status/last_updated written back to robot_setup in periodic batches
+status_writer = StatusWriter('robot_setup.db', ROBOT_STATUS_FLUSH_INTERVAL, ROBOT_STATUS_BATCH_SIZE) if ROBOT_STATUS_PERSIST else None
+
+def bump_version(changed=(), removed=(), transitions=()):
+    """Advance robot_state's version, noting which robots changed for long-pollers, resuming
+    WebSocket sessions and the status writer; transitions are (robot_id, goal_id, status, time)"""
+    robot_state["version"] += 1
+    change_feed.record(robot_state["version"], changed, removed)
+    if transitions:
+        replay.record(robot_state["version"], transitions)
+    if status_writer:
+        status_writer.mark(changed)
+        for robot_id in removed:
+            status_writer.discard(robot_id)
+    return robot_state["version"]
+
+# Mutation log used to restore robot_state after a restart
+state_log: Optional[StateLog] = None
+
+# Simulated time: wall clock, N x faster, or stepped as fast as the CPU allows
+sim_clock = SimClock(SIM_CLOCK, SIM_CLOCK_SPEED, SIM_CLOCK_UNTIL)
+
+movement_scheduler = FixedTimestepScheduler(SIM_TICK_INTERVAL, SIM_TICK_POLICY, SIM_MAX_CATCH_UP, sim_clock)
+
+# Recent pose history per robot, fed by the movement loop
+trail_store = TrailStore(TRAIL_CAPACITY, TRAIL_SAMPLE_INTERVAL, sim_clock.time)
+
+# Rolling fleet aggregates, fed by the publisher samples and goal completions
+analytics = AnalyticsAggregator(ANALYTICS_WINDOW, ANALYTICS_BUCKET_SECONDS, sim_clock.time)
+
+# Searchable event history; opened at startup
+event_store = EventStore(EVENT_DB_PATH, EVENT_COMMIT_INTERVAL, EVENT_BATCH_SIZE) if EVENT_STORE_ENABLED else None
+
+# Anomalies currently raised per robot, so each is logged once when it starts
+active_anomalies: Dict[str, set] = {}
+# Consecutive samples past each threshold, for robots with an anomaly building up
+anomaly_streaks: Dict[str, Dict[str, int]] = {}
+
+# Sensor samples reported by robots over MQTT or POST /telemetry/batch
+telemetry = TelemetryIngest(TOPIC_TEMPLATES, TELEMETRY_FRESH_FOR)
+
+# Geofence zones per map and the zones each robot is in; loaded from the zones table at startup
+zone_tracker = ZoneTracker(ZONE_CELL_SIZE)
+
+loop_watchdog = LoopWatchdog(LOOP_WATCHDOG_INTERVAL, LOOP_STALL_THRESHOLD)
+
+def app_stats():
+    """Application-level sizes sampled alongside the process stats"""
+    return {
+        "ws_clients": len(connected_clients),
+        "robots": len(robot_state["robots"]),
+        "goals": sum(len(robot["goals"]) for robot in robot_state["robots"].values())
+    }
+
+process_stats = ProcessStatsCollector(PROCESS_STATS_INTERVAL, PROCESS_STATS_HISTORY, extra=app_stats)
+
+COMMAND_TYPES = ("move", "rotate", "set_speed")
+# Command parameters that must be numbers
+COMMAND_NUMBERS = ("x", "y", "angle", "speed")
+
+def command_parameters(command_type, parameters):
+    """A command's parameters with the numeric ones coerced to float; ValueError if the command is invalid"""
+    if command_type not in COMMAND_TYPES:
+        raise ValueError(f"Unknown command type '{command_type}'")
+    coerced = dict(parameters)
+    for key in COMMAND_NUMBERS:
+        if key in coerced:
+            try:
+                coerced[key] = float(coerced[key])
+            except (TypeError, ValueError):
+                raise ValueError(f"Parameter '{key}' must be a number")
+            if not math.isfinite(coerced[key]):
+                raise ValueError(f"Parameter '{key}' must be a finite number")
+    if command_type == "set_speed" and coerced.get("speed", 1.0) <= 0:
+        raise ValueError("Parameter 'speed' must be greater than 0")
+    return coerced
+
+def refuse_motion_during_estop(action):
+    """409 for a request that would move robots while the emergency stop is engaged"""
+    if estop.active:
+        raise HTTPException(status_code=409, detail=f"Emergency stop is active; {action} is refused until it is released")
+
+GOAL_OPS = ("goal_add", "goal_update", "cancel")
+
+def apply_mutations(ops):
+    """Apply mutation ops to robot_state as one state version, log them and route them to their shards.
+    Goal statuses the ops change are recorded as transitions for resuming WebSocket clients.
+    If an op fails, the ops applied before it are still routed and versioned before the error propagates"""
+    robots = robot_state["robots"]
+    applied = []
+    transitions = []
+    try:
+        for op in ops:
+            if op["op"] == "goal_update" and op["status"] == "completed" and op["robot_id"] in robots:
+                if completes_goal(robots[op["robot_id"]], op["goal_id"]):
+                    analytics.record_goal_completed(op["robot_id"])
+            # An op can change other goals too (a new current goal re-queues the old one)
+            goal_robot = robots.get(op["robot_id"]) if op["op"] in GOAL_OPS else None
+            statuses = {g["id"]: g["status"] for g in goal_robot["goals"]} if goal_robot else None
+            apply_op(robots, op)
+            applied.append(op)
+            if goal_robot:
+                for g in goal_robot["goals"]:
+                    if statuses.get(g["id"]) != g["status"]:
+                        transitions.append((op["robot_id"], g["id"], g["status"], g.get("time")))
+            if state_log:
+                state_log.append(op)
+            if event_store:
+                event_store.record_op(op)
+            if op["op"] == "remove":
+                trail_store.discard(op["robot_id"])
+                analytics.discard(op["robot_id"])
+                active_anomalies.pop(op["robot_id"], None)
+                anomaly_streaks.pop(op["robot_id"], None)
+                zone_tracker.forget(op["robot_id"])
+    finally:
+        if shard_pool and applied:
+            shard_pool.route(applied)
+        removed = {op["robot_id"] for op in applied if op["op"] == "remove"}
+        changed = {op["robot_id"] for op in applied if op["robot_id"] not in removed}
+        # Commands can move a robot and "set" can change its map: re-check their zones next tick
+        zone_tracker.mark(op["robot_id"] for op in applied if op["op"] in ("command", "set", "upsert"))
+        version = bump_version(changed, removed, transitions)
+    return version
+
+def completes_goal(robot, goal_id):
+    """True if goal_id exists on the robot and is not already completed"""
+    return any(g["id"] == goal_id and g["status"] != "completed" for g in robot["goals"])
+
+def goal_completed(robot_id, goal_id):
+    """Record a goal the simulation completed"""
+    analytics.record_goal_completed(robot_id)
+    if event_store:
+        event_store.record("goal", f"Goal {goal_id} of {robot_id} completed", robot_id, {"goal_id": goal_id, "status": "completed"})
+
+def check_anomalies(robot_id, battery, temperature):
+    """Log telemetry anomalies when they start, not on every sample.
+
+    An anomaly starts after ANOMALY_MIN_SAMPLES consecutive samples past its
+    threshold and clears only once the reading is back past its clear threshold,
+    so a reading hovering around a threshold does not flap.
+    """
+    previous = active_anomalies.get(robot_id, set())
+    streaks = anomaly_streaks.get(robot_id, {})
+    current = set()
+    building = {}
+    for anomaly, tripped, cleared in (
+        ("battery_low", battery < ANOMALY_BATTERY_LOW, battery > ANOMALY_BATTERY_CLEAR),
+        ("temperature_high", temperature > ANOMALY_TEMPERATURE_HIGH, temperature < ANOMALY_TEMPERATURE_CLEAR)
+    ):
+        if anomaly in previous:
+            if not cleared:
+                current.add(anomaly)
+        elif tripped:
+            streak = streaks.get(anomaly, 0) + 1
+            if streak >= ANOMALY_MIN_SAMPLES:
+                current.add(anomaly)
+            else:
+                building[anomaly] = streak
+    if building:
+        anomaly_streaks[robot_id] = building
+    else:
+        anomaly_streaks.pop(robot_id, None)
+    for anomaly in current - previous:
+        event_store.record(
+            "anomaly", f"{robot_id} {anomaly.replace('_', ' ')} (battery={battery}, temperature={temperature})",
+            robot_id, {"anomaly": anomaly, "battery": battery, "temperature": temperature}, level="warning"
+        )
+    active_anomalies[robot_id] = current
+
+def apply_telemetry(samples):
+    """Apply drained telemetry (one merged sample per robot) to robot_state as one version"""
+    robots = robot_state["robots"]
+    now = time.monotonic()
+    changed = []
+    for robot_id, sample in samples.items():
+        robot = robots.get(robot_id)
+        if robot is None:
+            telemetry.stats["unknown_robots"] += 1
+            continue
+        try:
+            if sample.get("location") is not None:
+                # Kept apart from the simulated position, which the movement loop owns
+                robot["reported_location"] = list(parse_location(sample["location"]))
+            if sample.get("battery") is not None:
+                robot["battery"] = int(round(float(sample["battery"])))
+            for field in ("temperature", "humidity", "motor_speed"):
+                if sample.get(field) is not None:
+                    robot[field] = float(sample[field])
+            if sample.get("status") is not None:
+                robot["status"] = str(sample["status"])
+        except (TypeError, ValueError, KeyError):
+            telemetry.stats["invalid"] += 1
+            continue
+        telemetry.mark_seen(robot_id, now)
+        changed.append(robot_id)
+        analytics.record_sample(robot_id, sample.get("battery"), sample.get("temperature"), robot.get("currentTask"))
+        if event_store and robot.get("temperature") is not None:
+            check_anomalies(robot_id, robot["battery"], robot["temperature"])
+    telemetry.stats["applied"] += len(changed)
+    if changed:
+        bump_version(changed)
+
+def apply_mutation(op):
+    return apply_mutations([op])
+
+def add_robots(robots):
+    """Add new robots to robot_state and hand them to the simulation shards"""
+    robot_state["robots"].update(robots)
+    bump_version(robots)
+    zone_tracker.mark(robots)
+    if state_log:
+        for robot_id, robot in robots.items():
+            state_log.append({"op": "upsert", "robot_id": robot_id, "robot": robot})
+    if shard_pool and robots:
+        shard_pool.assign(robots)
+
+def get_or_create_robot(robot_id, map_id=None):
     if robot_id not in robot_state["robots"]:
-        robot_state["robots"][robot_id] = {
-            "position": [150 + len(robot_state["robots"]) * 50, 200 + len(robot_state["robots"]) * 30],
-            "orientation": 0,
-            "battery": 100,
-            "currentTask": "Idle",
-            "lastUpdated": datetime.now().strftime("%H:%M:%S"),
-            "goals": [],
-            "target_goal": None,
-            "speed": 0.5
-        }
+        robot = new_robot([150 + len(robot_state["robots"]) * 50, 200 + len(robot_state["robots"]) * 30])
+        if map_id is not None:
+            robot["map_id"] = map_id
+        add_robots({robot_id: robot})
     if "speed" not in robot_state["robots"][robot_id]:
         robot_state["robots"][robot_id]["speed"] = 0.5
     return robot_state["robots"][robot_id]
@@ -180,108 +591,292 @@ def sync_robots_from_db():
     try:
         conn = sqlite3.connect('robot_setup.db')
         cursor = conn.cursor()
-        cursor.execute('SELECT robot_id FROM robot_setup WHERE enabled = 1')
+        cursor.execute('SELECT robot_id, map_id FROM robot_setup WHERE enabled = 1')
         rows = cursor.fetchall()
         conn.close()
         
-        for idx, row in enumerate(rows):
-            robot_id = row[0]
+        robots = {}
+        for idx, (robot_id, map_id) in enumerate(rows):
             if robot_id not in robot_state["robots"]:
-                robot_state["robots"][robot_id] = {
-                    "position": [150 + idx * 60, 200 + idx * 40],
-                    "orientation": 0,
-                    "battery": 100,
-                    "currentTask": "Idle",
-                    "lastUpdated": datetime.now().strftime("%H:%M:%S"),
-                    "goals": [],
-                    "target_goal": None,
-                    "speed": 0.5
-                }
+                robot = new_robot([150 + idx * 60, 200 + idx * 40])
+                if map_id is not None:
+                    robot["map_id"] = map_id
+                robots[robot_id] = robot
+        add_robots(robots)
         print(f"Synced {len(rows)} robots from database to robot_state")
     except Exception as e:
         print(f"Error syncing robots from database: {e}")
 
-def get_next_goal(robot):
-    """Get the next queued goal for a specific robot"""
-    for goal in robot["goals"]:
-        if goal["status"] == "queued":
-            return goal
-    return None
+def create_synthetic_robots(count):
+    """Create in-memory robots used to exercise the simulation at fleet scale"""
+    columns = max(1, int(math.sqrt(count)))
+    robots = {}
+    for idx in range(count):
+        robot_id = f"sim_{idx:05d}"
+        if robot_id not in robot_state["robots"]:
+            robots[robot_id] = new_robot([50 + (idx % columns) * 20, 50 + (idx // columns) * 20])
+    add_robots(robots)
+    print(f"Created {len(robots)} synthetic robots")
+
+# State version last sent to clients. Endpoints only bump the version; the movement
+# tick broadcasts once per tick, so a burst of mutations costs one broadcast, not one each
+last_broadcast = {"version": None}
+
+# State version last sent to each WebSocket client connected with ?mode=delta
+ws_sessions: Dict[WebSocket, int] = {}
+
+def full_frame():
+    """The whole robot_state as sent to clients, with the boot_id needed to resume later"""
+    state_copy = robot_state.copy()
+    state_copy["lastUpdated"] = sim_clock.stamp()
+    state_copy["boot_id"] = change_feed.boot_id
+    return state_copy
+
+def delta_frame(since):
+    """What a client holding version ``since`` is missing: changed robots and goal transitions"""
+    changed, removed = change_feed.changes_since(since)
+    robots = robot_state["robots"]
+    return {
+        "type": "delta",
+        "boot_id": change_feed.boot_id,
+        "base": since,
+        "version": robot_state["version"],
+        "robots": {robot_id: robots[robot_id] for robot_id in changed if robot_id in robots},
+        "removed": removed,
+        "transitions": replay.since(since),
+        "estop": robot_state["estop"],
+        "lastUpdated": sim_clock.stamp()
+    }
+
+def can_resume(boot_id, since):
+    """A client can catch up by delta if its version is from this boot and its gap is still replayable"""
+    return (boot_id == change_feed.boot_id and since is not None
+            and 0 <= since <= robot_state["version"] and replay.covers(since) and change_feed.covers(since))
 
 async def broadcast_state():
     """Broadcast robot state to all connected WebSocket clients"""
+    last_broadcast["version"] = robot_state["version"]
     if not connected_clients:
         return
     
-    state_copy = robot_state.copy()
-    state_copy["lastUpdated"] = datetime.now().strftime("%H:%M:%S")
-    
+    # Serialised once per distinct base: None is the full state, otherwise a delta from that version
+    frames = {}
     disconnected_clients = []
-    for client in connected_clients:
+    for client in list(connected_clients):
+        base = ws_sessions.get(client)
+        if base is not None and base == robot_state["version"]:
+            continue
+        if base is not None and not change_feed.covers(base):
+            # Removals since its version were pruned: start it over from a full state
+            base = None
+        frame = frames.get(base)
+        if frame is None:
+            body = full_frame() if base is None else delta_frame(base)
+            frame = frames[base] = (json.dumps(body, separators=(",", ":")), body["version"])
         try:
-            await client.send_json(state_copy)
+            await client.send_text(frame[0])
+            if client in ws_sessions:
+                ws_sessions[client] = frame[1]
+            # Sends that fit in the transport buffer never suspend; yield so a
+            # request such as an E-stop is not held behind the whole broadcast
+            await asyncio.sleep(0)
         except Exception as e:
             print(f"Error broadcasting to client: {e}")
             disconnected_clients.append(client)
     
     for client in disconnected_clients:
+        ws_sessions.pop(client, None)
         try:
             connected_clients.remove(client)
         except ValueError:
             pass
 
+# System-wide emergency stop; anyone may engage it, only an admin may release it
+estop = EmergencyStop()
+
+async def send_priority(text):
+    """Send a small frame to every client at once, so a slow client cannot hold up the others"""
+    async def send(client):
+        try:
+            await asyncio.wait_for(client.send_text(text), ESTOP_SEND_TIMEOUT)
+        except Exception as e:
+            print(f"Error sending priority frame to client: {e}")
+    clients = list(connected_clients)
+    await asyncio.gather(*(send(client) for client in clients))
+    return len(clients)
+
+def publish_estop():
+    """Retained, so robots that reconnect later still see the current stop state"""
+    if mqtt_client and mqtt_client.is_connected():
+        try:
+            mqtt_client.publish(ESTOP_MQTT_TOPIC, json.dumps(estop.state()), qos=1, retain=True)
+        except Exception as e:
+            print(f"MQTT E-stop publish error: {e}")
+
+async def engage_estop(reason=None, source="api"):
+    """Stop every robot: MQTT first, then the simulation, then clients, then everything else"""
+    started = time.perf_counter()
+    if not estop.engage(reason, source, started):
+        return False
+    publish_estop()
+    mqtt_done = time.perf_counter()
+    if shard_pool:
+        shard_pool.halt(True)
+    clients = await send_priority(estop.frame())
+    estop.record_fanout(mqtt_done, time.perf_counter(), clients)
+
+    robot_state["estop"] = estop.state()
+    bump_version()
+    if event_store:
+        event_store.record("estop", f"Emergency stop engaged via {source}" + (f": {reason}" if reason else ""),
+                           data=estop.state(), level="critical")
+    print(f"EMERGENCY STOP engaged via {source} (seq {estop.seq}): {estop.last}")
+    return True
+
+async def release_estop(source="api"):
+    if not estop.active:
+        return False
+    estop.release()
+    publish_estop()
+    if shard_pool:
+        shard_pool.halt(False)
+    await send_priority(estop.frame())
+
+    robot_state["estop"] = estop.state()
+    bump_version()
+    if event_store:
+        event_store.record("estop", f"Emergency stop released via {source}", data=estop.state(), level="warning")
+    print(f"Emergency stop released via {source} (seq {estop.seq})")
+    return True
+
+def load_zones(db_path='robot_setup.db'):
+    """Read every zone from the database and rebuild the zone index"""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('SELECT id, map_id, zone_name, zone_type, polygon, speed_limit FROM zones').fetchall()
+    finally:
+        conn.close()
+    zone_tracker.load(zone_row(row) for row in rows)
+    print(f"Loaded {len(rows)} zones")
+    refresh_speed_caps()
+
+def refresh_speed_caps():
+    """Re-derive speed_cap for robots already in zones, whose limits may have just changed.
+    The tick only re-caps robots whose set of zones changes"""
+    robots = robot_state["robots"]
+    ops = []
+    for robot_id, zone_ids in list(zone_tracker.occupancy.items()):
+        robot = robots.get(robot_id)
+        if robot is None:
+            continue
+        cap = zone_tracker.speed_cap(zone_ids)
+        if robot.get("speed_cap") != cap:
+            ops.append({"op": "set", "robot_id": robot_id, "fields": {"speed_cap": cap}})
+    if ops:
+        apply_mutations(ops)
+
+def zone_row(row):
+    return {
+        "id": row[0],
+        "map_id": row[1],
+        "zone_name": row[2],
+        "zone_type": row[3],
+        "polygon": json.loads(row[4]),
+        "speed_limit": row[5]
+    }
+
+def apply_zones(moved):
+    """Update zone occupancy for robots that moved: log enter/exit events and set speed caps.
+    Returns the robots whose zones changed"""
+    robots = robot_state["robots"]
+    changed, events = zone_tracker.evaluate(robots, moved)
+    caps = []
+    for robot_id in changed:
+        robot = robots[robot_id]
+        zone_ids = zone_tracker.occupancy.get(robot_id, ())
+        robot["zones"] = sorted(zone_ids)
+        cap = zone_tracker.speed_cap(zone_ids)
+        if robot.get("speed_cap") != cap:
+            robot["speed_cap"] = cap
+            caps.append({"op": "set", "robot_id": robot_id, "fields": {"speed_cap": cap}})
+    # Shards own the motion, so they need the caps too
+    if caps and shard_pool:
+        shard_pool.route(caps)
+    if event_store:
+        for robot_id, zone, transition in events:
+            verb = "entered" if transition == "enter" else "left"
+            event_store.record(
+                "zone", f"{robot_id} {verb} {zone['zone_type']} zone {zone['zone_name']}", robot_id,
+                {"zone_id": zone["id"], "map_id": zone["map_id"], "transition": transition},
+                level="warning" if zone["zone_type"] == "restricted" and transition == "enter" else "info"
+            )
+    return changed
+
 async def robot_movement_task():
     print("Robot movement task started.")
+    sim_clock.join()
+    joined = True
     while True:
         try:
-            for robot_id, robot in robot_state["robots"].items():
-                # Update goal queue for this robot
-                current_goals = [g for g in robot["goals"] if g["status"] == "current"]
-                if not current_goals and not robot["target_goal"]:
-                    next_goal = get_next_goal(robot)
-                    if next_goal:
-                        next_goal["status"] = "current"
-                        next_goal["time"] = datetime.now().strftime("%H:%M:%S")
-                        robot["target_goal"] = next_goal
-
-                # Move toward target goal
-                if robot["target_goal"]:
-                    target_x = robot["target_goal"]["x"]
-                    target_y = robot["target_goal"]["y"]
-                    current_x, current_y = robot["position"]
-                    distance = math.sqrt((target_x - current_x)**2 + (target_y - current_y)**2)
-                    tolerance = 5
-                    movement_step = 5
-
-                    if distance < tolerance:
-                        robot["position"] = [target_x, target_y]
-                        for goal in robot["goals"]:
-                            if goal["id"] == robot["target_goal"]["id"]:
-                                goal["status"] = "completed"
-                                goal["time"] = datetime.now().strftime("%H:%M:%S")
-                                break
-                        robot["currentTask"] = "Idle"
-                        robot["target_goal"] = None
-                        
-                        # Start next goal in queue
-                        next_goal = get_next_goal(robot)
-                        if next_goal:
-                            next_goal["status"] = "current"
-                            next_goal["time"] = datetime.now().strftime("%H:%M:%S")
-                            robot["target_goal"] = next_goal
-                    else:
-                        angle = math.atan2(target_y - current_y, target_x - current_x)
-                        move_x = movement_step * math.cos(angle)
-                        move_y = movement_step * math.sin(angle)
-                        robot["position"][0] += move_x
-                        robot["position"][1] += move_y
-                        robot["currentTask"] = "Navigating"
-                        robot["orientation"] = math.degrees(angle) % 360
-
-                    robot["lastUpdated"] = datetime.now().strftime("%H:%M:%S")
-
-            await broadcast_state()
-            await asyncio.sleep(0.1)
+            steps = await movement_scheduler.wait()
+            if not steps and joined:
+                # The bounded run is over and this loop now ticks on wall time
+                sim_clock.leave()
+                joined = False
+            started = time.monotonic()
+            if shard_pool:
+                # Shards own the motion; fold their pose updates into robot_state
+                robots = robot_state["robots"]
+                changed = []
+                goal_transitions = []
+                for pose in shard_pool.drain():
+                    robot = robots.get(pose[0])
+                    if robot is not None:
+                        # Resync poses repeat old statuses, so only count goals whose status changes here
+                        if pose[7]:
+                            statuses = {g["id"]: g["status"] for g in robot["goals"]}
+                            for goal_id, status, at in pose[7]:
+                                if statuses.get(goal_id, status) != status:
+                                    goal_transitions.append((pose[0], goal_id, status, at))
+                                    if status == "completed":
+                                        goal_completed(pose[0], goal_id)
+                        apply_pose(robot, pose)
+                        trail_store.record(pose[0], pose[1], pose[2], force=bool(pose[7]))
+                        changed.append(pose[0])
+                        if state_log:
+                            state_log.record_pose(pose)
+                shard_pool.migrate(robots, changed)
+            elif estop.active or not steps:
+                # Hold every robot where it is until the stop is released (or, with no
+                # steps, after a bounded simulated run has ended)
+                changed = []
+                goal_transitions = []
+            else:
+                stamp = sim_clock.stamp()
+                changed = []
+                goal_transitions = []
+                for robot_id, robot in robot_state["robots"].items():
+                    transitions = advance_robot(robot, stamp, steps, ROBOT_SPEED_SCALE)
+                    if transitions is not None:
+                        trail_store.record(robot_id, robot["position"][0], robot["position"][1], force=bool(transitions))
+                        for goal_id, status, at in transitions:
+                            goal_transitions.append((robot_id, goal_id, status, at))
+                            if status == "completed":
+                                goal_completed(robot_id, goal_id)
+                        changed.append(robot_id)
+                        if state_log:
+                            state_log.record_pose(make_pose(robot_id, robot, transitions))
+            # Only robots that moved (or were moved by a mutation) are checked against the zones
+            zoned = apply_zones(changed)
+            if zoned:
+                changed = list(set(changed).union(zoned))
+            if changed:
+                bump_version(changed, transitions=goal_transitions)
+
+            # One broadcast per tick at most, covering every mutation since the last one
+            if robot_state["version"] != last_broadcast["version"]:
+                await broadcast_state()
+            movement_scheduler.record_work(time.monotonic() - started)
         except Exception as e:
             print(f"Error in robot movement task: {e}")
             await asyncio.sleep(1)
@@ -289,9 +884,16 @@ async def robot_movement_task():
 async def robot_publisher_task():
     """Task to publish robot sensor data via MQTT"""
     print("Robot publisher task started.")
+    sim_clock.join()
     while True:
         try:
+            now = time.monotonic()
+            sampled = []
             for robot_id, robot in robot_state["robots"].items():
+                # Robots reporting their own telemetry keep their real values
+                if telemetry.fresh(robot_id, now):
+                    continue
+                sampled.append(robot_id)
                 # Generate random sensor data (only if random is available)
                 if RANDOM_AVAILABLE:
                     battery = random.randint(20, 100)
@@ -308,9 +910,12 @@ async def robot_publisher_task():
 
                 robot["battery"] = battery
                 robot["sensors"] = sensors
+                analytics.record_sample(robot_id, battery, temperature, robot.get("currentTask"))
+                if event_store:
+                    check_anomalies(robot_id, battery, temperature)
 
-                # Publish data if MQTT client is available
-                if mqtt_client:
+                # Publish data if MQTT client is connected
+                if mqtt_client and mqtt_client.is_connected():
                     try:
                         mqtt_client.publish(f"robot/{robot_id}/speed", robot.get("speed", 0.5))
                         mqtt_client.publish(f"robot/{robot_id}/battery", battery)
@@ -320,59 +925,130 @@ async def robot_publisher_task():
                     except Exception as e:
                         print(f"MQTT publish error for {robot_id}: {e}")
 
-            await asyncio.sleep(2)
+            # Battery and sensors changed on every simulated robot
+            if sampled:
+                bump_version(sampled)
+            await sim_clock.sleep(2)
         except Exception as e:
             print(f"Error in robot publisher task: {e}")
             await asyncio.sleep(1)
 
-# Database helper functions
-def ensure_icon_column():
-    conn = sqlite3.connect('robot_setup.db')
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(robot_setup)")
-    columns = [col[1] for col in cursor.fetchall()]
-    if 'icon' not in columns:
-        cursor.execute("ALTER TABLE robot_setup ADD COLUMN icon TEXT")
-        conn.commit()
-    conn.close()
-
-def ensure_enabled_column():
-    conn = sqlite3.connect('robot_setup.db')
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(robot_setup)")
-    columns = [col[1] for col in cursor.fetchall()]
-    if 'enabled' not in columns:
-        cursor.execute("ALTER TABLE robot_setup ADD COLUMN enabled INTEGER DEFAULT 1")
-        conn.commit()
-        print("Enabled column added to robot_setup table")
-    conn.close()
+async def telemetry_task():
+    """Apply queued telemetry every TELEMETRY_APPLY_INTERVAL, coalesced per robot"""
+    print("Telemetry ingest task started.")
+    while True:
+        try:
+            await asyncio.sleep(TELEMETRY_APPLY_INTERVAL)
+            samples = telemetry.drain()
+            if samples:
+                apply_telemetry(samples)
+        except Exception as e:
+            print(f"Error in telemetry task: {e}")
+            await asyncio.sleep(1)
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
+    started = time.perf_counter()
     try:
-        initialize_robot_setup_db()
-        ensure_icon_column()
-        ensure_enabled_column()
+        asyncio.create_task(loop_watchdog.run())
+        asyncio.create_task(process_stats.run())
+        
+        # Broker and MQTT connection come up in the background; nothing below waits on them
+        asyncio.create_task(mqtt_connect_task())
+        
+        # Start simulation shards before any robot is created so each one gets an owner
+        global shard_pool, state_log
+        if SIM_SHARDS > 0 and sim_clock.stepped:
+            # Worker processes cannot wait on a stepped clock owned by this process
+            print("Warning: SIM_CLOCK=stepped runs the simulation in-process; SIM_SHARDS is ignored.")
+        elif SIM_SHARDS > 0:
+            shard_pool = ShardPool(
+                SIM_SHARDS,
+                partition=SIM_SHARD_PARTITION,
+                zones=SIM_SHARD_ZONES,
+                tick_interval=SIM_TICK_INTERVAL,
+                tick_policy=SIM_TICK_POLICY,
+                max_catch_up=SIM_MAX_CATCH_UP,
+                speed_scale=ROBOT_SPEED_SCALE,
+                start_method=SIM_SHARD_START_METHOD,
+                clock=sim_clock
+            )
+            shard_pool.start()
+        
+        # Schema setup for both databases and state recovery run concurrently off the loop
+        restored_log = None
+        if STATE_LOG_ENABLED:
+            restored_log = StateLog(
+                STATE_DIR,
+                commit_interval=STATE_LOG_COMMIT_INTERVAL,
+                snapshot_interval=STATE_SNAPSHOT_INTERVAL,
+                fsync=STATE_LOG_FSYNC
+            )
+        setup = [asyncio.to_thread(initialize_robot_setup_db)]
+        if AUTH_AVAILABLE:
+            setup.append(asyncio.to_thread(init_auth_db))
+        if event_store:
+            setup.append(asyncio.to_thread(event_store.open))
+        recovery = asyncio.to_thread(restored_log.recover) if restored_log else asyncio.sleep(0)
+        recovered, *_ = await asyncio.gather(recovery, *setup)
+        startup_state["database"] = True
         print("Database initialized successfully")
         
+        # Restore the pre-restart state before filling in robots from the database
+        if recovered:
+            add_robots(recovered)
+        state_log = restored_log
+        
         # Sync robots from database to robot_state
         sync_robots_from_db()
+        if SIM_SYNTHETIC_ROBOTS > 0:
+            create_synthetic_robots(SIM_SYNTHETIC_ROBOTS)
+        load_zones()
+        startup_state["robots"] = True
+        
+        if state_log:
+            # Start from a clean snapshot so a torn tail from a crash is never appended to
+            await state_log.snapshot(robot_state["robots"])
+            asyncio.create_task(state_log.run(robot_state["robots"]))
+        if event_store:
+            asyncio.create_task(event_store.run())
+        if status_writer:
+            asyncio.create_task(status_writer.run(robot_state["robots"]))
         
         # Start background tasks
         asyncio.create_task(robot_movement_task())
         asyncio.create_task(robot_publisher_task())
+        asyncio.create_task(telemetry_task())
+        startup_state["background_tasks"] = True
         print("Background tasks started")
-        print("FastAPI server startup complete!")
     except Exception as e:
         print(f"Error during startup: {e}")
+    finally:
+        startup_state["startup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        print(f"FastAPI server startup complete in {startup_state['startup_ms']} ms "
+              f"(import {startup_state['import_ms']} ms)")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     print("Shutting down application...")
+    if state_log:
+        await state_log.snapshot(robot_state["robots"])
+    if event_store:
+        await event_store.close()
+    if status_writer:
+        await status_writer.flush(robot_state["robots"])
+    if shard_pool:
+        shard_pool.stop()
     if mqtt_client:
-        mqtt_client.loop_stop()
+        # disconnect() first so the network thread leaves a reconnect backoff at once; the
+        # join is bounded (the thread is a daemon) so an unreachable broker cannot hold up exit
         mqtt_client.disconnect()
+        stopper = threading.Thread(target=mqtt_client.loop_stop, daemon=True)
+        stopper.start()
+        await asyncio.to_thread(stopper.join, 2.0)
+    if mosquitto_process and mosquitto_process.returncode is None:
+        mosquitto_process.terminate()
 
 # API Routes
 @app.get("/")
@@ -385,21 +1061,96 @@ def health_check():
         "status": "healthy", 
         "timestamp": datetime.now().isoformat(),
         "connected_clients": len(connected_clients),
-        "robots": len(robot_state["robots"])
+        "robots": len(robot_state["robots"]),
+        "process": process_stats.current,
+        "status_writer": status_writer.stats if status_writer else None,
+        "ws_sessions": {"delta_clients": len(ws_sessions), **replay.snapshot()}
     }
 
+@app.get("/health/compression")
+def compression_health():
+    """Bytes in/out, ratio and CPU time per codec (gzip, br, permessage-deflate)"""
+    return compression_stats.snapshot()
+
+@app.get("/health/ratelimit")
+def rate_limit_health():
+    """Request budgets and how many requests each has allowed and refused"""
+    return {"enabled": RATE_LIMIT_ENABLED, "exempt_paths": RATE_LIMIT_EXEMPT_PATHS, **rate_limiter.stats()}
+
+@app.get("/health/process")
+def process_health():
+    """Latest process sample plus the recent history"""
+    return {
+        "interval": process_stats.interval,
+        "current": process_stats.current,
+        "history": list(process_stats.history)
+    }
+
+@app.get("/ready")
+def readiness_check():
+    """Ready once the database, robots and background tasks are up (MQTT is reported, not required)"""
+    ready = startup_state["database"] and startup_state["robots"] and startup_state["background_tasks"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, **startup_state}
+    )
+
+@app.get("/simulation/status")
+def simulation_status():
+    if shard_pool:
+        return {"mode": "sharded", "tick": movement_scheduler.stats(), "clock": sim_clock.stats(), **shard_pool.status()}
+    return {"mode": "in_process", "robots": len(robot_state["robots"]), "tick": movement_scheduler.stats(),
+            "clock": sim_clock.stats()}
+
+@app.get("/admin/loop", dependencies=admin_dependencies)
+def loop_lag():
+    """Event-loop scheduling lag and the stacks captured for recent stalls"""
+    return loop_watchdog.stats()
+
+@app.get("/admin/profile", dependencies=admin_dependencies, response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(5.0, gt=0),
+    interval_ms: float = Query(5.0, ge=1),
+    loop_only: bool = False
+):
+    """Sample the running process and return collapsed stacks (flamegraph-ready)"""
+    seconds = min(seconds, PROFILE_MAX_SECONDS)
+    thread_ids = [loop_watchdog.loop_thread_id] if loop_only and loop_watchdog.loop_thread_id else None
+    counts = await run_in_threadpool(sample_stacks, seconds, interval_ms / 1000, thread_ids)
+    return PlainTextResponse(collapse(counts))
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     print(f"WebSocket connection attempt from: {websocket.client}")
     
     try:
         await websocket.accept()
-        connected_clients.append(websocket)
-        print(f"WebSocket connected. Total clients: {len(connected_clients)}")
         
-        # Send initial state
-        await websocket.send_json(robot_state)
-        print("Initial state sent to new client")
+        # ?mode=delta clients get deltas instead of full states; with the boot_id and
+        # version they last saw (?boot_id=&since=) they resume with just what they missed
+        params = websocket.query_params
+        delta_mode = params.get("mode") == "delta"
+        try:
+            since = int(params["since"]) if "since" in params else None
+        except ValueError:
+            since = None
+        if delta_mode and can_resume(params.get("boot_id"), since):
+            initial = delta_frame(since)
+            initial["resumed"] = True
+            replay.stats["resumed"] += 1
+            replay.stats["transitions_replayed"] += len(initial["transitions"])
+        else:
+            initial = full_frame()
+            if since is not None:
+                replay.stats["snapshots"] += 1
+        # Sent before the client joins the broadcast list, so no broadcast can overtake it
+        await websocket.send_text(json.dumps(initial, separators=(",", ":")))
+        if delta_mode:
+            ws_sessions[websocket] = initial["version"]
+        connected_clients.append(websocket)
+        print(f"WebSocket connected ({'resumed' if initial.get('resumed') else 'full state sent'}). "
+              f"Total clients: {len(connected_clients)}")
+        rate_key = rate_limit_key(websocket.scope)
         
         while True:
             try:
@@ -408,10 +1159,24 @@ async def websocket_endpoint(websocket: WebSocket):
                 
                 try:
                     command = json.loads(data)
+                    # E-stop messages are never limited; everything else spends the read budget
+                    if RATE_LIMIT_ENABLED and command.get("type") not in ("estop", "estop_ack"):
+                        retry_after = rate_limiter.check(rate_key, "read")
+                        if retry_after:
+                            await websocket.send_json({"type": "error", "code": 429, "detail": "Rate limit exceeded",
+                                                       "retry_after": round(retry_after, 3)})
+                            continue
                     if command.get("type") == "get_status":
-                        await websocket.send_json(robot_state)
+                        state = full_frame()
+                        await websocket.send_text(json.dumps(state, separators=(",", ":")))
+                        if delta_mode:
+                            ws_sessions[websocket] = state["version"]
                     elif command.get("type") == "ping":
                         await websocket.send_json({"type": "pong"})
+                    elif command.get("type") == "estop":
+                        await engage_estop(command.get("reason"), source="websocket")
+                    elif command.get("type") == "estop_ack":
+                        estop.record_ack(id(websocket), command.get("seq"))
                 except json.JSONDecodeError:
                     print(f"Invalid JSON received: {data}")
                     
@@ -425,23 +1190,164 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         print(f"WebSocket connection error: {e}")
     finally:
+        ws_sessions.pop(websocket, None)
         if websocket in connected_clients:
             connected_clients.remove(websocket)
             print(f"WebSocket client removed. Remaining clients: {len(connected_clients)}")
 
+async def versioned_read(request, since, boot_id, wait, full_body, robot_body):
+    """Shared conditional/long-poll handling for /status and /goals.
+
+    Without ``since`` the full body is returned, or a bodyless 304 when
+    If-None-Match names the current version. With ``since`` the response is
+    the robots changed after that version, waiting up to ``wait`` ms for one.
+    """
+    if since is None:
+        version = robot_state["version"]
+        etag = change_feed.etag(version)
+        if change_feed.matches(request.headers.get("if-none-match"), version):
+            return Response(status_code=304, headers={"ETag": etag})
+        return JSONResponse(full_body(), headers={"ETag": etag})
+
+    # A version from another boot, from the future or from before the pruned removals cannot be diffed against
+    stale = ((boot_id is not None and boot_id != change_feed.boot_id) or since > robot_state["version"]
+             or not change_feed.covers(since))
+    if not stale and since == robot_state["version"] and wait > 0:
+        await change_feed.wait(min(wait / 1000, LONG_POLL_MAX_WAIT))
+
+    version = robot_state["version"]
+    robots = robot_state["robots"]
+    if stale:
+        changed, removed = list(robots), []
+    else:
+        changed, removed = change_feed.changes_since(since)
+    return JSONResponse({
+        "boot_id": change_feed.boot_id,
+        "version": version,
+        "full": stale,
+        "robots": {robot_id: robot_body(robots[robot_id]) for robot_id in changed if robot_id in robots},
+        "removed": removed
+    }, headers={"ETag": change_feed.etag(version)})
+
 @app.get("/status")
-def get_status():
-    return robot_state
+async def get_status(
+    request: Request,
+    since: Optional[int] = None,
+    boot_id: Optional[str] = None,
+    wait: int = Query(0, ge=0)
+):
+    """Full robot_state; ?since=<version>&wait=<ms> long-polls for the robots changed after since"""
+    return await versioned_read(request, since, boot_id, wait, lambda: robot_state, lambda robot: robot)
 
 @app.get("/goals")
-def get_goals():
-    return {
-        robot_id: robot["goals"]
-        for robot_id, robot in robot_state["robots"].items()
-    }
+async def get_goals(
+    request: Request,
+    since: Optional[int] = None,
+    boot_id: Optional[str] = None,
+    wait: int = Query(0, ge=0)
+):
+    """Goals per robot; supports the same If-None-Match and since/wait modes as /status"""
+    def all_goals():
+        return {robot_id: robot["goals"] for robot_id, robot in robot_state["robots"].items()}
+    return await versioned_read(request, since, boot_id, wait, all_goals, lambda robot: robot["goals"])
+
+@app.get("/trails")
+def get_trails(seconds: float = Query(3600.0, gt=0), tolerance: float = Query(2.0, ge=0)):
+    """Simplified breadcrumb trails for every robot over the last ``seconds``"""
+    until = sim_clock.time()
+    trails = (trail_store.query(robot_id, until - seconds, until, tolerance) for robot_id in trail_store.robot_ids())
+    return {"since": round(until - seconds, 1), "until": round(until, 1), "trails": [t for t in trails if t["points"]]}
+
+@app.get("/robots/{robot_id}/trail")
+def get_trail(
+    robot_id: str,
+    seconds: float = Query(3600.0, gt=0),
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    tolerance: float = Query(2.0, ge=0)
+):
+    """Douglas-Peucker simplified trail of one robot; since/until (epoch seconds) override seconds"""
+    until = until if until is not None else sim_clock.time()
+    since = since if since is not None else until - seconds
+    trail = trail_store.query(robot_id, since, until, tolerance)
+    if trail is None:
+        raise HTTPException(status_code=404, detail=f"No trail for robot {robot_id}")
+    return trail
+
+def require_event_store():
+    if not event_store or not event_store.is_open:
+        raise HTTPException(status_code=503, detail="Event store is not available")
+
+def validate_event_kind(kind):
+    if kind is not None and kind not in EVENT_KINDS:
+        raise HTTPException(status_code=422, detail=f"Unknown event kind '{kind}', expected one of {list(EVENT_KINDS)}")
+
+@app.get("/events")
+def search_events(
+    q: Optional[str] = None,
+    robot_id: Optional[str] = None,
+    kind: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    before: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Newest-first page of events; q is an FTS5 query, before is next_before from the previous page"""
+    require_event_store()
+    validate_event_kind(kind)
+    try:
+        return event_store.search(q, robot_id, kind, since, until, before, limit)
+    except SearchError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
+
+@app.get("/events/export")
+def export_events(
+    q: Optional[str] = None,
+    robot_id: Optional[str] = None,
+    kind: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None
+):
+    """Stream every matching event as NDJSON, newest first"""
+    require_event_store()
+    validate_event_kind(kind)
+    try:
+        # Surface a bad query as a 400 before the stream starts
+        event_store.search(q, robot_id, kind, since, until, limit=1)
+    except SearchError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
+    return StreamingResponse(
+        event_store.export(q, robot_id, kind, since, until),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=events.ndjson"}
+    )
+
+@app.post("/telemetry/batch", status_code=202)
+def ingest_telemetry(batch: TelemetryBatch):
+    """Queue robot sensor samples; they are applied on the next telemetry drain"""
+    if len(batch.samples) > TELEMETRY_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {TELEMETRY_MAX_BATCH} samples per batch")
+    for sample in batch.samples:
+        telemetry.submit(sample.robot_id, sample.dict(exclude={"robot_id"}, exclude_none=True))
+    return {"status": "accepted", "samples": len(batch.samples)}
+
+@app.get("/telemetry/stats")
+def telemetry_stats():
+    """Ingest counters, current sample rate and how many robots are reporting"""
+    return telemetry.snapshot()
+
+@app.get("/analytics/aggregates")
+def get_analytics_aggregates(robot_id: Optional[str] = None):
+    """Rolling battery, temperature, utilisation and goal throughput, fleet-wide and per robot"""
+    robots = analytics.summary(robot_id)
+    if robot_id is not None and not robots:
+        raise HTTPException(status_code=404, detail=f"No analytics for robot {robot_id}")
+    return {"fleet": analytics.fleet.summary(sim_clock.time()), "robots": robots}
 
 @app.post("/command")
 async def send_command(command: Command):
+    if command.type == "move":
+        refuse_motion_during_estop("moving robots")
     try:
         target_robot_id = command.parameters.get("robot_id")
         
@@ -454,24 +1360,29 @@ async def send_command(command: Command):
             # Apply command to all robots (fallback behavior)
             robots_to_update = list(robot_state["robots"].items())
         
-        for robot_id, robot in robots_to_update:
-            if command.type == "move":
-                robot["position"][0] += command.parameters.get("x", 0)
-                robot["position"][1] += command.parameters.get("y", 0)
-            elif command.type == "rotate":
-                robot["orientation"] = (robot["orientation"] + command.parameters.get("angle", 0)) % 360
-            elif command.type == "set_speed":
-                robot["speed"] = command.parameters.get("speed", robot["speed"])
-            
-            robot["lastUpdated"] = datetime.now().strftime("%H:%M:%S")
-        
-        await broadcast_state()
+        # Validate before anything is applied, so a bad command changes no robot
+        parameters = command_parameters(command.type, command.parameters)
+        stamp = sim_clock.stamp()
+        apply_mutations([
+            {
+                "op": "command",
+                "robot_id": robot_id,
+                "type": command.type,
+                "parameters": parameters,
+                "time": stamp
+            }
+            for robot_id, robot in robots_to_update
+        ])
+        
         return {"status": "success", "message": f"Command {command.type} executed successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/goal/add")
 async def add_goal(request: Request):
+    refuse_motion_during_estop("adding goals")
     try:
         raw_data = await request.json()
         print(f"Received raw goal data: {raw_data}")
@@ -482,20 +1393,18 @@ async def add_goal(request: Request):
         goal_id = f"goal_{uuid.uuid4().hex[:4]}"
         goal_data = new_goal.dict()
         goal_data["id"] = goal_id
-        goal_data["time"] = datetime.now().strftime("%H:%M:%S")
+        goal_data["time"] = sim_clock.stamp()
         goal_data["type"] = "click_goal"
         
         current_goals = [g for g in robot["goals"] if g["status"] == "current"]
         if not current_goals and not robot["target_goal"]:
             goal_data["status"] = "current"
-            robot["target_goal"] = goal_data
             print(f"New goal added as current: {goal_data}")
         else:
             goal_data["status"] = "queued"
             print(f"New goal added to queue: {goal_data}")
         
-        robot["goals"].append(goal_data)
-        await broadcast_state()
+        apply_mutation({"op": "goal_add", "robot_id": robot_id, "goal": goal_data})
         
         return {"status": "success", "message": f"Goal {goal_id} added successfully", "goal_id": goal_id}
     except ValidationError as e:
@@ -505,37 +1414,170 @@ async def add_goal(request: Request):
         print(f"Error in add_goal: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+def goal_add_ops(goals):
+    """goal_add ops for (robot_id, x, y) triples; a robot's first goal starts now if it is idle"""
+    robots = robot_state["robots"]
+    stamp = sim_clock.stamp()
+    busy = {
+        robot_id for robot_id in {goal[0] for goal in goals}
+        if robots[robot_id]["target_goal"] or any(g["status"] == "current" for g in robots[robot_id]["goals"])
+    }
+    ops = []
+    for robot_id, x, y in goals:
+        goal_data = {
+            "x": x,
+            "y": y,
+            "robot_id": robot_id,
+            "id": f"goal_{uuid.uuid4().hex[:8]}",
+            "time": stamp,
+            "type": "click_goal"
+        }
+        if robot_id in busy:
+            goal_data["status"] = "queued"
+        else:
+            goal_data["status"] = "current"
+            busy.add(robot_id)
+        ops.append({"op": "goal_add", "robot_id": robot_id, "goal": goal_data})
+    return ops
+
+@app.post("/goal/batch")
+async def add_goal_batch(batch: GoalBatch):
+    """Queue many goals across many robots as one state version with a single broadcast"""
+    refuse_motion_during_estop("adding goals")
+    robots = robot_state["robots"]
+    errors = [
+        {"index": i, "robot_id": goal.robot_id, "detail": f"Robot {goal.robot_id} not found"}
+        for i, goal in enumerate(batch.goals) if goal.robot_id not in robots
+    ]
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    
+    ops = goal_add_ops([(goal.robot_id, goal.x, goal.y) for goal in batch.goals])
+    goal_ids = [op["goal"]["id"] for op in ops]
+    version = apply_mutations(ops)
+    print(f"Added {len(goal_ids)} goals in one batch (version {version})")
+    return {"status": "success", "message": f"{len(goal_ids)} goals added successfully", "goal_ids": goal_ids, "version": version}
+
+@app.post("/estop")
+async def post_estop(request: Optional[EStopRequest] = None):
+    """Engage the system-wide emergency stop (idempotent)"""
+    engaged = await engage_estop(request.reason if request else None)
+    return {"status": "success", "engaged": engaged, "estop": estop.state(), "latency": estop.last}
+
+@app.post("/estop/release", dependencies=admin_dependencies)
+async def post_estop_release():
+    """Release the emergency stop (Admin)"""
+    released = await release_estop()
+    return {"status": "success", "released": released, "estop": estop.state()}
+
+@app.get("/estop")
+def get_estop():
+    """Current stop state plus fan-out and delivery latency stats"""
+    return {"estop": estop.state(), "latency": estop.stats()}
+
+@app.post("/goal/dispatch")
+async def dispatch_goals(request: DispatchRequest):
+    """Assign unassigned goals to robots by travel distance plus queue length, then queue them"""
+    refuse_motion_during_estop("dispatching goals")
+    if not request.goals:
+        raise HTTPException(status_code=422, detail="No goals to dispatch")
+    if len(request.goals) > DISPATCH_MAX_GOALS:
+        raise HTTPException(status_code=413, detail=f"At most {DISPATCH_MAX_GOALS} goals per dispatch")
+    solver = request.solver or DISPATCH_SOLVER
+    if solver not in SOLVERS:
+        raise HTTPException(status_code=422, detail=f"Unknown solver '{solver}', expected one of {list(SOLVERS)}")
+    
+    candidates = [
+        (robot_id, *robot_tail(robot))
+        for robot_id, robot in robot_state["robots"].items()
+        if request.map_id is None or robot.get("map_id") == request.map_id
+    ]
+    if not candidates:
+        raise HTTPException(status_code=422, detail="No robots available for dispatch")
+    
+    queue_weight = request.queue_weight if request.queue_weight is not None else DISPATCH_QUEUE_WEIGHT
+    points = [(goal.x, goal.y) for goal in request.goals]
+    try:
+        result = await run_in_threadpool(assign_goals, candidates, points, queue_weight, solver)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    # Robots removed while the solver ran cannot take goals
+    robots = robot_state["robots"]
+    missing = sorted({robot_id for robot_id in result["robot_ids"] if robot_id not in robots})
+    if missing:
+        raise HTTPException(status_code=409, detail=f"Robots removed during dispatch: {missing}; retry")
+    
+    ops = goal_add_ops([(robot_id, x, y) for robot_id, (x, y) in zip(result["robot_ids"], points)])
+    version = apply_mutations(ops)
+    print(f"Dispatched {len(ops)} goals to {len(set(result['robot_ids']))} robots "
+          f"with {result['solver']} in {result['solve_ms']} ms (version {version})")
+    return {
+        "status": "success",
+        "assignments": [
+            {"goal_id": op["goal"]["id"], "robot_id": op["robot_id"], "cost": round(cost, 2)}
+            for op, cost in zip(ops, result["costs"])
+        ],
+        "total_cost": result["total_cost"],
+        "solver": result["solver"],
+        "solve_ms": result["solve_ms"],
+        "version": version
+    }
+
+@app.post("/command/batch")
+async def send_command_batch(batch: CommandBatch):
+    """Apply many robot commands as one state version with a single broadcast"""
+    if any(command.type == "move" for command in batch.commands):
+        refuse_motion_during_estop("moving robots")
+    robots = robot_state["robots"]
+    # Every op is built and validated before any is applied: the batch applies whole or not at all
+    stamp = sim_clock.stamp()
+    ops = []
+    errors = []
+    for i, command in enumerate(batch.commands):
+        if command.robot_id not in robots:
+            errors.append({"index": i, "robot_id": command.robot_id, "detail": f"Robot {command.robot_id} not found"})
+            continue
+        try:
+            parameters = command_parameters(command.type, command.parameters)
+        except ValueError as e:
+            errors.append({"index": i, "robot_id": command.robot_id, "detail": str(e)})
+            continue
+        ops.append({
+            "op": "command",
+            "robot_id": command.robot_id,
+            "type": command.type,
+            "parameters": parameters,
+            "time": stamp
+        })
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    
+    version = apply_mutations(ops)
+    return {"status": "success", "message": f"{len(batch.commands)} commands executed successfully", "version": version}
+
 @app.post("/goal/update")
 async def update_goal(goal: Goal):
+    if goal.status == "current":
+        refuse_motion_during_estop("setting the current goal")
     try:
-        goal_found = False
+        owner_id = None
         for robot_id, robot in robot_state["robots"].items():
-            for g in robot["goals"]:
-                if g["id"] == goal.id:
-                    goal_found = True
-                    
-                    if goal.status == "current":
-                        for other_goal in robot["goals"]:
-                            if other_goal["id"] != goal.id and other_goal["status"] == "current":
-                                other_goal["status"] = "queued"
-                        robot["target_goal"] = g
-                    
-                    g["status"] = goal.status
-                    if goal.status in ["completed", "current"]:
-                        g["time"] = datetime.now().strftime("%H:%M:%S")
-                    
-                    if goal.status == "completed" and robot["target_goal"] and robot["target_goal"]["id"] == goal.id:
-                        robot["target_goal"] = None
-                        robot["currentTask"] = "Idle"
-                    
-                    break
-            if goal_found:
+            if any(g["id"] == goal.id for g in robot["goals"]):
+                owner_id = robot_id
                 break
         
-        if not goal_found:
+        if owner_id is None:
             raise HTTPException(status_code=404, detail="Goal not found")
         
-        await broadcast_state()
+        apply_mutation({
+            "op": "goal_update",
+            "robot_id": owner_id,
+            "goal_id": goal.id,
+            "status": goal.status,
+            "time": sim_clock.stamp()
+        })
+        
         return {"status": "success", "message": f"Goal {goal.id} updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -551,23 +1593,13 @@ async def cancel_goal(request: Request = None):
             except:
                 pass
         
-        for rid, robot in robot_state["robots"].items():
-            if robot_id and rid != robot_id:
-                continue
-            
-            robot["target_goal"] = None
-            robot["currentTask"] = "Idle"
-            
-            for goal in robot["goals"]:
-                if goal["status"] == "current":
-                    goal["status"] = "cancelled"
-                    goal["time"] = datetime.now().strftime("%H:%M:%S")
-            
-            for goal in robot["goals"]:
-                if goal["status"] == "queued":
-                    goal["status"] = "cancelled"
-        
-        await broadcast_state()
+        stamp = sim_clock.stamp()
+        apply_mutations([
+            {"op": "cancel", "robot_id": rid, "time": stamp}
+            for rid in robot_state["robots"]
+            if not robot_id or rid == robot_id
+        ])
+        
         return {"status": "success", "message": "Goals cancelled, robot stopped"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -579,8 +1611,8 @@ async def add_robot_setup(robot: RobotSetupModel):
         conn = sqlite3.connect('robot_setup.db')
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO robot_setup (robot_id, robot_name, type, status, battery, last_updated, enabled, icon)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO robot_setup (robot_id, robot_name, type, status, battery, last_updated, enabled, icon, map_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             robot.robot_id,
             robot.robot_name,
@@ -589,15 +1621,15 @@ async def add_robot_setup(robot: RobotSetupModel):
             robot.battery,
             robot.last_updated,
             1 if robot.enabled else 0,
-            robot.icon
+            robot.icon,
+            robot.map_id
         ))
         conn.commit()
         conn.close()
         
         # Add robot to robot_state if enabled
         if robot.enabled:
-            get_or_create_robot(robot.robot_id)
-            await broadcast_state()
+            get_or_create_robot(robot.robot_id, robot.map_id)
         
         return {"status": "success", "message": f"Robot {robot.robot_id} added successfully"}
     except sqlite3.IntegrityError:
@@ -610,7 +1642,7 @@ def get_all_robots():
     try:
         conn = sqlite3.connect('robot_setup.db')
         cursor = conn.cursor()
-        cursor.execute('SELECT robot_id, robot_name, type, status, battery, last_updated, enabled, icon FROM robot_setup')
+        cursor.execute('SELECT robot_id, robot_name, type, status, battery, last_updated, enabled, icon, map_id FROM robot_setup')
         rows = cursor.fetchall()
         conn.close()
         
@@ -624,7 +1656,8 @@ def get_all_robots():
                 "battery": row[4],
                 "last_updated": row[5],
                 "enabled": bool(row[6]),
-                "icon": row[7]
+                "icon": row[7],
+                "map_id": row[8]
             })
         return robots
     except Exception as e:
@@ -648,7 +1681,7 @@ async def update_robot(robot_id: str, robot: RobotSetupModel):
         conn = sqlite3.connect('robot_setup.db')
         cursor = conn.cursor()
         cursor.execute('''
-            UPDATE robot_setup SET robot_name=?, type=?, status=?, battery=?, last_updated=?, enabled=?, icon=?
+            UPDATE robot_setup SET robot_name=?, type=?, status=?, battery=?, last_updated=?, enabled=?, icon=?, map_id=?
             WHERE robot_id=?
         ''', (
             robot.robot_name,
@@ -658,6 +1691,7 @@ async def update_robot(robot_id: str, robot: RobotSetupModel):
             robot.last_updated,
             1 if robot.enabled else 0,
             robot.icon,
+            robot.map_id,
             robot_id
         ))
         if cursor.rowcount == 0:
@@ -665,6 +1699,13 @@ async def update_robot(robot_id: str, robot: RobotSetupModel):
             raise HTTPException(status_code=404, detail="Robot not found")
         conn.commit()
         conn.close()
+        
+        # A new map can move the robot to a different shard
+        live_robot = robot_state["robots"].get(robot_id)
+        if live_robot is not None and live_robot.get("map_id") != robot.map_id:
+            apply_mutation({"op": "set", "robot_id": robot_id, "fields": {"map_id": robot.map_id}})
+            if shard_pool:
+                shard_pool.assign({robot_id: live_robot})
         return {"status": "success", "message": f"Robot {robot_id} updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -683,8 +1724,7 @@ async def delete_robot(robot_id: str = Path(...)):
         
         # Remove from robot_state
         if robot_id in robot_state["robots"]:
-            del robot_state["robots"][robot_id]
-        await broadcast_state()
+            apply_mutation({"op": "remove", "robot_id": robot_id})
         
         return {"status": "success", "message": f"Robot {robot_id} deleted successfully"}
     except HTTPException:
@@ -697,7 +1737,7 @@ async def toggle_robot(robot_id: str):
     try:
         conn = sqlite3.connect('robot_setup.db')
         cursor = conn.cursor()
-        cursor.execute('SELECT enabled FROM robot_setup WHERE robot_id=?', (robot_id,))
+        cursor.execute('SELECT enabled, map_id FROM robot_setup WHERE robot_id=?', (robot_id,))
         result = cursor.fetchone()
         if not result:
             conn.close()
@@ -709,14 +1749,16 @@ async def toggle_robot(robot_id: str):
         conn.commit()
         conn.close()
         
+        if event_store:
+            event_store.record("robot", f"Robot {robot_id} {'enabled' if new_enabled else 'disabled'}", robot_id, {"enabled": bool(new_enabled)})
+        
         # Update robot_state
         if new_enabled:
-            get_or_create_robot(robot_id)
+            get_or_create_robot(robot_id, result[1])
         else:
             if robot_id in robot_state["robots"]:
-                del robot_state["robots"][robot_id]
+                apply_mutation({"op": "remove", "robot_id": robot_id})
         
-        await broadcast_state()
         return {"status": "success", "message": f"Robot {robot_id} toggled successfully", "enabled": bool(new_enabled)}
     except HTTPException:
         raise
@@ -858,14 +1900,127 @@ async def delete_map(map_id: int):
         if cursor.rowcount == 0:
             conn.close()
             raise HTTPException(status_code=404, detail="Map not found")
+        cursor.execute('DELETE FROM zones WHERE map_id=?', (map_id,))
+        zones_deleted = cursor.rowcount
         conn.commit()
         conn.close()
+        if zones_deleted:
+            load_zones()
         return {"status": "success", "message": "Map deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Zone API endpoints
+def check_zone(polygon, speed_limit):
+    problem = validate_polygon(polygon) if polygon is not None else None
+    if problem is None and speed_limit is not None and speed_limit <= 0:
+        problem = "speed_limit must be greater than 0"
+    if problem:
+        raise HTTPException(status_code=400, detail=problem)
+
+@app.get("/maps/{map_id}/zones")
+def get_zones(map_id: int):
+    try:
+        conn = sqlite3.connect('robot_setup.db')
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, map_id, zone_name, zone_type, polygon, speed_limit FROM zones WHERE map_id=?', (map_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        return [zone_row(row) for row in rows]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/maps/{map_id}/zones")
+async def add_zone(map_id: int, zone: ZoneModel):
+    check_zone(zone.polygon, zone.speed_limit)
+    try:
+        conn = sqlite3.connect('robot_setup.db')
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM maps WHERE id=?', (map_id,))
+        if not cursor.fetchone():
+            conn.close()
+            raise HTTPException(status_code=404, detail="Map not found")
+        cursor.execute('''
+            INSERT INTO zones (map_id, zone_name, zone_type, polygon, speed_limit)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (map_id, zone.zone_name, zone.zone_type, json.dumps(zone.polygon), zone.speed_limit))
+        zone_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        load_zones()
+        return {"status": "success", "message": "Zone added successfully", "id": zone_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/zones/{zone_id}")
+async def update_zone(zone_id: int, zone: ZoneUpdateModel):
+    check_zone(zone.polygon, zone.speed_limit)
+    try:
+        conn = sqlite3.connect('robot_setup.db')
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id FROM zones WHERE id=?', (zone_id,))
+        if not cursor.fetchone():
+            conn.close()
+            raise HTTPException(status_code=404, detail="Zone not found")
+        
+        updates = []
+        values = []
+        if zone.zone_name is not None:
+            updates.append("zone_name=?")
+            values.append(zone.zone_name)
+        if zone.zone_type is not None:
+            updates.append("zone_type=?")
+            values.append(zone.zone_type)
+        if zone.polygon is not None:
+            updates.append("polygon=?")
+            values.append(json.dumps(zone.polygon))
+        # Sent explicitly as null, speed_limit lifts the zone's cap
+        if "speed_limit" in zone.__fields_set__:
+            updates.append("speed_limit=?")
+            values.append(zone.speed_limit)
+        
+        if updates:
+            values.append(zone_id)
+            cursor.execute(f'UPDATE zones SET {", ".join(updates)} WHERE id=?', values)
+            conn.commit()
+        
+        conn.close()
+        if updates:
+            load_zones()
+        return {"status": "success", "message": "Zone updated successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/zones/{zone_id}")
+async def delete_zone(zone_id: int):
+    try:
+        conn = sqlite3.connect('robot_setup.db')
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM zones WHERE id=?', (zone_id,))
+        if cursor.rowcount == 0:
+            conn.close()
+            raise HTTPException(status_code=404, detail="Zone not found")
+        conn.commit()
+        conn.close()
+        load_zones()
+        return {"status": "success", "message": "Zone deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/zones/stats")
+def zone_stats():
+    """Zone index size and how much of the per-tick zone checking was skipped"""
+    return zone_tracker.snapshot()
+
 # Test endpoints
 @app.get("/ws-test")
 def websocket_test():
@@ -875,7 +2030,10 @@ def websocket_test():
         "instructions": "Connect using a WebSocket client to test the connection"
     }
 
+startup_state["import_ms"] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+print(f"Imported main in {startup_state['import_ms']} ms")
+
 if __name__ == "__main__":
     import uvicorn
     print("Starting Robot Dashboard server...")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE)
\ No newline at end of file
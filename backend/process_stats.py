@@ -0,0 +1,80 @@
+"""Sampled process resource telemetry for the health endpoints.
+
+A background task samples the server process every ``interval`` seconds and
+keeps a short history, so memory or descriptor growth shows up as a trend
+before it becomes an outage. psutil calls run in a worker thread; only the
+asyncio task census runs on the loop, since it has to.
+"""
+
+import asyncio
+import gc
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    print("Warning: psutil not installed. Process stats will be limited.")
+    PSUTIL_AVAILABLE = False
+
+
+def _task_name(task) -> str:
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", None) or task.get_name()
+
+
+class ProcessStatsCollector:
+    def __init__(self, interval: float = 5.0, history: int = 120,
+                 extra: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.interval = interval
+        self.history = deque(maxlen=history)
+        self.extra = extra
+        self._process = psutil.Process() if PSUTIL_AVAILABLE else None
+        if self._process:
+            # First cpu_percent call only primes the counter
+            self._process.cpu_percent(None)
+
+    def _sample_process(self) -> Dict[str, Any]:
+        if not self._process:
+            return {}
+        p = self._process
+        with p.oneshot():
+            sample = {
+                "rss_mb": round(p.memory_info().rss / (1024 * 1024), 2),
+                "cpu_percent": p.cpu_percent(None),
+                "threads": p.num_threads()
+            }
+            try:
+                sample["open_fds"] = p.num_fds()
+            except AttributeError:
+                # Windows has handles instead of file descriptors
+                sample["open_handles"] = p.num_handles()
+        return sample
+
+    async def sample(self) -> Dict[str, Any]:
+        sample = {"time": time.strftime("%H:%M:%S")}
+        sample.update(await asyncio.to_thread(self._sample_process))
+        sample["gc_counts"] = list(gc.get_count())
+        sample["gc_collections"] = [gen["collections"] for gen in gc.get_stats()]
+        tasks = asyncio.all_tasks()
+        sample["tasks"] = len(tasks)
+        sample["tasks_by_name"] = dict(Counter(_task_name(t) for t in tasks).most_common())
+        if self.extra:
+            sample.update(self.extra())
+        self.history.append(sample)
+        return sample
+
+    @property
+    def current(self) -> Optional[Dict[str, Any]]:
+        return self.history[-1] if self.history else None
+
+    async def run(self):
+        print("Process stats task started.")
+        while True:
+            try:
+                await self.sample()
+            except Exception as e:
+                print(f"Error sampling process stats: {e}")
+            await asyncio.sleep(self.interval)
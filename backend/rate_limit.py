@@ -0,0 +1,129 @@
+"""Per-client token-bucket rate limiting.
+
+Every client gets one bucket per budget: ``read`` for GET/HEAD requests and
+``mutation`` for everything else. A client is identified by its ``X-API-Key``
+header if that is a configured key, else by the user of a bearer token that
+verifies, else by its address. Unknown keys and invalid tokens are charged to
+the address, so sending a fresh one per request buys no extra budget and
+cannot flood the bucket table. A request that finds its
+bucket empty is answered with 429 and a ``Retry-After`` of the time until
+the next token. Buckets of idle clients are evicted least recently used.
+
+``RateLimitMiddleware`` applies it to HTTP requests; the WebSocket handler
+calls ``RateLimiter.check`` itself for each incoming message.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Collection, Dict, Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, rate: float, capacity: float, now: float, cost: float = 1.0) -> float:
+        """Spend ``cost`` tokens; returns 0 on success, else seconds until they are available"""
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / rate
+
+
+class RateLimiter:
+    def __init__(self, budgets: Dict[str, Tuple[float, float]], max_clients: int = 10000):
+        """``budgets`` maps a budget name to (tokens per second, burst); a rate of 0 means unlimited"""
+        self.budgets = budgets
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.allowed = {name: 0 for name in budgets}
+        self.limited = {name: 0 for name in budgets}
+
+    def check(self, client: str, budget: str, cost: float = 1.0) -> float:
+        """Charge a request to a client's budget; returns 0 if allowed, else the retry delay in seconds"""
+        rate, burst = self.budgets[budget]
+        if rate <= 0:
+            self.allowed[budget] += 1
+            return 0.0
+        now = time.monotonic()
+        key = (client, budget)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        retry_after = bucket.take(rate, burst, now, cost)
+        if retry_after:
+            self.limited[budget] += 1
+        else:
+            self.allowed[budget] += 1
+        return retry_after
+
+    def stats(self):
+        return {
+            "budgets": {name: {"rate": rate, "burst": burst, "allowed": self.allowed[name], "limited": self.limited[name]}
+                        for name, (rate, burst) in self.budgets.items()},
+            "tracked_buckets": len(self._buckets)
+        }
+
+
+def client_key(scope, verify_token: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+               api_keys: Collection[str] = ()) -> str:
+    """Who a request or WebSocket is charged to: a known API key, then the user of a valid session, then address"""
+    headers = Headers(scope=scope)
+    api_key = headers.get("x-api-key")
+    if api_key and api_key in api_keys:
+        return f"key:{api_key}"
+    authorization = headers.get("authorization", "")
+    if verify_token and authorization.lower().startswith("bearer "):
+        session = verify_token(authorization[7:].strip())
+        if session:
+            return f"user:{session['uid']}"
+    client = scope.get("client")
+    return f"addr:{client[0] if client else 'unknown'}"
+
+
+def too_many_requests(budget: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": f"Rate limit exceeded for {budget} requests", "budget": budget,
+         "retry_after": round(retry_after, 3)},
+        status_code=429,
+        # Retry-After takes whole seconds; the body carries the precise delay
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: RateLimiter, exempt_paths: Iterable[str] = (),
+                 key: Callable[[Any], str] = client_key):
+        self.app = app
+        self.limiter = limiter
+        self.exempt_paths = tuple(exempt_paths)
+        self.key = key
+
+    def _exempt(self, path: str) -> bool:
+        return any(path == prefix or path.startswith(prefix.rstrip("/") + "/") for prefix in self.exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._exempt(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        budget = "read" if scope["method"] in READ_METHODS else "mutation"
+        retry_after = self.limiter.check(self.key(scope), budget)
+        if retry_after:
+            await too_many_requests(budget, retry_after)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,50 @@
+"""Goal-transition replay buffer behind resumable WebSocket sessions.
+
+A client that reconnects with the ``boot_id`` and ``version`` it last saw
+gets one catch-up frame instead of the full state: the robots changed since
+that version (from ``ChangeFeed``) plus every goal transition it missed, in
+order, from this buffer. The buffer is a bounded ring of transitions tagged
+with the state version that produced them; once a transition newer than
+the client's version has been evicted the gap is too old to replay, and the
+client gets a full snapshot instead.
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, List, Tuple
+
+# (robot_id, goal_id, status, time)
+Transition = Tuple[str, str, str, str]
+
+
+class ReplayBuffer:
+    def __init__(self, capacity: int = 20000):
+        self.capacity = capacity
+        self._entries = deque()
+        # Every transition from a version after this one is still in the buffer
+        self.horizon = 0
+        self.stats = {"resumed": 0, "snapshots": 0, "transitions_replayed": 0}
+
+    def record(self, version: int, transitions: Iterable[Transition]):
+        entries = self._entries
+        for transition in transitions:
+            if len(entries) >= self.capacity:
+                self.horizon = entries.popleft()[0]
+            entries.append((version, *transition))
+
+    def covers(self, since: int) -> bool:
+        """Whether every transition after version ``since`` can still be replayed"""
+        return since >= self.horizon
+
+    def since(self, version: int) -> List[Dict[str, Any]]:
+        """Transitions after ``version``, oldest first"""
+        missed = []
+        for entry in reversed(self._entries):
+            if entry[0] <= version:
+                break
+            missed.append(entry)
+        missed.reverse()
+        return [{"version": v, "robot_id": robot_id, "goal_id": goal_id, "status": status, "time": t}
+                for v, robot_id, goal_id, status, t in missed]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "buffered": len(self._entries), "capacity": self.capacity, "horizon": self.horizon}
@@ -0,0 +1,101 @@
+"""Deadline-based fixed-timestep scheduler for the movement loop.
+
+Ticks are laid on a fixed grid (``interval`` apart) instead of sleeping a
+fixed time after the work is done, so the tick rate does not drift as the
+work per tick grows. When a deadline is missed the scheduler either catches
+up with several fixed steps (``catch_up``) or integrates the missed time in
+one larger step (``skip``). Either way at most ``max_catch_up`` intervals of
+simulated time are produced per tick; anything beyond that is dropped and
+counted in ``skipped``.
+
+Time comes from a ``SimClock``, so the same grid runs on wall time, scaled
+time or stepped virtual time. Once a bounded simulated run has ended, ``wait``
+ticks every ``interval`` of wall time with no steps.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from sim_clock import SimClock
+
+POLICIES = ("catch_up", "skip")
+
+
+class FixedTimestepScheduler:
+    def __init__(self, interval: float, policy: str = "catch_up", max_catch_up: int = 5,
+                 clock: Optional[SimClock] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown tick policy '{policy}', expected one of {POLICIES}")
+        self.interval = interval
+        self.policy = policy
+        self.max_catch_up = max(1, max_catch_up)
+        self.clock = clock or SimClock()
+        self._next = None
+        self.ticks = 0
+        self.missed = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.last_work = 0.0
+
+    def _delay(self) -> float:
+        now = self.clock.monotonic()
+        if self._next is None:
+            self._next = now
+        return self._next - now
+
+    def _steps(self) -> List[float]:
+        lag = max(0.0, self.clock.monotonic() - self._next)
+        missed = int(lag // self.interval)
+        covered = min(missed + 1, self.max_catch_up)
+        if self.policy == "catch_up":
+            steps = [self.interval] * covered
+        else:
+            steps = [self.interval * covered]
+
+        self._next += (missed + 1) * self.interval
+        self.ticks += 1
+        self.missed += missed
+        self.skipped += missed + 1 - covered
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        return steps
+
+    async def wait(self) -> List[float]:
+        """Sleep until the next deadline and return the time steps (seconds) to simulate"""
+        # Always suspend, even when behind: an overrunning loop that never yields
+        # would starve every other task (requests, E-stop) on the event loop
+        delay = self._delay()
+        if self.clock.reaches_end(delay):
+            # Simulated time has stopped; keep the caller's loop turning on wall time
+            await asyncio.sleep(self.interval)
+            return []
+        await self.clock.sleep(delay)
+        return self._steps()
+
+    def wait_blocking(self) -> List[float]:
+        """Same as ``wait`` for loops that run outside asyncio (shard workers)"""
+        delay = self._delay()
+        if delay > 0:
+            self.clock.sleep_blocking(delay)
+        return self._steps()
+
+    def record_work(self, seconds: float):
+        """Record how long the tick's work took; longer than one interval is an overrun"""
+        self.last_work = seconds
+        if seconds > self.interval:
+            self.overruns += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": round(self.interval * 1000, 2),
+            "policy": self.policy,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "missed": self.missed,
+            "skipped": self.skipped,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "last_work_ms": round(self.last_work * 1000, 2)
+        }
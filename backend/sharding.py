@@ -0,0 +1,211 @@
+"""Sharded robot simulation across worker processes.
+
+The fleet is partitioned by assigned map, by configured zone or by robot id.
+Each shard runs its own movement loop over the robots it owns and streams
+compact pose updates (see ``simulation.make_pose``) back to the API process.
+Mutations made by the API (new goals, commands, cancels) are routed to the
+owning shard as ops so both copies of a robot stay in step.
+
+Robots follow their partition: a robot whose map changes is re-assigned by
+the API, and with the zone partition ``migrate`` moves robots that drove
+across a zone boundary to the shard owning their new zone. Poses still in
+flight from a robot's previous shard are dropped.
+"""
+
+import multiprocessing
+import queue
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from scheduler import FixedTimestepScheduler
+from sim_clock import SimClock
+from simulation import SPEED_SCALE, advance_robot, apply_op, make_pose, shard_for
+
+
+def _shard_worker(index, inbox, outbox, tick_interval, tick_policy, max_catch_up, speed_scale, clock_args):
+    """Movement loop for one shard; runs in its own process"""
+    robots: Dict[str, Dict[str, Any]] = {}
+    clock = SimClock(*clock_args)
+    scheduler = FixedTimestepScheduler(tick_interval, tick_policy, max_catch_up, clock)
+    halted = False
+    while True:
+        steps = scheduler.wait_blocking()
+
+        # Apply everything the API routed to us since the last tick. Robots
+        # touched by an op always report back so the API copy is re-synced
+        # even if a pose from before the op was still in flight.
+        touched = set()
+        while True:
+            try:
+                batch = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                return
+            for op in batch:
+                if op["op"] == "halt":
+                    halted = op["active"]
+                    continue
+                apply_op(robots, op)
+                touched.add(op.get("robot_id"))
+
+        started = time.monotonic()
+        stamp = clock.stamp()
+        # Past the end of a bounded simulated run robots hold position like under an E-stop
+        hold = halted or clock.finished
+        poses = []
+        for robot_id, robot in robots.items():
+            # While halted (E-stop) robots hold position but still resync after ops
+            transitions = None if hold else advance_robot(robot, stamp, steps, speed_scale)
+            if transitions is not None:
+                poses.append(make_pose(robot_id, robot, transitions))
+            elif robot_id in touched:
+                goals = [(g["id"], g["status"], g["time"]) for g in robot["goals"]]
+                poses.append(make_pose(robot_id, robot, goals))
+        scheduler.record_work(time.monotonic() - started)
+
+        if poses or scheduler.ticks % 50 == 0:
+            outbox.put((index, poses, {"robots": len(robots), **scheduler.stats()}))
+
+
+class ShardPool:
+    """Owns the shard processes and routes ops to the shard owning each robot"""
+
+    def __init__(self, shard_count: int, partition: str = "robot",
+                 zones: Optional[Dict[str, List[float]]] = None,
+                 tick_interval: float = 0.1, tick_policy: str = "catch_up", max_catch_up: int = 5,
+                 speed_scale: float = SPEED_SCALE, start_method: Optional[str] = None,
+                 clock: Optional[SimClock] = None):
+        self.shard_count = shard_count
+        self.partition = partition
+        self.zones = zones or {}
+        self.tick_interval = tick_interval
+        self.tick_policy = tick_policy
+        self.max_catch_up = max_catch_up
+        self.speed_scale = speed_scale
+        self.clock = clock or SimClock()
+        self._ctx = multiprocessing.get_context(start_method)
+        self._inboxes = []
+        self._processes = []
+        self._outbox = None
+        self.owners: Dict[str, int] = {}
+        self.stats: Dict[int, Dict[str, Any]] = {}
+        self.migrations = 0
+
+    def start(self):
+        self._outbox = self._ctx.Queue()
+        # Workers start their own clock where this process's clock is now
+        clock = self.clock
+        remaining = max(1e-6, clock.until - clock.elapsed()) if clock.until else 0.0
+        clock_args = (clock.mode, clock.speed, remaining, clock.time())
+        for index in range(self.shard_count):
+            inbox = self._ctx.Queue()
+            process = self._ctx.Process(
+                target=_shard_worker,
+                args=(index, inbox, self._outbox, self.tick_interval,
+                      self.tick_policy, self.max_catch_up, self.speed_scale, clock_args),
+                name=f"robot-shard-{index}",
+                daemon=True
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+        print(f"Started {self.shard_count} simulation shards (partition={self.partition})")
+
+    def stop(self):
+        for inbox in self._inboxes:
+            try:
+                inbox.put(None)
+            except Exception:
+                pass
+        for process in self._processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self._inboxes = []
+        self._processes = []
+
+    def partition_key(self, robot_id: str, robot: Dict[str, Any]) -> str:
+        if self.partition == "map" and robot.get("map_id") is not None:
+            return f"map:{robot['map_id']}"
+        if self.partition == "zone":
+            x, y = robot["position"]
+            for name, (x0, y0, x1, y1) in self.zones.items():
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    return f"zone:{name}"
+        return robot_id
+
+    def owner(self, robot_id: str) -> Optional[int]:
+        return self.owners.get(robot_id)
+
+    def assign(self, robots: Dict[str, Dict[str, Any]]):
+        """Hand whole robots to their owning shards, one batch per shard"""
+        batches: Dict[int, list] = {}
+        for robot_id, robot in robots.items():
+            index = shard_for(self.partition_key(robot_id, robot), self.shard_count)
+            previous = self.owners.get(robot_id)
+            if previous is not None and previous != index:
+                batches.setdefault(previous, []).append({"op": "remove", "robot_id": robot_id})
+            self.owners[robot_id] = index
+            batches.setdefault(index, []).append({"op": "upsert", "robot_id": robot_id, "robot": robot})
+        for index, batch in batches.items():
+            self._inboxes[index].put(batch)
+
+    def migrate(self, robots: Dict[str, Dict[str, Any]], robot_ids: Iterable[str]) -> int:
+        """Re-assign moved robots whose zone now belongs to another shard; returns how many moved"""
+        if self.partition != "zone":
+            return 0
+        moving = {}
+        for robot_id in robot_ids:
+            robot = robots.get(robot_id)
+            index = self.owners.get(robot_id)
+            if robot is not None and index is not None and \
+                    shard_for(self.partition_key(robot_id, robot), self.shard_count) != index:
+                moving[robot_id] = robot
+        if moving:
+            self.assign(moving)
+            self.migrations += len(moving)
+        return len(moving)
+
+    def route(self, ops: List[Dict[str, Any]]):
+        """Forward mutation ops to the shards owning their robots, one message per shard"""
+        batches: Dict[int, list] = {}
+        for op in ops:
+            robot_id = op.get("robot_id")
+            index = self.owners.get(robot_id)
+            if index is None:
+                continue
+            if op["op"] == "remove":
+                del self.owners[robot_id]
+            batches.setdefault(index, []).append(op)
+        for index, batch in batches.items():
+            self._inboxes[index].put(batch)
+
+    def halt(self, active: bool):
+        """Stop (or resume) motion on every shard from its next tick"""
+        for inbox in self._inboxes:
+            inbox.put([{"op": "halt", "active": active}])
+
+    def drain(self) -> List[tuple]:
+        """Collect every pose update the shards produced since the last call"""
+        poses = []
+        while True:
+            try:
+                index, batch, stats = self._outbox.get_nowait()
+            except queue.Empty:
+                break
+            # A robot that migrated may still have poses queued by its old shard
+            owners = self.owners
+            poses.extend(pose for pose in batch if owners.get(pose[0]) == index)
+            self.stats[index] = stats
+        return poses
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "shards": self.shard_count,
+            "partition": self.partition,
+            "robots": len(self.owners),
+            "migrations": self.migrations,
+            "alive": sum(1 for p in self._processes if p.is_alive()),
+            "per_shard": {str(i): s for i, s in sorted(self.stats.items())}
+        }
@@ -0,0 +1,154 @@
+"""Pluggable clock for the fleet simulation.
+
+The movement loop, the sensor publisher, goal and command timestamps, trails
+and analytics read time through a ``SimClock`` instead of ``time`` and
+``datetime.now()`` directly, so the simulation can run faster than real time:
+
+- ``real``: wall-clock time, the default.
+- ``scaled``: simulated time runs ``speed`` times faster than wall time and
+  every simulated sleep is ``speed`` times shorter.
+- ``stepped``: simulated time only moves when every task driven by the clock
+  is asleep on it, jumping straight to the earliest wake-up. The simulation
+  runs as fast as the CPU allows and is deterministic in its step sizes.
+
+Tasks driven by a stepped clock call ``join()`` when they start; time
+waits for all of them to be asleep, so a tick that is still broadcasting is
+never overtaken by the next one. With ``until`` set,
+simulated time stops there (e.g. 28800 for an 8-hour shift) and the driven
+tasks stay asleep, leaving the final state for inspection. The movement
+loop's scheduler is the exception: it keeps ticking on wall time with
+nothing to simulate, so API changes are still broadcast.
+
+Infrastructure (request handling, auth expiry, event log timestamps, DB
+flushes) stays on wall time.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+CLOCK_MODES = ("real", "scaled", "stepped")
+
+# Slack for float drift in accumulated tick deadlines when comparing against ``until``
+EPSILON = 1e-6
+
+
+class SimClock:
+    def __init__(self, mode: str = "real", speed: float = 1.0, until: float = 0.0, origin: Optional[float] = None):
+        if mode not in CLOCK_MODES:
+            raise ValueError(f"Unknown clock mode '{mode}', expected one of {CLOCK_MODES}")
+        if mode == "scaled" and speed <= 0:
+            raise ValueError("A scaled clock needs a positive speed")
+        self.mode = mode
+        self.speed = speed if mode == "scaled" else 1.0
+        self.until = until if mode != "real" else 0.0
+        # Simulated epoch time at which the clock started
+        self.origin = time.time() if origin is None else origin
+        self._real_start = time.monotonic()
+        self._stepped_elapsed = 0.0
+        self._sleepers = []
+        self._order = itertools.count()
+        self._participants = 0
+        self._advance_scheduled = False
+
+    @property
+    def stepped(self) -> bool:
+        return self.mode == "stepped"
+
+    def elapsed(self) -> float:
+        """Simulated seconds since the clock started"""
+        if self.mode == "stepped":
+            return self._stepped_elapsed
+        elapsed = (time.monotonic() - self._real_start) * self.speed
+        return min(elapsed, self.until) if self.until else elapsed
+
+    @property
+    def finished(self) -> bool:
+        return bool(self.until) and self.elapsed() >= self.until - EPSILON
+
+    def monotonic(self) -> float:
+        return time.monotonic() if self.mode == "real" else self.elapsed()
+
+    def time(self) -> float:
+        return time.time() if self.mode == "real" else self.origin + self.elapsed()
+
+    def now(self) -> datetime:
+        return datetime.now() if self.mode == "real" else datetime.fromtimestamp(self.time())
+
+    def stamp(self) -> str:
+        """HH:MM:SS used for goal, command and robot timestamps"""
+        return self.now().strftime("%H:%M:%S")
+
+    def join(self):
+        """Register a task whose sleeps a stepped clock must wait for before moving on"""
+        self._participants += 1
+
+    def leave(self):
+        """Unregister a joined task that will not sleep on the clock again, so time can move on without it"""
+        self._participants -= 1
+        self._schedule_advance()
+
+    def reaches_end(self, seconds: float) -> bool:
+        """Whether ``seconds`` more of simulated time would run past ``until``"""
+        return bool(self.until) and self.elapsed() + max(0.0, seconds) > self.until + EPSILON
+
+    async def sleep(self, seconds: float):
+        seconds = max(0.0, seconds)
+        if self.mode == "real":
+            await asyncio.sleep(seconds)
+            return
+        if self.reaches_end(seconds):
+            # Past the end of the run: sleep until the task is cancelled
+            self.leave()
+            await asyncio.get_running_loop().create_future()
+        if self.mode == "scaled":
+            await asyncio.sleep(seconds / self.speed)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self._stepped_elapsed + seconds, next(self._order), future))
+        self._schedule_advance()
+        await future
+
+    def sleep_blocking(self, seconds: float):
+        """``sleep`` for a loop outside asyncio; a stepped clock just moves on"""
+        seconds = max(0.0, seconds)
+        if self.mode == "stepped":
+            self._stepped_elapsed += seconds
+        else:
+            time.sleep(seconds / self.speed)
+
+    def _schedule_advance(self):
+        if self.mode == "stepped" and not self._advance_scheduled and self._sleepers:
+            self._advance_scheduled = True
+            asyncio.get_running_loop().call_soon(self._advance)
+
+    def _advance(self):
+        self._advance_scheduled = False
+        sleepers = self._sleepers
+        while sleepers and sleepers[0][2].done():
+            heapq.heappop(sleepers)
+        # Only move time once every driven task is asleep on the clock
+        if not sleepers or sum(1 for sleeper in sleepers if not sleeper[2].done()) < self._participants:
+            return
+        self._stepped_elapsed = max(self._stepped_elapsed, sleepers[0][0])
+        while sleepers and sleepers[0][0] <= self._stepped_elapsed:
+            future = heapq.heappop(sleepers)[2]
+            if not future.done():
+                future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        real = time.monotonic() - self._real_start
+        elapsed = self.elapsed()
+        return {
+            "mode": self.mode,
+            "speed": self.speed,
+            "sim_time": self.now().isoformat(timespec="seconds"),
+            "sim_elapsed_s": round(elapsed, 3),
+            "real_elapsed_s": round(real, 3),
+            "effective_speed": round(elapsed / real, 2) if real else None,
+            "until_s": self.until or None,
+            "finished": self.finished
+        }
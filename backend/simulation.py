@@ -0,0 +1,240 @@
+"""Robot movement simulation shared by the API process and shard workers.
+
+Everything here works on plain robot dicts (the same shape as the entries in
+``robot_state["robots"]``) so it can run in-process or inside a shard worker
+without importing FastAPI.
+"""
+
+import math
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+GOAL_TOLERANCE = 5
+# Map pixels per second travelled at speed 1.0 (the default speed 0.5 moves 50 px/s)
+SPEED_SCALE = 100.0
+# Slowest a robot moves; the API refuses speeds <= 0, this guards state restored from older logs
+MIN_SPEED = 0.01
+
+
+def now_str() -> str:
+    return datetime.now().strftime("%H:%M:%S")
+
+
+def new_robot(position: List[float]) -> Dict[str, Any]:
+    """Create a fresh robot entry at the given position"""
+    return {
+        "position": list(position),
+        "orientation": 0,
+        "battery": 100,
+        "currentTask": "Idle",
+        "lastUpdated": now_str(),
+        "goals": [],
+        "target_goal": None,
+        "speed": 0.5
+    }
+
+
+def get_next_goal(robot):
+    """Get the next queued goal for a specific robot"""
+    for goal in robot["goals"]:
+        if goal["status"] == "queued":
+            return goal
+    return None
+
+
+def _start_next_goal(robot, transitions, stamp):
+    next_goal = get_next_goal(robot)
+    if next_goal:
+        next_goal["status"] = "current"
+        next_goal["time"] = stamp
+        robot["target_goal"] = next_goal
+        transitions.append((next_goal["id"], "current", stamp))
+
+
+def step_robot(robot, stamp: Optional[str] = None, dt: float = 0.1,
+               speed_scale: float = SPEED_SCALE) -> Optional[List[Tuple[str, str, str]]]:
+    """Advance one robot by ``dt`` seconds at its own speed, or its zone ``speed_cap`` if lower.
+
+    ``stamp`` is the tick's ``HH:MM:SS`` time; callers stepping many robots
+    should format it once per tick. Returns None when the robot did not
+    change, otherwise the list of goal transitions ``(goal_id, status, time)``
+    that happened during the tick (possibly empty when the robot only moved).
+    """
+    target = robot["target_goal"]
+    transitions = []
+
+    # Update goal queue for this robot
+    if not target:
+        if any(g["status"] == "current" for g in robot["goals"]) or get_next_goal(robot) is None:
+            return None
+        stamp = stamp or now_str()
+        _start_next_goal(robot, transitions, stamp)
+        target = robot["target_goal"]
+
+    # Move toward target goal
+    stamp = stamp or now_str()
+    target_x = target["x"]
+    target_y = target["y"]
+    position = robot["position"]
+    dx = target_x - position[0]
+    dy = target_y - position[1]
+    distance = math.hypot(dx, dy)
+    speed = robot["speed"]
+    cap = robot.get("speed_cap")
+    if cap is not None and cap < speed:
+        speed = cap
+    # A zero or negative speed would never arrive, or move away from the goal forever
+    if speed < MIN_SPEED:
+        speed = MIN_SPEED
+    step = speed * speed_scale * dt
+
+    # Arrive instead of overshooting when the goal is within this step
+    if distance < GOAL_TOLERANCE or distance <= step:
+        robot["position"] = [target_x, target_y]
+        for goal in robot["goals"]:
+            if goal["id"] == target["id"]:
+                goal["status"] = "completed"
+                goal["time"] = stamp
+                transitions.append((goal["id"], "completed", stamp))
+                break
+        robot["currentTask"] = "Idle"
+        robot["target_goal"] = None
+
+        # Start next goal in queue
+        _start_next_goal(robot, transitions, stamp)
+    else:
+        angle = math.atan2(dy, dx)
+        position[0] += step * dx / distance
+        position[1] += step * dy / distance
+        robot["currentTask"] = "Navigating"
+        robot["orientation"] = math.degrees(angle) % 360
+
+    robot["lastUpdated"] = stamp
+    return transitions
+
+
+def advance_robot(robot, stamp: str, steps: List[float],
+                  speed_scale: float = SPEED_SCALE) -> Optional[List[Tuple[str, str, str]]]:
+    """Run ``step_robot`` once per scheduler step, merging the transitions"""
+    merged = None
+    for dt in steps:
+        transitions = step_robot(robot, stamp, dt, speed_scale)
+        if transitions is None:
+            break
+        merged = transitions if merged is None else merged + transitions
+    return merged
+
+
+# Compact pose updates
+#
+# A pose is the tuple a shard streams back to the API process for every robot
+# that changed during a tick:
+#   (robot_id, x, y, orientation, currentTask, lastUpdated, target_goal_id, transitions)
+
+def make_pose(robot_id, robot, transitions):
+    target = robot["target_goal"]
+    return (
+        robot_id,
+        round(robot["position"][0], 2),
+        round(robot["position"][1], 2),
+        round(robot["orientation"], 1),
+        robot["currentTask"],
+        robot["lastUpdated"],
+        target["id"] if target else None,
+        transitions,
+    )
+
+
+def apply_pose(robot, pose):
+    """Apply a compact pose update produced by ``make_pose`` to a robot dict"""
+    _, x, y, orientation, task, last_updated, target_id, transitions = pose
+    robot["position"] = [x, y]
+    robot["orientation"] = orientation
+    robot["currentTask"] = task
+    robot["lastUpdated"] = last_updated
+    if transitions:
+        by_id = {g["id"]: g for g in robot["goals"]}
+        for goal_id, status, stamp in transitions:
+            goal = by_id.get(goal_id)
+            if goal:
+                goal["status"] = status
+                goal["time"] = stamp
+    robot["target_goal"] = None
+    if target_id:
+        for goal in robot["goals"]:
+            if goal["id"] == target_id:
+                robot["target_goal"] = goal
+                break
+
+
+# State mutations
+#
+# Every change the API makes to a robot is expressed as an op dict so the same
+# mutation can be replayed against another copy of the state (a shard worker).
+
+def apply_op(robots: Dict[str, Dict[str, Any]], op: Dict[str, Any]):
+    """Apply a single mutation op to a robots mapping"""
+    kind = op["op"]
+    robot_id = op.get("robot_id")
+
+    if kind == "upsert":
+        if robot_id not in robots:
+            robots[robot_id] = op.get("robot") or new_robot(op["position"])
+        return
+    if kind == "remove":
+        robots.pop(robot_id, None)
+        return
+
+    robot = robots.get(robot_id)
+    if robot is None:
+        return
+
+    if kind == "goal_add":
+        goal = dict(op["goal"])
+        robot["goals"].append(goal)
+        if goal["status"] == "current":
+            robot["target_goal"] = goal
+    elif kind == "goal_update":
+        for g in robot["goals"]:
+            if g["id"] != op["goal_id"]:
+                continue
+            status = op["status"]
+            if status == "current":
+                for other_goal in robot["goals"]:
+                    if other_goal["id"] != g["id"] and other_goal["status"] == "current":
+                        other_goal["status"] = "queued"
+                robot["target_goal"] = g
+            g["status"] = status
+            if status in ["completed", "current"]:
+                g["time"] = op["time"]
+            if status == "completed" and robot["target_goal"] and robot["target_goal"]["id"] == g["id"]:
+                robot["target_goal"] = None
+                robot["currentTask"] = "Idle"
+            break
+    elif kind == "cancel":
+        robot["target_goal"] = None
+        robot["currentTask"] = "Idle"
+        for goal in robot["goals"]:
+            if goal["status"] == "current":
+                goal["status"] = "cancelled"
+                goal["time"] = op["time"]
+            elif goal["status"] == "queued":
+                goal["status"] = "cancelled"
+    elif kind == "command":
+        params = op["parameters"]
+        if op["type"] == "move":
+            robot["position"][0] += params.get("x", 0)
+            robot["position"][1] += params.get("y", 0)
+        elif op["type"] == "rotate":
+            robot["orientation"] = (robot["orientation"] + params.get("angle", 0)) % 360
+        elif op["type"] == "set_speed":
+            robot["speed"] = float(params.get("speed", robot["speed"]))
+        robot["lastUpdated"] = op["time"]
+    elif kind == "set":
+        robot.update(op["fields"])
+
+
+def shard_for(key: str, shard_count: int) -> int:
+    """Stable shard index for a partition key (same in every process)"""
+    return zlib.crc32(str(key).encode()) % shard_count
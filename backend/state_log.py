@@ -0,0 +1,179 @@
+"""Append-only log of robot_state mutations with periodic snapshots.
+
+Every op passed to ``main.apply_mutation`` and every pose update produced by
+the movement loop is appended here. Appends are buffered and written by a
+single background task (group commit), and poses are coalesced per robot so a
+busy fleet costs one record per robot per commit rather than one per tick.
+On startup the latest snapshot is loaded and the log tail replayed on top.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from simulation import apply_op, apply_pose
+
+SNAPSHOT_FILE = "snapshot.json"
+LOG_FILE = "ops.log"
+
+
+def _dumps(record):
+    return json.dumps(record, separators=(",", ":"))
+
+
+def relink_target_goals(robots: Dict[str, Dict[str, Any]]):
+    """Point each robot's target_goal back at the matching entry in its goals list"""
+    for robot in robots.values():
+        target = robot.get("target_goal")
+        if target:
+            robot["target_goal"] = next((g for g in robot["goals"] if g["id"] == target["id"]), None)
+
+
+class StateLog:
+    def __init__(self, directory: str, commit_interval: float = 0.05,
+                 snapshot_interval: float = 30.0, fsync: bool = True):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        self.seq = 0
+        self._pending: List[str] = []
+        self._poses: Dict[str, tuple] = {}
+        self._last_snapshot = time.monotonic()
+        self.stats = {"commits": 0, "records": 0, "snapshots": 0, "last_commit_ms": 0.0}
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def log_path(self):
+        return os.path.join(self.directory, LOG_FILE)
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    def append(self, op: Dict[str, Any]):
+        """Queue a mutation op for the next group commit"""
+        # Poses recorded before this op must be replayed before it
+        self._flush_poses()
+        self.seq += 1
+        self._pending.append(_dumps({"seq": self.seq, **op}))
+
+    def record_pose(self, pose: tuple):
+        """Queue a pose update, merging it with any pose not yet committed"""
+        previous = self._poses.get(pose[0])
+        if previous is not None and previous[-1]:
+            pose = pose[:-1] + (previous[-1] + list(pose[-1]),)
+        self._poses[pose[0]] = pose
+
+    def _flush_poses(self):
+        if not self._poses:
+            return
+        self.seq += 1
+        self._pending.append(_dumps({"seq": self.seq, "op": "poses", "poses": list(self._poses.values())}))
+        self._poses = {}
+
+    def _write(self, data: str, truncate: bool = False):
+        with open(self.log_path, "w" if truncate else "a", encoding="utf-8") as f:
+            if data:
+                f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def _write_snapshot(self, data: str):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    async def commit(self):
+        """Write everything queued since the last commit in one write"""
+        self._flush_poses()
+        if not self._pending:
+            return
+        started = time.perf_counter()
+        lines, self._pending = self._pending, []
+        await asyncio.to_thread(self._write, "\n".join(lines) + "\n")
+        self.stats["commits"] += 1
+        self.stats["records"] += len(lines)
+        self.stats["last_commit_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def snapshot(self, robots: Dict[str, Dict[str, Any]]):
+        """Persist the full state and start a fresh log segment"""
+        await self.commit()
+        # Serialised without yielding, so the snapshot is consistent at self.seq
+        data = _dumps({"seq": self.seq, "robots": robots})
+        await asyncio.to_thread(self._write_snapshot, data)
+        # Anything appended while the snapshot was written is still in
+        # _pending and lands in the new segment on the next commit
+        await asyncio.to_thread(self._write, "", True)
+        self._last_snapshot = time.monotonic()
+        self.stats["snapshots"] += 1
+
+    async def run(self, robots: Dict[str, Dict[str, Any]]):
+        """Background task: group commit every commit_interval, snapshot every snapshot_interval"""
+        print("State log task started.")
+        while True:
+            try:
+                await asyncio.sleep(self.commit_interval)
+                if time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                    await self.snapshot(robots)
+                else:
+                    await self.commit()
+            except asyncio.CancelledError:
+                await self.commit()
+                raise
+            except Exception as e:
+                print(f"Error in state log task: {e}")
+                await asyncio.sleep(1)
+
+    def recover(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Rebuild robots from the latest snapshot plus the log tail (None if nothing is stored)"""
+        started = time.perf_counter()
+        robots: Dict[str, Dict[str, Any]] = {}
+        snapshot_seq = 0
+        found = False
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            snapshot_seq = snapshot["seq"]
+            robots = snapshot["robots"]
+            relink_target_goals(robots)
+            found = True
+
+        replayed = 0
+        self.seq = snapshot_seq
+        if os.path.exists(self.log_path):
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final write from a crash; everything before it is intact
+                        break
+                    self.seq = max(self.seq, record["seq"])
+                    if record["seq"] <= snapshot_seq:
+                        continue
+                    found = True
+                    if record["op"] == "poses":
+                        for pose in record["poses"]:
+                            robot = robots.get(pose[0])
+                            if robot is not None:
+                                apply_pose(robot, pose)
+                    else:
+                        if record["op"] == "upsert" and record.get("robot"):
+                            relink_target_goals({record["robot_id"]: record["robot"]})
+                        apply_op(robots, record)
+                    replayed += 1
+
+        if not found:
+            return None
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"Recovered {len(robots)} robots from snapshot seq {snapshot_seq} + {replayed} log records in {elapsed:.1f} ms")
+        return robots
@@ -0,0 +1,83 @@
+"""Write-behind persistence of live robot status into robot_setup.
+
+``main.bump_version`` marks every robot it is told changed. A background
+task flushes the marked robots every ``flush_interval`` seconds: their
+current battery, status (the live task, e.g. "Idle" or "Navigating") and
+last-updated time are read from robot_state and written with one
+``executemany`` UPDATE in a single transaction, off the event loop.
+
+Marks are coalesced, so a robot that changed on every tick since the last
+flush is still written once. A flush writes at most ``batch_size`` robots;
+any beyond that stay marked for the next flush. Robots without a
+robot_setup row (e.g. synthetic ones) simply match no row.
+"""
+
+import asyncio
+import sqlite3
+import time
+from typing import Any, Dict, Iterable
+
+
+class StatusWriter:
+    def __init__(self, db_path: str = "robot_setup.db", flush_interval: float = 5.0, batch_size: int = 1000):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # Insertion-ordered, so the longest-waiting robots are written first
+        self._dirty: Dict[str, None] = {}
+        self.stats = {"flushes": 0, "rows": 0, "pending": 0, "last_flush_ms": None}
+
+    def mark(self, robot_ids: Iterable[str]):
+        dirty = self._dirty
+        for robot_id in robot_ids:
+            dirty[robot_id] = None
+
+    def discard(self, robot_id: str):
+        self._dirty.pop(robot_id, None)
+
+    def _write(self, rows):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany("UPDATE robot_setup SET battery = ?, status = ?, last_updated = ? WHERE robot_id = ?", rows)
+        finally:
+            conn.close()
+
+    async def flush(self, robots: Dict[str, Dict[str, Any]]):
+        """Write up to batch_size marked robots in one transaction"""
+        if not self._dirty:
+            return
+        started = time.perf_counter()
+        ids = list(self._dirty)[:self.batch_size]
+        rows = []
+        for robot_id in ids:
+            del self._dirty[robot_id]
+            robot = robots.get(robot_id)
+            if robot is not None:
+                rows.append((int(robot.get("battery", 0)), robot.get("currentTask", "Idle"),
+                             robot.get("lastUpdated", ""), robot_id))
+        if rows:
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception:
+                # Keep them marked so the next flush retries
+                self.mark(row[3] for row in rows)
+                raise
+        self.stats["flushes"] += 1
+        self.stats["rows"] += len(rows)
+        self.stats["pending"] = len(self._dirty)
+        self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def run(self, robots: Dict[str, Dict[str, Any]]):
+        """Background task: flush marked robots every flush_interval"""
+        print("Robot status writer task started.")
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush(robots)
+            except asyncio.CancelledError:
+                await self.flush(robots)
+                raise
+            except Exception as e:
+                print(f"Error in robot status writer task: {e}")
+                await asyncio.sleep(1)
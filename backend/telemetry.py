@@ -0,0 +1,101 @@
+"""Telemetry ingest from robots (or the fleet simulator).
+
+Samples arrive over MQTT on the per-robot topics of ``config.TOPIC_TEMPLATES``
+(``<robot_id>/sensors/battery`` and so on), or in batches on
+``POST /telemetry/batch``. MQTT messages are parsed on the paho network
+thread and appended to a deque, so nothing there touches robot_state.
+``main.telemetry_task`` drains the deque on the event loop every
+``TELEMETRY_APPLY_INTERVAL``. Samples are coalesced per robot, so a robot
+reporting many times between drains is applied once with its latest values.
+"""
+
+import json
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+# Fields a sample may carry, with how an MQTT payload for each is decoded
+FIELDS = {
+    "battery": float,
+    "temperature": float,
+    "humidity": float,
+    "motor_speed": float,
+    "status": str,
+    "location": json.loads
+}
+
+
+def topic_filters(templates: Dict[str, str]) -> List[str]:
+    """MQTT subscriptions covering every robot for the telemetry topics"""
+    return [templates[field].format(robot_id="+") for field in FIELDS if field in templates]
+
+
+class TelemetryIngest:
+    def __init__(self, templates: Dict[str, str], fresh_for: float = 10.0):
+        # Topic suffix after the robot id -> field, e.g. "/sensors/battery" -> "battery"
+        self._suffixes = {templates[field].format(robot_id=""): field for field in FIELDS if field in templates}
+        self.fresh_for = fresh_for
+        self._pending = deque()
+        self._last_seen: Dict[str, float] = {}
+        self.stats = {"received": 0, "applied": 0, "coalesced": 0, "unknown_robots": 0, "invalid": 0}
+        self._rate_mark = (time.monotonic(), 0)
+        self.rate = 0.0
+
+    def submit(self, robot_id: str, fields: Dict[str, Any]):
+        """Queue one sample; safe to call from any thread"""
+        self._pending.append((robot_id, fields))
+
+    def on_mqtt_message(self, topic: str, payload: bytes):
+        robot_id, _, rest = topic.partition("/")
+        field = self._suffixes.get("/" + rest)
+        if not robot_id or field is None:
+            return
+        try:
+            value = FIELDS[field](payload.decode())
+        except (ValueError, UnicodeDecodeError):
+            self.stats["invalid"] += 1
+            return
+        self._pending.append((robot_id, {field: value}))
+
+    def drain(self) -> Dict[str, Dict[str, Any]]:
+        """Everything queued since the last drain, merged into one sample per robot"""
+        merged: Dict[str, Dict[str, Any]] = {}
+        pending = self._pending
+        count = 0
+        while pending:
+            robot_id, fields = pending.popleft()
+            count += 1
+            sample = merged.get(robot_id)
+            if sample is None:
+                merged[robot_id] = dict(fields)
+            else:
+                sample.update(fields)
+        self.stats["received"] += count
+        self.stats["coalesced"] += count - len(merged)
+        now = time.monotonic()
+        started, received = self._rate_mark
+        if now - started >= 1.0:
+            self.rate = (self.stats["received"] - received) / (now - started)
+            self._rate_mark = (now, self.stats["received"])
+        return merged
+
+    def mark_seen(self, robot_id: str, now: float):
+        self._last_seen[robot_id] = now
+
+    def fresh(self, robot_id: str, now: Optional[float] = None) -> bool:
+        """Whether a robot reported recently, so simulated sensor values should not overwrite it"""
+        seen = self._last_seen.get(robot_id)
+        return seen is not None and (now if now is not None else time.monotonic()) - seen < self.fresh_for
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {**self.stats, "queued": len(self._pending), "samples_per_second": round(self.rate, 1),
+                "reporting_robots": sum(1 for seen in self._last_seen.values() if now - seen < self.fresh_for)}
+
+
+def parse_location(value: Any) -> Tuple[float, float]:
+    """[x, y] or {"x": .., "y": ..}"""
+    if isinstance(value, dict):
+        return float(value["x"]), float(value["y"])
+    x, y = value
+    return float(x), float(y)
@@ -0,0 +1,166 @@
+"""Per-robot trajectory history with Douglas-Peucker simplification on query.
+
+Each robot gets a ring buffer of ``(t, x, y)`` samples backed by
+``array('d')``. The arrays grow as samples arrive and wrap once they reach
+``capacity``, so a robot that rarely moves costs a few bytes and none costs
+more than ``capacity`` samples however long the server runs. Samples are taken at most every ``sample_interval`` seconds while a
+robot moves, plus whenever a goal transition happens so arrivals are never
+lost between samples.
+"""
+
+import math
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+
+Point = Tuple[float, float, float]
+
+
+class TrailBuffer:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._t = array("d")
+        self._x = array("d")
+        self._y = array("d")
+        self._head = 0
+        self.count = 0
+
+    def append(self, t: float, x: float, y: float):
+        i = self._head
+        if self.count < self.capacity:
+            # Still filling: head is the end of the arrays
+            self._t.append(t)
+            self._x.append(x)
+            self._y.append(y)
+            self.count += 1
+        else:
+            self._t[i] = t
+            self._x[i] = x
+            self._y[i] = y
+        self._head = (i + 1) % self.capacity
+
+    @property
+    def last_time(self) -> Optional[float]:
+        if not self.count:
+            return None
+        return self._t[(self._head - 1) % self.capacity]
+
+    def _time_at(self, n: int) -> float:
+        return self._t[(self._head - self.count + n) % self.capacity]
+
+    def _first_at_or_after(self, t: float) -> int:
+        """Binary search over the logical (oldest-first) order of the ring"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._time_at(mid) < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def window(self, since: float, until: float) -> List[Point]:
+        """Samples with since <= t <= until, oldest first.
+
+        The last sample before ``since`` is included as well, since it is
+        where the robot was standing when the window opened.
+        """
+        first = max(0, self._first_at_or_after(since) - 1)
+        last = self._first_at_or_after(until)
+        if last < self.count and self._time_at(last) == until:
+            last += 1
+        offset = self._head - self.count
+        capacity = self.capacity
+        t, x, y = self._t, self._x, self._y
+        points = []
+        for n in range(first, last):
+            i = (offset + n) % capacity
+            points.append((t[i], x[i], y[i]))
+        return points
+
+
+def simplify(points: List[Point], tolerance: float) -> List[Point]:
+    """Douglas-Peucker on the (x, y) path, iterative so long trails cannot hit the recursion limit"""
+    if len(points) < 3 or tolerance <= 0:
+        return list(points)
+
+    # Radial pre-pass: drop samples within tolerance of the last kept one (a robot
+    # standing still or crawling), which shrinks the input to the quadratic part
+    radial = [points[0]]
+    limit = tolerance * tolerance
+    for p in points[1:-1]:
+        last = radial[-1]
+        if (p[1] - last[1]) ** 2 + (p[2] - last[2]) ** 2 > limit:
+            radial.append(p)
+    radial.append(points[-1])
+    points = radial
+    if len(points) < 3:
+        return points
+
+    xs = [p[1] for p in points]
+    ys = [p[2] for p in points]
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xs[first], ys[first]
+        dx, dy = xs[last] - ax, ys[last] - ay
+        norm = math.hypot(dx, dy)
+        # Compare squared/unnormalised distances in the loop and scale the threshold instead
+        max_distance = 0.0
+        index = first
+        if norm == 0:
+            for i in range(first + 1, last):
+                distance = (xs[i] - ax) ** 2 + (ys[i] - ay) ** 2
+                if distance > max_distance:
+                    max_distance = distance
+                    index = i
+            limit = tolerance * tolerance
+        else:
+            for i in range(first + 1, last):
+                distance = abs(dy * (xs[i] - ax) - dx * (ys[i] - ay))
+                if distance > max_distance:
+                    max_distance = distance
+                    index = i
+            limit = tolerance * norm
+        if max_distance > limit:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, kept in zip(points, keep) if kept]
+
+
+class TrailStore:
+    def __init__(self, capacity: int = 3600, sample_interval: float = 1.0, clock: Callable[[], float] = time.time):
+        self.capacity = capacity
+        self.sample_interval = sample_interval
+        self.clock = clock
+        self._trails: Dict[str, TrailBuffer] = {}
+
+    def record(self, robot_id: str, x: float, y: float, force: bool = False, now: Optional[float] = None):
+        now = self.clock() if now is None else now
+        trail = self._trails.get(robot_id)
+        if trail is None:
+            trail = self._trails[robot_id] = TrailBuffer(self.capacity)
+        last = trail.last_time
+        if force or last is None or now - last >= self.sample_interval:
+            trail.append(now, x, y)
+
+    def discard(self, robot_id: str):
+        self._trails.pop(robot_id, None)
+
+    def robot_ids(self) -> List[str]:
+        return list(self._trails)
+
+    def query(self, robot_id: str, since: float, until: float, tolerance: float) -> Optional[Dict]:
+        trail = self._trails.get(robot_id)
+        if trail is None:
+            return None
+        raw = trail.window(since, until)
+        points = simplify(raw, tolerance)
+        return {
+            "robot_id": robot_id,
+            "raw_points": len(raw),
+            "points": [[round(t, 1), round(x, 1), round(y, 1)] for t, x, y in points]
+        }
@@ -0,0 +1,280 @@
+"""Geofence zones (chargers, restricted areas, speed-limited aisles) per map.
+
+Zones are polygons in map pixels, stored in the ``zones`` table of
+robot_setup.db. ``ZoneIndex`` compiles them into a uniform grid per map: each
+cell lists the zones that cover it completely, the zones whose boundary
+crosses it (the only ones needing a point-in-polygon test) and the zone
+edges near it.
+
+``ZoneTracker`` keeps every robot's current zones. The movement tick hands
+it the robots that moved. Each check also records how far the robot is from
+the nearest zone boundary; until it has moved that far it cannot have
+entered or left a zone, so it is skipped with one distance comparison. For
+the rest it reports enter/exit transitions and the speed cap of the zones
+the robot is in (the lowest ``speed_limit``). Robots without an assigned map
+are not geofenced.
+"""
+
+import math
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+EMPTY = frozenset()
+
+# (robot_id, zone, "enter" | "exit")
+ZoneEvent = Tuple[str, Dict[str, Any], str]
+
+
+def point_in_polygon(x: float, y: float, polygon: List[List[float]]) -> bool:
+    """Even-odd ray casting test"""
+    inside = False
+    px, py = polygon[-1]
+    for qx, qy in polygon:
+        if (qy > y) != (py > y) and x < (px - qx) * (y - qy) / (py - qy) + qx:
+            inside = not inside
+        px, py = qx, qy
+    return inside
+
+
+def _segment_hits_rect(ax, ay, bx, by, x0, y0, x1, y1) -> bool:
+    """Liang-Barsky clip of segment a-b against the rectangle (touching counts)"""
+    t0, t1 = 0.0, 1.0
+    dx, dy = bx - ax, by - ay
+    for p, q in ((-dx, ax - x0), (dx, x1 - ax), (-dy, ay - y0), (dy, y1 - ay)):
+        if p == 0:
+            if q < 0:
+                return False
+            continue
+        t = q / p
+        if p < 0:
+            if t > t1:
+                return False
+            t0 = max(t0, t)
+        else:
+            if t < t0:
+                return False
+            t1 = min(t1, t)
+    return True
+
+
+def validate_polygon(polygon: List[List[float]]) -> Optional[str]:
+    """Why a polygon cannot be used as a zone, or None if it can"""
+    if len(polygon) < 3:
+        return "A zone polygon needs at least 3 points"
+    if any(len(point) != 2 or not all(math.isfinite(v) for v in point) for point in polygon):
+        return "Zone polygon points must be [x, y] pairs of finite numbers"
+    return None
+
+
+class ZoneIndex:
+    def __init__(self, zones: Iterable[Dict[str, Any]] = (), cell_size: float = 50.0):
+        """``zones`` are dicts with id, map_id, zone_name, zone_type, polygon and speed_limit"""
+        self.cell_size = cell_size
+        self.zones: Dict[int, Dict[str, Any]] = {}
+        self.maps = set()
+        cells: Dict[tuple, Tuple[list, list]] = {}
+        near: Dict[tuple, set] = {}
+        for zone in zones:
+            self.zones[zone["id"]] = zone
+            self.maps.add(zone["map_id"])
+            self._add(cells, near, zone)
+        # Cell -> (ids of zones covering it, (id, polygon) of zones whose boundary crosses it)
+        self._cells = {key: (frozenset(full), tuple(partial)) for key, (full, partial) in cells.items()}
+        # Cell -> every zone edge crossing it or one of its 8 neighbours, so any boundary
+        # closer than cell_size to a point in the cell is among them
+        self._near = {key: tuple(edges) for key, edges in near.items()}
+        self.cell_count = len(self._cells)
+        self._rings: Dict[tuple, int] = {}
+        self._bounds: Dict[Any, Tuple[int, int, int, int]] = {}
+        self._measure_clearance()
+
+    def _measure_clearance(self):
+        """Chebyshev distance (in cells) from each cell to the nearest cell a boundary crosses.
+
+        Computed for the cells inside each map's boundary bounding box; outside it
+        the distance to the box is a lower bound. A point in a cell ``ring`` cells
+        away is at least ``(ring - 1) * cell_size`` from every boundary.
+        """
+        crossed: Dict[Any, List[Tuple[int, int]]] = {}
+        for (map_id, cx, cy), (_, partial) in self._cells.items():
+            if partial:
+                crossed.setdefault(map_id, []).append((cx, cy))
+        for map_id, frontier in crossed.items():
+            xs = [cx for cx, _ in frontier]
+            ys = [cy for _, cy in frontier]
+            x0, y0, x1, y1 = min(xs), min(ys), max(xs), max(ys)
+            self._bounds[map_id] = (x0, y0, x1, y1)
+            seen = set(frontier)
+            ring = 0
+            while frontier:
+                ring += 1
+                reached = []
+                for cx, cy in frontier:
+                    for nx in (cx - 1, cx, cx + 1):
+                        for ny in (cy - 1, cy, cy + 1):
+                            if x0 <= nx <= x1 and y0 <= ny <= y1 and (nx, ny) not in seen:
+                                seen.add((nx, ny))
+                                reached.append((nx, ny))
+                                if ring >= 2:
+                                    self._rings[(map_id, nx, ny)] = ring
+                frontier = reached
+
+    def _add(self, cells, near, zone):
+        polygon = zone["polygon"]
+        map_id = zone["map_id"]
+        size = self.cell_size
+        edges = []
+        for (ax, ay), (bx, by) in zip(polygon, polygon[1:] + polygon[:1]):
+            dx, dy = bx - ax, by - ay
+            length = dx * dx + dy * dy
+            if length:
+                edges.append((ax, ay, dx, dy, 1.0 / length))
+        xs = [p[0] for p in polygon]
+        ys = [p[1] for p in polygon]
+        for cx in range(math.floor(min(xs) / size), math.floor(max(xs) / size) + 1):
+            for cy in range(math.floor(min(ys) / size), math.floor(max(ys) / size) + 1):
+                x0, y0 = cx * size, cy * size
+                x1, y1 = x0 + size, y0 + size
+                crossing = [edge for edge in edges
+                            if _segment_hits_rect(edge[0], edge[1], edge[0] + edge[2], edge[1] + edge[3], x0, y0, x1, y1)]
+                if crossing:
+                    cells.setdefault((map_id, cx, cy), ([], []))[1].append((zone["id"], polygon))
+                    for nx in (cx - 1, cx, cx + 1):
+                        for ny in (cy - 1, cy, cy + 1):
+                            near.setdefault((map_id, nx, ny), set()).update(crossing)
+                elif point_in_polygon(x0 + size / 2, y0 + size / 2, polygon):
+                    cells.setdefault((map_id, cx, cy), ([], []))[0].append(zone["id"])
+
+    def lookup(self, map_id, x: float, y: float) -> Tuple[frozenset, float]:
+        """(zone ids containing the point, radius around it within which that cannot change)"""
+        if map_id not in self.maps:
+            return EMPTY, math.inf
+        size = self.cell_size
+        cx, cy = math.floor(x / size), math.floor(y / size)
+        key = (map_id, cx, cy)
+        near = self._near.get(key)
+        if near is None:
+            # No boundary within a cell of here: it is at least (ring - 1) cells away
+            ring = self._rings.get(key)
+            if ring is None:
+                x0, y0, x1, y1 = self._bounds[map_id]
+                ring = max(x0 - cx, cx - x1, y0 - cy, cy - y1, 2)
+            entry = self._cells.get(key)
+            return (entry[0] if entry else EMPTY), (ring - 1) * size
+        radius_sq = size * size
+        # Squared distance to each nearby edge (ax, ay, dx, dy, 1 / length^2), inlined as this is the hot path
+        for ax, ay, dx, dy, inv in near:
+            t = ((x - ax) * dx + (y - ay) * dy) * inv
+            t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+            ex = ax + t * dx - x
+            ey = ay + t * dy - y
+            distance_sq = ex * ex + ey * ey
+            if distance_sq < radius_sq:
+                radius_sq = distance_sq
+        entry = self._cells.get(key)
+        if entry is None:
+            return EMPTY, math.sqrt(radius_sq)
+        full, partial = entry
+        inside = [zone_id for zone_id, polygon in partial if point_in_polygon(x, y, polygon)]
+        return (full.union(inside) if inside else full), math.sqrt(radius_sq)
+
+
+class ZoneTracker:
+    def __init__(self, cell_size: float = 50.0):
+        self.cell_size = cell_size
+        self.index = ZoneIndex((), cell_size)
+        self.occupancy: Dict[str, frozenset] = {}
+        # Where each robot was last checked: (map_id, x, y, squared distance it can move
+        # from there before it could reach a zone boundary)
+        self._anchors: Dict[str, tuple] = {}
+        self._pending = set()
+        self._recheck_all = False
+        self.stats = {"zones": 0, "cells": 0, "checks": 0, "skipped": 0, "events": 0, "last_eval_ms": None}
+
+    def load(self, zones: Iterable[Dict[str, Any]]):
+        """Replace the zone set; every robot is re-checked on the next evaluate"""
+        self.index = ZoneIndex(zones, self.cell_size)
+        self._anchors.clear()
+        self._recheck_all = True
+        self.stats["zones"] = len(self.index.zones)
+        self.stats["cells"] = self.index.cell_count
+
+    def mark(self, robot_ids: Iterable[str]):
+        """Re-check robots moved outside the movement tick (commands, new robots)"""
+        self._pending.update(robot_ids)
+
+    def forget(self, robot_id: str):
+        self.occupancy.pop(robot_id, None)
+        self._anchors.pop(robot_id, None)
+        self._pending.discard(robot_id)
+
+    def speed_cap(self, zone_ids: Iterable[int]) -> Optional[float]:
+        """Lowest speed_limit of the given zones, or None if none of them limits speed"""
+        zones = self.index.zones
+        limits = [zones[z]["speed_limit"] for z in zone_ids if z in zones and zones[z]["speed_limit"] is not None]
+        return min(limits) if limits else None
+
+    def evaluate(self, robots: Dict[str, Dict[str, Any]], moved: Iterable[str]) -> Tuple[List[str], List[ZoneEvent]]:
+        """Update occupancy for moved (and marked) robots: (robots whose zones changed, enter/exit events)"""
+        if self._recheck_all:
+            self._recheck_all = False
+            candidates = list(robots)
+        elif self._pending:
+            candidates = self._pending.union(moved)
+        else:
+            candidates = moved
+        self._pending = set()
+        if not self.index.zones and not self.occupancy:
+            return [], []
+
+        started = time.perf_counter()
+        lookup = self.index.lookup
+        zones = self.index.zones
+        anchors = self._anchors
+        occupancy = self.occupancy
+        changed = []
+        events = []
+        checks = skipped = 0
+        for robot_id in candidates:
+            robot = robots.get(robot_id)
+            if robot is None:
+                continue
+            map_id = robot.get("map_id")
+            x, y = robot["position"]
+            anchor = anchors.get(robot_id)
+            if anchor is not None and anchor[0] == map_id:
+                dx = x - anchor[1]
+                dy = y - anchor[2]
+                if dx * dx + dy * dy < anchor[3]:
+                    skipped += 1
+                    continue
+            checks += 1
+            inside, radius = lookup(map_id, x, y)
+            anchors[robot_id] = (map_id, x, y, radius * radius)
+            # After a restart the robot's last known zones come back with robot_state
+            previous = occupancy.get(robot_id)
+            if previous is None:
+                previous = frozenset(robot.get("zones", ()))
+            if inside == previous:
+                if inside:
+                    occupancy[robot_id] = inside
+                continue
+            for zone_id in previous - inside:
+                if zone_id in zones:
+                    events.append((robot_id, zones[zone_id], "exit"))
+            for zone_id in inside - previous:
+                events.append((robot_id, zones[zone_id], "enter"))
+            if inside:
+                occupancy[robot_id] = inside
+            else:
+                occupancy.pop(robot_id, None)
+            changed.append(robot_id)
+
+        self.stats["checks"] += checks
+        self.stats["skipped"] += skipped
+        self.stats["events"] += len(events)
+        self.stats["last_eval_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return changed, events
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "robots_in_zones": len(self.occupancy)}
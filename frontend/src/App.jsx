@@ -53,6 +53,50 @@
     const wsRef = useRef(null);
     const reconnectTimeoutRef = useRef(null);
     const reconnectAttemptsRef = useRef(0);
+    // Server boot and state version last received, so a reconnect resumes with only what was missed
+    const bootIdRef = useRef(null);
+    const versionRef = useRef(null);
+
+    // Show the E-stop overlay and drop the live connection (local button or server priority frame)
+    const activateEStop = () => {
+      eStopRef.current = true;
+      setIsEStop(true);
+      setEStopActive(true);
+      localStorage.setItem('eStopActive', 'true');
+      if (wsRef.current) { wsRef.current.close(); }
+      setIsWsConnected(false);
+    };
+
+    const [eStopError, setEStopError] = useState(null);
+    // True while our own POST /estop is in flight, so polling cannot clear the overlay before it lands
+    const eStopPendingRef = useRef(false);
+
+    // Hide the overlay and reconnect; only once the server reports the stop released
+    const clearEStop = () => {
+      eStopRef.current = false;
+      setIsEStop(false);
+      setEStopActive(false);
+      setEStopError(null);
+      localStorage.removeItem('eStopActive');
+    };
+
+    // While the overlay is up the live connection is closed: poll the server's stop state so the
+    // overlay clears when anyone releases the stop, and never outlives a stop the server does not have
+    useEffect(() => {
+      if (!isEStop) return undefined;
+      const checkEStop = () => {
+        if (eStopPendingRef.current) return;
+        axios.get(`${API_BASE_URL}/estop`)
+          .then((response) => {
+            if (!eStopPendingRef.current && !response.data.estop.active) clearEStop();
+          })
+          .catch((error) => console.warn('Failed to read E-stop state:', error));
+      };
+      checkEStop();
+      const interval = setInterval(checkEStop, 2000);
+      return () => clearInterval(interval);
+    }, [isEStop]);
+
     const [dashboardMapType, setDashboardMapType] = useState(() => localStorage.getItem('lastMapType') || 'storage');
     const [customMapImage, setCustomMapImage] = useState(() => localStorage.getItem('selectedMapImage') || null);
     const [availableMaps, setAvailableMaps] = useState([]);
@@ -162,19 +206,49 @@
       const connectWebSocket = () => {
         if (eStopRef.current) return;
         try {
-          wsRef.current = new WebSocket('ws://localhost:8000/ws');
+          const resume = bootIdRef.current && versionRef.current !== null
+            ? `&boot_id=${bootIdRef.current}&since=${versionRef.current}` : '';
+          wsRef.current = new WebSocket(`ws://localhost:8000/ws?mode=delta${resume}`);
           wsRef.current.onopen = () => {
             if (eStopRef.current) { wsRef.current.close(); return; }
             console.log('Dashboard WebSocket Connected');
             setIsWsConnected(true);
             reconnectAttemptsRef.current = 0;
-            wsRef.current.send(JSON.stringify({ type: 'get_status' }));
           };
           wsRef.current.onmessage = (event) => {
             if (eStopRef.current) return;
             try {
               const data = JSON.parse(event.data);
+              if (data.type === 'estop') {
+                // Priority frame: acknowledge first so the server can measure delivery latency
+                if (data.active) {
+                  wsRef.current.send(JSON.stringify({ type: 'estop_ack', seq: data.seq }));
+                  activateEStop();
+                }
+                return;
+              }
+              if (data.estop && data.estop.active) {
+                // The server is stopped (e.g. engaged before we connected): show it
+                activateEStop();
+                return;
+              }
+              if (data.type === 'delta') {
+                if (data.boot_id !== bootIdRef.current || data.base !== versionRef.current) {
+                  // Not a delta from what we hold: ask for the full state
+                  wsRef.current.send(JSON.stringify({ type: 'get_status' }));
+                  return;
+                }
+                versionRef.current = data.version;
+                setWsData(prev => {
+                  const robots = { ...prev.robots, ...data.robots };
+                  data.removed.forEach(robotId => { delete robots[robotId]; });
+                  return { ...prev, robots, version: data.version, estop: data.estop, lastUpdated: data.lastUpdated };
+                });
+                return;
+              }
               console.log('WebSocket data received:', data);
+              bootIdRef.current = data.boot_id;
+              versionRef.current = data.version;
               setWsData(data);
             } catch (error) {
               console.warn('Error parsing WebSocket data:', error);
@@ -319,11 +393,11 @@
             robotCount={robotCount}
             title={dashboardTitle}
             onEStop={() => {
-              setIsEStop(true);
-              setEStopActive(true);
-              localStorage.setItem('eStopActive', 'true');
-              if (wsRef.current) { wsRef.current.close(); }
-              setIsWsConnected(false);
+              eStopPendingRef.current = true;
+              axios.post(`${API_BASE_URL}/estop`, { reason: 'Dashboard E-stop button' })
+                .catch((error) => console.warn('Failed to send E-stop to server:', error))
+                .finally(() => { eStopPendingRef.current = false; });
+              activateEStop();
             }}
           />
           <Routes>
@@ -690,6 +764,9 @@
           }}>
             <FaBan style={{ fontSize: '3rem', marginBottom: 24 }} />
             System Emergency Stop Activated
+            {eStopError && (
+              <div style={{ marginTop: 16, fontSize: '1rem', fontWeight: 500 }}>{eStopError}</div>
+            )}
             <button
               style={{
                 marginTop: 32,
@@ -705,9 +782,18 @@
                 transition: 'background 0.2s, color 0.2s',
               }}
               onClick={() => {
-                setIsEStop(false);
-                setEStopActive(false);
-                localStorage.removeItem('eStopActive');
+                const token = localStorage.getItem('sessionToken');
+                axios.post(`${API_BASE_URL}/estop/release`, null, {
+                  headers: token ? { Authorization: `Bearer ${token}` } : {}
+                })
+                  .then(() => clearEStop())
+                  .catch((error) => {
+                    console.warn('Failed to release E-stop on server:', error);
+                    const status = error.response && error.response.status;
+                    setEStopError(status === 401 || status === 403
+                      ? 'Only an administrator can release the emergency stop'
+                      : 'Could not release the emergency stop; the system is still stopped');
+                  });
               }}
             >
               Reset
@@ -117,6 +117,9 @@ const RobotLogin = ({ onLoginSuccess }) => {
         localStorage.setItem('userId', response.data.user_id);
         localStorage.setItem('userName', response.data.name);
         localStorage.setItem('userPasscode', pass);
+        if (response.data.token) {
+          localStorage.setItem('sessionToken', response.data.token);
+        }
         if (response.data.role === 'Admin') {
           localStorage.setItem('userRole', 'Admin');
         } else {
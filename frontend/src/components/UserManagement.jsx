@@ -69,7 +69,8 @@ const UserManagement = () => {
 
   const handleEdit = (user) => {
     setEditId(user.id);
-    setEditData({ ...user });
+    // Passcodes come back masked; leave blank to keep the current one
+    setEditData({ ...user, passcode: '' });
   };
 
   const handleDelete = (userId) => {
@@ -92,7 +93,7 @@ const UserManagement = () => {
   };
 
   const handleSave = async (user) => {
-    if (!/^\d{4}$/.test(editData.emp_id) || !/^\d{4}$/.test(editData.passcode)) {
+    if (!/^\d{4}$/.test(editData.emp_id) || (editData.passcode && !/^\d{4}$/.test(editData.passcode))) {
       setNotification('Employee ID and Passcode must be exactly 4 digits.');
       return;
     }